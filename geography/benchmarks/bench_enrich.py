@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark serial against concurrent entity enrichment on a local stand-in
+
+A threaded HTTP server on localhost answers Special:EntityData requests
+with synthetic entities after a fixed latency, and fails a share of them
+with 503 or 429 (with Retry-After) to exercise the retries. A small
+sample is fetched serially (concurrency 1) and extrapolated; all QIDs
+are then fetched concurrently, and once more to time the warm cache.
+"""
+
+from airtight.cli import configure_commandline
+from campa.geography.enrichment import EntityCache, EntityFetcher
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+from pathlib import Path
+import random
+import re
+import tempfile
+import threading
+import time
+
+DEFAULT_LOG_LEVEL = logging.WARNING
+OPTIONAL_ARGUMENTS = [
+    ['-l', '--loglevel', 'NOTSET',
+        'desired logging level (' +
+        'case-insensitive string: DEBUG, INFO, WARNING, or ERROR',
+        False],
+    ['-v', '--verbose', False, 'verbose output (logging level == INFO)',
+        False],
+    ['-w', '--veryverbose', False,
+        'very verbose output (logging level == DEBUG)', False],
+    ['-n', '--entities', 300, 'number of QIDs to fetch', False],
+    ['-s', '--sample', 20, 'number of QIDs to fetch serially', False],
+    ['-c', '--concurrency', 16, 'concurrent requests', False],
+    ['-r', '--rate', 100.0, 'requests per second (0: no limit)', False],
+    ['-t', '--latency', 0.2, 'seconds the server takes per answer', False],
+    ['-e', '--errors', 0.05,
+        'share of answers that are 503 or 429 errors', False]
+]
+POSITIONAL_ARGUMENTS = [
+    # each row is a list with 3 elements: name, type, help
+]
+RX_PATH = re.compile(r'/(Q\d+)\.json$')
+
+
+def entity(qid):
+    """A synthetic entity with labels, coordinates and a P131 claim"""
+    n = int(qid[1:])
+    return {'entities': {qid: {
+        'id': qid,
+        'labels': {
+            lang: {'language': lang, 'value': 'Place {} ({})'.format(n, lang)}
+            for lang in ('en', 'vi', 'fr', 'de')},
+        'claims': {
+            'P131': [{'mainsnak': {'datavalue': {'value': {
+                'id': 'Q{}'.format(n // 10)}}}}],
+            'P625': [{'mainsnak': {'datavalue': {'value': {
+                'latitude': 10.0 + n % 1000 / 1000,
+                'longitude': 106.0 + n % 997 / 997}}}}]}}}}
+
+
+def serve(latency, errors):
+    """Start the stand-in server in a thread; return it"""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            time.sleep(latency)
+            m = RX_PATH.search(self.path)
+            if m is None:
+                self.send_error(404)
+                return
+            draw = random.random()
+            if draw < errors / 2:
+                self.send_error(503)
+                return
+            if draw < errors:
+                self.send_response(429)
+                self.send_header('Retry-After', '0.1')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = json.dumps(entity(m.group(1))).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(url, path, qids, concurrency, rate):
+    cache = EntityCache(path)
+    fetcher = EntityFetcher(
+        cache, url, concurrency=concurrency, rate=rate, backoff=0.1)
+    start = time.perf_counter()
+    summaries = fetcher.fetch_all(qids)
+    elapsed = time.perf_counter() - start
+    cache.close()
+    return elapsed, summaries, fetcher.stats
+
+
+def main(**kwargs):
+    """
+    main function
+    """
+    random.seed(0)
+    server = serve(kwargs['latency'], kwargs['errors'])
+    url = 'http://127.0.0.1:{}/wiki/Special:EntityData/{{qid}}.json'.format(
+        server.server_address[1])
+    qids = ['Q{}'.format(1000 + i) for i in range(kwargs['entities'])]
+    print('{:<12} {:>6} {:>9} {:>8} {:>8} {:>7}'.format(
+        'run', 'QIDs', 'seconds', 'fetched', 'retried', 'failed'))
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = qids[:kwargs['sample']]
+        elapsed, _, stats = run(
+            url, Path(tmp) / 'serial.db', sample, 1, 0)
+        print('{:<12} {:>6} {:>9.2f} {:>8} {:>8} {:>7}'.format(
+            'serial', len(sample), elapsed, stats['fetched'],
+            stats['retried'], stats['failed']))
+        print('{:<12} {:>6} {:>9.2f}'.format(
+            '  (all, est.)', len(qids), elapsed / len(sample) * len(qids)))
+        path = Path(tmp) / 'concurrent.db'
+        for label in ('concurrent', 'cached'):
+            elapsed, summaries, stats = run(
+                url, path, qids, kwargs['concurrency'], kwargs['rate'])
+            print('{:<12} {:>6} {:>9.2f} {:>8} {:>8} {:>7}'.format(
+                label, len(summaries), elapsed, stats['fetched'],
+                stats['retried'], stats['failed']))
+        assert summaries['Q1000']['p131'] == ['Q100']
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(**configure_commandline(
+        OPTIONAL_ARGUMENTS, POSITIONAL_ARGUMENTS, DEFAULT_LOG_LEVEL))
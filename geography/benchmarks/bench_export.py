@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark streaming export time and memory against gazetteer size
+
+Synthetic gazetteers of increasing size (a province, districts, communes
+and villages with coordinates and cnumbers) are exported to a temporary
+directory. Time per feature should stay flat as the size grows, and the
+export's peak memory above the gazetteer itself should not grow at all.
+"""
+
+from airtight.cli import configure_commandline
+from campa.geography.export import export
+from campa.geography.gazetteer import Gazetteer
+from campa.geography.place import CampaPlace
+import gc
+import logging
+from pathlib import Path
+import tempfile
+import time
+import tracemalloc
+
+DEFAULT_LOG_LEVEL = logging.WARNING
+OPTIONAL_ARGUMENTS = [
+    ['-l', '--loglevel', 'NOTSET',
+        'desired logging level (' +
+        'case-insensitive string: DEBUG, INFO, WARNING, or ERROR',
+        False],
+    ['-v', '--verbose', False, 'verbose output (logging level == INFO)',
+        False],
+    ['-w', '--veryverbose', False,
+        'very verbose output (logging level == DEBUG)', False],
+    ['-n', '--sizes', '1000,10000,100000',
+        'comma-separated numbers of villages', False],
+    ['-f', '--format', 'geojson', 'geojson or lpf', False],
+    ['-s', '--shard_size', 0, 'features per shard (0: one file)', False]
+]
+POSITIONAL_ARGUMENTS = [
+    # each row is a list with 3 elements: name, type, help
+]
+
+
+def build(n):
+    """A gazetteer of n villages in 10 communes per district"""
+    g = Gazetteer()
+    g.set_place(CampaPlace(
+        'province', gazetteer=g, name='Province', types=['province']))
+    for i in range(n):
+        district = 'd{}'.format(i // 100)
+        commune = 'c{}'.format(i // 10)
+        if i % 100 == 0:
+            g.set_place(CampaPlace(
+                district, gazetteer=g, name=district, types=['district'],
+                province='province'))
+        if i % 10 == 0:
+            g.set_place(CampaPlace(
+                commune, gazetteer=g, name=commune, types=['commune'],
+                province='province', district=district))
+        pid = 'v{}'.format(i)
+        g.set_place(CampaPlace(
+            pid, gazetteer=g, name='Village {}'.format(i),
+            types=['village'], province='province', district=district,
+            commune=commune,
+            coordinates=(10.0 + (i % 1000) / 1000, 106.0 + i / n)))
+        g.attach_cnumber(pid, str(i))
+    return g
+
+
+def main(**kwargs):
+    """
+    main function
+    """
+    sizes = [int(s) for s in kwargs['sizes'].split(',')]
+    print('{:>8} {:>9} {:>8} {:>12} {:>10}'.format(
+        'places', 'seconds', 'µs/place', 'peak KiB', 'MiB out'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            g = build(n)
+            path = Path(tmp) / 'places-{}'.format(n)
+            gc.collect()
+            start = time.perf_counter()
+            export(
+                g, path, fmt=kwargs['format'],
+                shard_size=kwargs['shard_size'])
+            elapsed = time.perf_counter() - start
+            gc.collect()
+            tracemalloc.start()
+            export(
+                g, path, fmt=kwargs['format'],
+                shard_size=kwargs['shard_size'])
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            if path.is_dir():
+                size = sum([p.stat().st_size for p in path.iterdir()])
+            else:
+                size = path.stat().st_size
+            places = len(g.places)
+            print('{:>8} {:>9.3f} {:>8.2f} {:>12.1f} {:>10.2f}'.format(
+                places, elapsed, elapsed / places * 1e6, peak / 1024,
+                size / 2 ** 20))
+            del g
+
+
+if __name__ == "__main__":
+    main(**configure_commandline(
+        OPTIONAL_ARGUMENTS, POSITIONAL_ARGUMENTS, DEFAULT_LOG_LEVEL))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark the per-row logging overhead of SelfLogger
+
+Compares the original uncached logger lookup with eager pformat against
+the cached lookup with LazyPformat, with DEBUG logging disabled.
+"""
+
+from airtight.cli import configure_commandline
+from campa.geography.logger import LazyPformat, SelfLogger
+import logging
+from pprint import pformat
+import sys
+import timeit
+
+DEFAULT_LOG_LEVEL = logging.WARNING
+OPTIONAL_ARGUMENTS = [
+    ['-l', '--loglevel', 'NOTSET',
+        'desired logging level (' +
+        'case-insensitive string: DEBUG, INFO, WARNING, or ERROR',
+        False],
+    ['-v', '--verbose', False, 'verbose output (logging level == INFO)',
+        False],
+    ['-w', '--veryverbose', False,
+        'very verbose output (logging level == DEBUG)', False],
+    ['-n', '--rows', 10000, 'number of simulated rows', False]
+]
+POSITIONAL_ARGUMENTS = [
+    # each row is a list with 3 elements: name, type, help
+]
+# roughly what PlaceParser.parse does for one fully-specified row: one
+# logger per _parse_* method and per CampaPlace, and one debug pformat of
+# the row and of each place
+LEVELS = 6
+ROW = {
+    'cnumber': '161', 'country': 'Vietnam', 'province': 'Quảng Nam',
+    'district': 'Duy Xuyên', 'commune': 'Duy Phú', 'village': 'Mỹ Sơn',
+    'position': ''}
+PLACE = {
+    'pid': 'Q1065036', 'names': ['Mỹ Sơn', 'My Son'],
+    'types': ['village', 'PPA'], 'identifiers': {'wikidata': ['Q1065036']},
+    'country': {'name': 'Vietnam', 'pid': 'vietnam'}}
+
+
+class UncachedLogger(object):
+    """The original SelfLogger._get_logger"""
+
+    def _get_logger(self):
+        name = ':'.join((
+            self.__class__.__name__,
+            sys._getframe().f_back.f_code.co_name))
+        return logging.getLogger(name)
+
+
+class Before(UncachedLogger):
+
+    def row(self):
+        logger = self._get_logger()
+        logger.debug('kwargs:\n%s', pformat(ROW, indent=4))
+        for i in range(LEVELS):
+            logger = self._get_logger()
+            logger.debug('CampaPlace:\n%s', pformat(PLACE, indent=4))
+
+
+class After(SelfLogger):
+
+    def row(self):
+        logger = self._get_logger()
+        logger.debug('kwargs:\n%s', LazyPformat(ROW, indent=4))
+        for i in range(LEVELS):
+            logger = self._get_logger()
+            logger.debug('CampaPlace:\n%s', LazyPformat(PLACE, indent=4))
+
+
+def main(**kwargs):
+    """
+    main function
+    """
+    rows = kwargs['rows']
+    results = {}
+    for cls in [Before, After]:
+        obj = cls()
+        seconds = min(timeit.repeat(obj.row, number=rows, repeat=5))
+        results[cls.__name__] = seconds / rows * 1e6
+        print('{}: {:.2f} µs per row'.format(
+            cls.__name__, results[cls.__name__]))
+    print('speedup: {:.1f}x'.format(results['Before'] / results['After']))
+
+
+if __name__ == "__main__":
+    main(**configure_commandline(
+        OPTIONAL_ARGUMENTS, POSITIONAL_ARGUMENTS, DEFAULT_LOG_LEVEL))
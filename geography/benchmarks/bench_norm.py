@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark memoized normalization against the original norm() pipeline
+
+Runs the inventory's hierarchy cells through norm, the index key and the
+slug, as inv2geo, CatalogIndex and PlaceParser do, several times over.
+"""
+
+from airtight.cli import configure_commandline
+from campa.geography.inventory import FIELDS, HIERARCHY, read_rows
+from campa.geography.norm import cache_stats, index_key, norm, slugify
+import logging
+from pathlib import Path
+import re
+from textnorm import normalize_space, normalize_unicode
+import time
+
+DEFAULT_LOG_LEVEL = logging.WARNING
+OPTIONAL_ARGUMENTS = [
+    ['-l', '--loglevel', 'NOTSET',
+        'desired logging level (' +
+        'case-insensitive string: DEBUG, INFO, WARNING, or ERROR',
+        False],
+    ['-v', '--verbose', False, 'verbose output (logging level == INFO)',
+        False],
+    ['-w', '--veryverbose', False,
+        'very verbose output (logging level == DEBUG)', False],
+    ['-i', '--infile', 'InventaireCampa.csv', 'inventory CSV file', False],
+    ['-r', '--repeat', 20, 'passes over the inventory', False]
+]
+POSITIONAL_ARGUMENTS = [
+    # each row is a list with 3 elements: name, type, help
+]
+
+
+def before(values):
+    for raw in values:
+        cooked = normalize_unicode(normalize_space(raw))
+        '-'.join(normalize_unicode(normalize_space(cooked)).lower().split())
+        '-'.join(re.sub(
+            r'[()-_]+', '',
+            normalize_unicode(normalize_space(cooked)).lower()).split())
+
+
+def after(values):
+    for raw in values:
+        cooked = norm(raw)
+        index_key(cooked)
+        slugify(cooked)
+
+
+def main(**kwargs):
+    """
+    main function
+    """
+    infile = kwargs['infile']
+    if infile == 'InventaireCampa.csv':
+        infile = Path(__file__).parent.parent / 'data' / infile
+    values = []
+    for row in read_rows(infile):
+        values.extend([row[FIELDS[k]] for k in HIERARCHY])
+    values = values * kwargs['repeat']
+    print('{} cell values, {} distinct'.format(len(values), len(set(values))))
+    results = {}
+    for f in [before, after]:
+        start = time.perf_counter()
+        f(values)
+        results[f.__name__] = time.perf_counter() - start
+        print('{}: {:.1f} ms ({:.2f} µs per value)'.format(
+            f.__name__, results[f.__name__] * 1e3,
+            results[f.__name__] / len(values) * 1e6))
+    print('speedup: {:.1f}x'.format(results['before'] / results['after']))
+    for name, stats in cache_stats().items():
+        print('{}: {hits} hits, {misses} misses, {size}/{maxsize}'.format(
+            name, **stats))
+
+
+if __name__ == "__main__":
+    main(**configure_commandline(
+        OPTIONAL_ARGUMENTS, POSITIONAL_ARGUMENTS, DEFAULT_LOG_LEVEL))
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the whole geography pipeline on the inventory and on synthetic
+inventories scaled up from it
+
+Scale k repeats the inventory k times, giving each copy's districts,
+communes, villages and cnumbers their own (made-up) names, so every copy
+is parsed afresh. Wikidata and pycountry are replaced by local stubs
+that resolve every name, so runs need no network and are repeatable.
+
+Each scale runs in its own interpreter, so that its peak memory (maximum
+resident set size) is its own. Stage times are for: columns (normalizing
+the rows), group (grouping them by hierarchy), parse, lookup (looking up
+every name in the built gazetteer, with its place's type and parent as
+context), snapshot and export. The parse stage is broken down further
+into the time spent in PlaceParser.parse, Gazetteer.set_place and
+lookup, CatalogIndex add and lookup, the fuzzy search of the local
+stores, the resolution store and journal, and the stubs; these are
+inclusive, so they overlap.
+
+Results can be written as JSON (-o) and compared with the JSON of an
+earlier run (-c), e.g. on another commit. The ×1000 scale (455,000 rows)
+takes the better part of half an hour; leave it out of -s for a quick
+check.
+"""
+
+from airtight.cli import configure_commandline
+from campa.geography.export import export
+from campa.geography.gazetteer import Gazetteer
+from campa.geography.inventory import (
+    FIELDS, HIERARCHY, group_hierarchies, load_columns, read_rows)
+from campa.geography.parser import PlaceParser
+from campa.geography.resolution import ResolutionStore, StubResolver
+import datetime
+import json
+import logging
+import platform
+import random
+from pathlib import Path
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_LOG_LEVEL = logging.ERROR
+OPTIONAL_ARGUMENTS = [
+    ['-l', '--loglevel', 'NOTSET',
+        'desired logging level (' +
+        'case-insensitive string: DEBUG, INFO, WARNING, or ERROR',
+        False],
+    ['-v', '--verbose', False, 'verbose output (logging level == INFO)',
+        False],
+    ['-w', '--veryverbose', False,
+        'very verbose output (logging level == DEBUG)', False],
+    ['-i', '--infile', 'InventaireCampa.csv', 'inventory CSV file', False],
+    ['-s', '--scales', '1,10,100,1000',
+        'comma-separated copies of the inventory to run', False],
+    ['-o', '--output', '', 'write the results to this JSON file', False],
+    ['-c', '--compare', '',
+        'compare with the results in this JSON file', False],
+    ['-k', '--scale', 0,
+        'run only this scale, in this process, and print its results as '
+        'JSON (used by the benchmark itself)', False]
+]
+POSITIONAL_ARGUMENTS = [
+    # each row is a list with 3 elements: name, type, help
+]
+ROOT = Path(__file__).resolve().parent.parent
+# for made-up place names
+SYLLABLES = (
+    'an', 'bình', 'cát', 'châu', 'chánh', 'diên', 'đại', 'điện', 'đông',
+    'đức', 'giang', 'hà', 'hải', 'hòa', 'hưng', 'khánh', 'lạc', 'lâm',
+    'long', 'lộc', 'minh', 'mỹ', 'nam', 'nghĩa', 'ninh', 'phong', 'phú',
+    'phước', 'quang', 'quế', 'sơn', 'tân', 'tây', 'thành', 'thăng',
+    'thuận', 'tiên', 'trà', 'trung', 'vĩnh', 'xuân', 'yên')
+STAGES = ('columns', 'group', 'parse', 'lookup', 'snapshot', 'export')
+# parse-stage calls to time: (label, object attribute path, method name)
+CALLS = (
+    ('PlaceParser.parse', 'parser', 'parse'),
+    ('Gazetteer.set_place', 'gazetteer', 'set_place'),
+    ('Gazetteer.lookup', 'gazetteer', 'lookup'),
+    ('CatalogIndex.add', 'names', 'add'),
+    ('CatalogIndex.lookup', 'names', 'lookup'),
+    ('PlaceParser._suggest_local', 'parser', '_suggest_local'),
+    ('ResolutionStore.set', 'store', 'set'),
+    ('StoreJournal.append', 'journal', 'append'),
+    ('stub wikidata', 'resolver', 'resolve'),
+    ('stub pycountry', 'countries', 'lookup'))
+
+
+class StubCountries:
+    """Stands in for CountryIndex: a record for every (ptype, name)"""
+
+    def __init__(self, names):
+        self.records = {}
+        for i, (ptype, name) in enumerate(sorted(names)):
+            record = {'name': name}
+            if ptype == 'province':
+                record['code'] = 'ZZ-{}'.format(i)
+            self.records[(ptype, name)] = record
+
+    def lookup(self, term, ptype, country=None):
+        try:
+            return self.records[(ptype, term)]
+        except KeyError:
+            raise LookupError(
+                'Could not find {} "{}"'.format(ptype, term)) from None
+
+
+def scaled_rows(rows, scale, seed=0):
+    """
+    Return scale copies of the raw inventory rows
+
+    The first copy is the inventory itself. In the others, districts,
+    communes and villages get names made up of Vietnamese syllables, one
+    made-up name per original name and copy, and cnumbers get a suffix.
+    """
+    rng = random.Random(seed)
+    used = set()
+    names = {}
+    scaled = []
+    for copy in range(scale):
+        for row in rows:
+            row = dict(row)
+            if copy:
+                row[FIELDS['cnumber']] += '.{}'.format(copy)
+                for k in ['district', 'commune', 'village']:
+                    heading = FIELDS[k]
+                    if not row[heading].strip():
+                        continue
+                    key = (k, row[heading], copy)
+                    try:
+                        row[heading] = names[key]
+                    except KeyError:
+                        row[heading] = names[key] = _made_up_name(rng, used)
+            scaled.append(row)
+    return scaled
+
+
+def stubs(columns):
+    """Return (wikidata, pycountry) stubs for the names in the columns"""
+    records = {}
+    countries = set()
+    for ptype in HIERARCHY[:-1]:
+        for name in set(columns[ptype]):
+            if not name:
+                continue
+            if ptype in ['country', 'province']:
+                countries.add((ptype, name))
+                continue
+            qid = 'Q{}'.format(900000000 + len(records))
+            records[(ptype, name)] = {
+                'id': qid, 'title': qid, 'repository': 'wikidata',
+                'url': '//www.wikidata.org/wiki/{}'.format(qid),
+                'concepturi': 'http://www.wikidata.org/entity/{}'.format(
+                    qid),
+                'label': name}
+    return StubResolver(records), StubCountries(countries)
+
+
+def run(infile, scale):
+    """Run the pipeline at one scale; return its results"""
+    rows = scaled_rows(list(read_rows(infile)), scale)
+    results = {'rows': len(rows), 'stages': {}, 'calls': {}}
+    stages = results['stages']
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        paths = []
+        for store in ['districts', 'communes', 'villages']:
+            path = tmp / '{}.json'.format(store)
+            shutil.copy(str(ROOT / 'data' / path.name), str(path))
+            paths.append(path)
+        start = time.perf_counter()
+        columns = load_columns(rows)
+        stages['columns'] = time.perf_counter() - start
+        start = time.perf_counter()
+        groups = group_hierarchies(columns)
+        stages['group'] = time.perf_counter() - start
+        resolver, countries = stubs(columns)
+        store = ResolutionStore(tmp / 'resolutions.db')
+        g = Gazetteer()
+        parser = PlaceParser(
+            *paths, g, resolver=resolver, resolutions=store,
+            interactive=True)
+        parser.countries = countries
+        targets = {
+            'parser': parser, 'gazetteer': g,
+            'names': g.catalog['names2pids'], 'resolver': resolver,
+            'countries': countries, 'store': store,
+            'journal': parser.journal}
+        calls = results['calls']
+        for label, target, method in CALLS:
+            obj = targets[target]
+            setattr(obj, method, _timed(
+                getattr(obj, method), calls.setdefault(label, [0, 0.0])))
+        start = time.perf_counter()
+        for hierarchy, cnumbers in groups.items():
+            parser.parse(
+                cnumbers=cnumbers, **dict(zip(HIERARCHY, hierarchy)))
+        stages['parse'] = time.perf_counter() - start
+        for label, target, method in CALLS:
+            # back to the plain methods for the later stages
+            delattr(targets[target], method)
+        names = [
+            (name, p.types[0], p.parent_pid())
+            for p in g.places.values() for name in p.names]
+        start = time.perf_counter()
+        for name, ptype, within in names:
+            g.lookup(name, ptype, within)
+        stages['lookup'] = time.perf_counter() - start
+        start = time.perf_counter()
+        g.save(tmp / 'snapshot.db')
+        stages['snapshot'] = time.perf_counter() - start
+        start = time.perf_counter()
+        export(g, tmp / 'places.geojson')
+        stages['export'] = time.perf_counter() - start
+        store.close()
+    results.update({
+        'hierarchies': len(groups),
+        'places': len(g.places), 'lookups': len(names),
+        'total': sum(stages.values()),
+        'rows_per_sec': len(rows) / sum(stages.values()),
+        'peak_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss})
+    return results
+
+
+def main(**kwargs):
+    """
+    main function
+    """
+    infile = kwargs['infile']
+    if infile == 'InventaireCampa.csv':
+        infile = ROOT / 'data' / infile
+    if kwargs['scale']:
+        print(json.dumps(run(infile, kwargs['scale'])))
+        return
+    report = {
+        'commit': _commit(), 'date': datetime.datetime.now().isoformat(),
+        'python': platform.python_version(), 'infile': str(infile),
+        'scales': {}}
+    for scale in [int(s) for s in kwargs['scales'].split(',')]:
+        result = subprocess.run(
+            [
+                sys.executable, str(Path(__file__).resolve()), '-i',
+                str(infile), '-k', str(scale)],
+            cwd=str(ROOT), capture_output=True, text=True)
+        if result.returncode:
+            sys.stderr.write(result.stderr)
+            sys.exit(result.returncode)
+        report['scales'][str(scale)] = json.loads(
+            result.stdout.splitlines()[-1])
+    previous = None
+    if kwargs['compare']:
+        with open(kwargs['compare'], 'r', encoding='utf-8') as fp:
+            previous = json.load(fp)
+        del fp
+        print('compared with {} ({})'.format(
+            previous['commit'], previous['date']))
+    for scale, results in report['scales'].items():
+        try:
+            before = previous['scales'][scale]
+        except (KeyError, TypeError):
+            before = None
+        print(
+            '×{}: {} rows, {} hierarchies, {} places'.format(
+                scale, results['rows'], results['hierarchies'],
+                results['places']))
+        lines = [
+            ('rows/sec', results['rows_per_sec'], '{:.0f}', 'rows_per_sec'),
+            ('peak RSS KiB', results['peak_rss_kib'], '{}', 'peak_rss_kib')]
+        lines += [
+            (stage, results['stages'][stage], '{:.3f} s', stage)
+            for stage in STAGES]
+        lines += [
+            ('  {} ({} calls)'.format(label, n), seconds, '{:.3f} s', label)
+            for label, (n, seconds) in results['calls'].items()]
+        for label, value, fmt, key in lines:
+            msg = '\t{:<36} {:>12}'.format(label, fmt.format(value))
+            try:
+                if key in STAGES:
+                    old = before['stages'][key]
+                elif key in results['calls']:
+                    old = before['calls'][key][1]
+                else:
+                    old = before[key]
+            except (KeyError, TypeError):
+                pass
+            else:
+                if old:
+                    msg += '  {:+.0%}'.format(value / old - 1)
+            print(msg)
+    if kwargs['output']:
+        with open(kwargs['output'], 'w', encoding='utf-8') as fp:
+            json.dump(report, fp, ensure_ascii=False, indent=4)
+        del fp
+
+
+def _commit():
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=str(ROOT),
+            capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def _made_up_name(rng, used):
+    size = 2
+    while True:
+        name = ' '.join([
+            rng.choice(SYLLABLES) for i in range(size)]).title()
+        if name not in used:
+            used.add(name)
+            return name
+        size += rng.random() < 0.2
+
+
+def _timed(fn, totals):
+    """Wrap fn to count its calls and add up its time in totals"""
+    perf_counter = time.perf_counter
+
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            totals[0] += 1
+            totals[1] += perf_counter() - start
+    return wrapper
+
+
+if __name__ == "__main__":
+    main(**configure_commandline(
+        OPTIONAL_ARGUMENTS, POSITIONAL_ARGUMENTS, DEFAULT_LOG_LEVEL))
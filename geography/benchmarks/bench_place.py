@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark CampaPlace construction time and memory per place
+"""
+
+from airtight.cli import configure_commandline
+from campa.geography.place import CampaPlace
+import gc
+import logging
+import time
+import tracemalloc
+
+DEFAULT_LOG_LEVEL = logging.WARNING
+OPTIONAL_ARGUMENTS = [
+    ['-l', '--loglevel', 'NOTSET',
+        'desired logging level (' +
+        'case-insensitive string: DEBUG, INFO, WARNING, or ERROR',
+        False],
+    ['-v', '--verbose', False, 'verbose output (logging level == INFO)',
+        False],
+    ['-w', '--veryverbose', False,
+        'very verbose output (logging level == DEBUG)', False],
+    ['-n', '--places', 20000, 'number of places to build', False]
+]
+POSITIONAL_ARGUMENTS = [
+    # each row is a list with 3 elements: name, type, help
+]
+# the shape of a village resolved through the wikidata store
+RECORD = {
+    'id': 'Q19013',
+    'title': 'Q19013',
+    'pageid': 22108,
+    'repository': 'wikidata',
+    'url': '//www.wikidata.org/wiki/Q19013',
+    'concepturi': 'http://www.wikidata.org/entity/Q19013',
+    'label': 'Phan Rang–Tháp Chàm',
+    'description': 'capital of Ninh Thuận province, Vietnam',
+    'match': {
+        'type': 'label', 'language': 'en', 'text': 'Phan Rang–Tháp Chàm'},
+    'name': 'Phan Rang–Tháp Chàm',
+    'project_name': 'Phan Rang'
+}
+
+
+def build(n):
+    places = []
+    for i in range(n):
+        places.append(CampaPlace(
+            pid='Q{}'.format(i), types=['village', 'PPA'], ptype='village',
+            **RECORD))
+    return places
+
+
+def main(**kwargs):
+    """
+    main function
+    """
+    n = kwargs['places']
+    build(100)
+    gc.collect()
+    start = time.perf_counter()
+    places = build(n)
+    elapsed = time.perf_counter() - start
+    del places
+    gc.collect()
+    tracemalloc.start()
+    places = build(n)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('construction: {:.2f} µs per place'.format(elapsed / n * 1e6))
+    print('memory: {:.0f} bytes per place'.format(size / n))
+
+
+if __name__ == "__main__":
+    main(**configure_commandline(
+        OPTIONAL_ARGUMENTS, POSITIONAL_ARGUMENTS, DEFAULT_LOG_LEVEL))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark import cost at startup with python -X importtime
+
+Each target (a module name, or a script path, which is run with -h) is
+imported in a fresh interpreter several times; the best total import
+time is reported along with the heaviest modules and which optional
+backends were loaded.
+"""
+
+from airtight.cli import configure_commandline
+import logging
+import os
+from pathlib import Path
+import re
+import subprocess
+import sys
+
+DEFAULT_LOG_LEVEL = logging.WARNING
+OPTIONAL_ARGUMENTS = [
+    ['-l', '--loglevel', 'NOTSET',
+        'desired logging level (' +
+        'case-insensitive string: DEBUG, INFO, WARNING, or ERROR',
+        False],
+    ['-v', '--verbose', False, 'verbose output (logging level == INFO)',
+        False],
+    ['-w', '--veryverbose', False,
+        'very verbose output (logging level == DEBUG)', False],
+    ['-r', '--repeat', 5, 'runs per target (the best is reported)', False],
+    ['-t', '--top', 8, 'number of heaviest imports to list', False],
+    ['-m', '--targets', '',
+        'comma-separated modules or scripts (default: the main package '
+        'modules and scripts/inv2geo.py)', False]
+]
+POSITIONAL_ARGUMENTS = [
+    # each row is a list with 3 elements: name, type, help
+]
+DEFAULT_TARGETS = [
+    'campa.geography.gazetteer', 'campa.geography.parser',
+    'campa.geography.incremental', 'scripts/inv2geo.py']
+# imports that only some runs need
+BACKENDS = [
+    'pycountry', 'numpy', 'wikidata', 'wikidata_suggest', 'colorama',
+    'concurrent.futures']
+RX_IMPORTTIME = re.compile(
+    r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$')
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure(target):
+    """Return {module: (self µs, cumulative µs, depth)} for one run"""
+    if target.endswith('.py'):
+        command = [sys.executable, '-X', 'importtime', target, '-h']
+    else:
+        command = [
+            sys.executable, '-X', 'importtime', '-c',
+            'import {}'.format(target)]
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [str(ROOT)] + [p for p in [env.get('PYTHONPATH')] if p])
+    result = subprocess.run(
+        command, cwd=str(ROOT), env=env, capture_output=True, text=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        m = RX_IMPORTTIME.match(line)
+        if m is None:
+            continue
+        own, cumulative, indent, name = m.groups()
+        modules[name] = (int(own), int(cumulative), len(indent) // 2)
+    return modules
+
+
+def main(**kwargs):
+    """
+    main function
+    """
+    targets = kwargs['targets']
+    if targets:
+        targets = [t.strip() for t in targets.split(',')]
+    else:
+        targets = DEFAULT_TARGETS
+    for target in targets:
+        best = None
+        for i in range(kwargs['repeat']):
+            modules = measure(target)
+            total = sum(
+                [c for o, c, depth in modules.values() if depth == 0])
+            if best is None or total < best[0]:
+                best = (total, modules)
+        total, modules = best
+        print('{}: {:.1f} ms in {} imports'.format(
+            target, total / 1000, len(modules)))
+        heaviest = sorted(
+            modules.items(), key=lambda x: x[1][0], reverse=True)
+        for name, (own, cumulative, depth) in heaviest[:kwargs['top']]:
+            print('\t{:8.1f} ms  {}'.format(own / 1000, name))
+        loaded = [b for b in BACKENDS if b in modules]
+        print('\tbackends loaded: {}'.format(', '.join(loaded) or 'none'))
+
+
+if __name__ == "__main__":
+    main(**configure_commandline(
+        OPTIONAL_ARGUMENTS, POSITIONAL_ARGUMENTS, DEFAULT_LOG_LEVEL))
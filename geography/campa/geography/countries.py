@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Index of the countries and subdivisions in scope for the inventory
+"""
+
+from campa.geography.indexing import RX_NON_ALNUM
+from campa.geography.logger import SelfLogger
+from campa.geography.norm import fold_key
+from campa.geography.place import CampaPlace
+import re
+from types import MappingProxyType
+
+COUNTRIES = ('VN', 'KH', 'LA', 'TH')
+# names used in the inventory (mostly French) that pycountry does not know:
+# (ptype, name): ISO 3166 code
+EXONYMS = {
+    ('country', 'Cambodge'): 'KH',
+    ('country', 'Laos'): 'LA',
+    ('country', 'Thaïlande'): 'TH',
+    ('country', 'Viêt Nam'): 'VN',
+    ('province', 'Đắk Lắk'): 'VN-33',
+    ('province', 'Hué'): 'VN-26',
+    ('province', 'Siem Reap'): 'KH-17',
+    ('province', 'Tourane'): 'VN-DN'
+}
+# "TP." / "Thành phố" (city) before a municipality's name
+RX_CITY_PREFIX = re.compile(r'^(tp|thanh-pho)\.?-')
+
+
+class CountryIndex(SelfLogger):
+    """
+    Country and subdivision records by (ptype, folded name)
+
+    Built once from pycountry for the countries in scope, so lookups are
+    single dict probes. Names, codes and exonyms are all indexed under a
+    key that ignores diacritics, case, spacing and punctuation, so that
+    e.g. "Khánh Hoà" finds pycountry's "Khánh Hòa". Subdivisions are also
+    indexed by country, so that a lookup given one (as an alpha_2 code)
+    only finds that country's subdivisions; without one, if two
+    subdivisions share a key, the one from the country listed first wins.
+    Records are read-only mappings holding only the fields CampaPlace has
+    setters for.
+    """
+
+    def __init__(self, countries=COUNTRIES, exonyms=EXONYMS):
+        # pycountry loads its databases on import, so only when needed
+        import pycountry
+        super().__init__()
+        self.index = {}
+        codes = {}
+        for alpha_2 in countries:
+            country = pycountry.countries.get(alpha_2=alpha_2)
+            record = self._record(country)
+            codes[alpha_2] = record
+            for field in [
+                    'name', 'common_name', 'official_name', 'alpha_2',
+                    'alpha_3']:
+                try:
+                    self._add('country', record[field], record)
+                except KeyError:
+                    pass
+        for alpha_2 in countries:
+            subdivisions = pycountry.subdivisions.get(country_code=alpha_2)
+            for subdivision in sorted(subdivisions, key=lambda s: s.code):
+                record = self._record(subdivision)
+                codes[record['code']] = record
+                self._add('province', record['name'], record, alpha_2)
+                self._add('province', record['code'], record, alpha_2)
+        for (ptype, name), code in exonyms.items():
+            self._add(ptype, name, codes[code], code.split('-')[0])
+
+    def lookup(self, term, ptype, country=None):
+        """
+        Return the record for term (in country, an alpha_2 code, if given);
+        raise LookupError if there is none
+        """
+        try:
+            if country is None:
+                return self.index[(ptype, self._key(term))]
+            return self.index[(ptype, self._key(term), country)]
+        except KeyError:
+            raise LookupError(
+                'Could not find {} "{}"'.format(ptype, term)) from None
+
+    def _add(self, ptype, name, record, country=None):
+        key = (ptype, self._key(name))
+        if key not in self.index:
+            self.index[key] = record
+        if country is not None:
+            key += (country,)
+            if key not in self.index:
+                self.index[key] = record
+
+    def _key(self, raw):
+        return RX_NON_ALNUM.sub('', RX_CITY_PREFIX.sub('', fold_key(raw)))
+
+    def _record(self, entry):
+        setters = CampaPlace._setters
+        return MappingProxyType({
+            k: v for k, v in entry._fields.items()
+            if k in setters or k.lower() in setters})
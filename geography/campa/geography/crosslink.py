@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cross-link place references in the EpiDoc corpus with the gazetteer
+"""
+
+from campa.geography.logger import SelfLogger
+from campa.geography.norm import fold_key
+from pathlib import Path
+import xml.etree.ElementTree as ET
+
+PLACE_REF_PREFIX = 'cic-geo:'
+PLACE_NAME_TAG = '{http://www.tei-c.org/ns/1.0}placeName'
+
+
+def scan_file(path):
+    """
+    Return (file id, {ref: count}, error) for the cic-geo: place refs in
+    one EpiDoc file
+
+    The file is read with iterparse and each element is cleared once it
+    has been seen, so memory use does not grow with the file. A file that
+    is not well-formed XML yields the refs read so far and the error
+    message.
+    """
+    path = Path(path)
+    refs = {}
+    error = None
+    try:
+        for event, elem in ET.iterparse(str(path), events=('start', 'end')):
+            if event == 'end':
+                elem.clear()
+                continue
+            if elem.tag != PLACE_NAME_TAG:
+                continue
+            for ref in elem.get('ref', '').split():
+                if not ref.startswith(PLACE_REF_PREFIX):
+                    continue
+                ref = ref[len(PLACE_REF_PREFIX):]
+                try:
+                    refs[ref] += 1
+                except KeyError:
+                    refs[ref] = 1
+    except ET.ParseError as err:
+        error = str(err)
+    return path.stem, refs, error
+
+
+def scan_corpus(paths, jobs=1):
+    """
+    Yield scan_file() results for many files, in order, in up to jobs
+    worker processes
+    """
+    paths = [str(p) for p in paths]
+    if jobs <= 1 or len(paths) < 2:
+        for path in paths:
+            yield scan_file(path)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    chunksize = max(1, len(paths) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for result in executor.map(scan_file, paths, chunksize=chunksize):
+            yield result
+
+
+class RefResolver(SelfLogger):
+    """
+    Resolve cic-geo: refs (place slugs) against a gazetteer
+
+    A ref resolves if it is a pid, or the last segment of exactly one
+    hierarchical pid ('drang-lai' for 'village/gia-lai/drang-lai'); a
+    segment shared by several pids is ambiguous. Corpus slugs are often
+    written without diacritics ('tra-kieu' for 'trà-kiệu'), so a ref that
+    folds to the same key as exactly one pid or last segment resolves as
+    a variant; one that folds to several pids is ambiguous. Otherwise it
+    is unresolved, and candidates are suggested from the gazetteer's fuzzy
+    name index.
+    """
+
+    def __init__(self, gazetteer, limit=3):
+        super().__init__()
+        self.gazetteer = gazetteer
+        self.limit = limit
+        self.slugs = {}
+        self.folded = {}
+        for pid in gazetteer.places:
+            self._add(self.folded, fold_key(pid), pid)
+            if '/' in pid:
+                slug = pid.rsplit('/', 1)[1]
+                self._add(self.slugs, slug, pid)
+                self._add(self.folded, fold_key(slug), pid)
+
+    def resolve(self, ref):
+        """
+        Return (status, pids): status is 'resolved', 'variant',
+        'ambiguous' or 'unresolved', and pids are the matching pids or,
+        if unresolved, candidates
+        """
+        if ref in self.gazetteer.places:
+            return 'resolved', [ref]
+        for status, index, key in [
+                ('resolved', self.slugs, ref),
+                ('variant', self.folded, fold_key(ref))]:
+            try:
+                pids = index[key]
+            except KeyError:
+                continue
+            if len(pids) == 1:
+                return status, list(pids)
+            return 'ambiguous', list(pids)
+        candidates = self.gazetteer.lookup_fuzzy(
+            ' '.join(ref.split('-')), limit=self.limit)
+        return 'unresolved', candidates
+
+    def _add(self, index, key, pid):
+        try:
+            index[key][pid] = None
+        except KeyError:
+            index[key] = {pid: None}
+
+
+def crosslink(gazetteer, paths, jobs=1):
+    """
+    Scan EpiDoc files and resolve their place refs against gazetteer
+
+    Returns (links, errors): links maps each distinct ref to a dict with
+    its status, pids and the {file id: count} of its occurrences; errors
+    maps file ids to XML parse errors.
+    """
+    resolver = RefResolver(gazetteer)
+    links = {}
+    errors = {}
+    for file_id, refs, error in scan_corpus(paths, jobs):
+        if error is not None:
+            errors[file_id] = error
+        for ref, count in refs.items():
+            try:
+                link = links[ref]
+            except KeyError:
+                status, pids = resolver.resolve(ref)
+                link = links[ref] = {
+                    'status': status, 'pids': pids, 'files': {}}
+            link['files'][file_id] = count
+    return links, errors
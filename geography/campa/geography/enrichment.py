@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Enrich the stores' wikidata records with data from the full entities
+
+The stores only hold what a wikidata search returns (id, label,
+description, concepturi). EntityFetcher gets the full entities of many
+QIDs at once with asyncio, a few requests at a time, and keeps a summary
+of each (coordinates, labels in a few languages, and P131 "located in"
+QIDs) in an EntityCache. enrich_stores() then adds these to the records.
+"""
+
+from campa.geography.logger import SelfLogger
+from campa.geography.stores import RX_QID
+import json
+import random
+import sqlite3
+import time
+
+ENTITY_URL = 'https://www.wikidata.org/wiki/Special:EntityData/{qid}.json'
+LANGUAGES = ('en', 'vi', 'fr')
+MAX_AGE = 30 * 24 * 3600
+STORES = ('districts', 'communes', 'villages')
+USER_AGENT = 'campa.geography (https://github.com/erc-dharma)'
+
+
+class FetchError(Exception):
+    """A request failed; retry says whether it may succeed later"""
+
+    def __init__(self, message, retry=False, delay=None):
+        super().__init__(message)
+        self.retry = retry
+        self.delay = delay
+
+
+def summarize(entity, languages=LANGUAGES):
+    """
+    Return the parts of a wikidata entity (as in Special:EntityData) that
+    the stores use: coordinates (P625), labels and P131 parents
+    """
+    claims = entity.get('claims', {})
+    summary = {
+        'labels': {
+            lang: entity['labels'][lang]['value']
+            for lang in languages if lang in entity.get('labels', {})},
+        'p131': [],
+        'coordinates': None}
+    for claim in claims.get('P131', []):
+        try:
+            summary['p131'].append(
+                claim['mainsnak']['datavalue']['value']['id'])
+        except KeyError:
+            pass
+    for claim in claims.get('P625', []):
+        try:
+            value = claim['mainsnak']['datavalue']['value']
+        except KeyError:
+            continue
+        summary['coordinates'] = [value['latitude'], value['longitude']]
+        break
+    return summary
+
+
+def store_qids(parser, stores=STORES):
+    """Return the QIDs of the records in the parser's stores, in order"""
+    qids = {}
+    for store in stores:
+        for key in getattr(parser, store).entities:
+            if RX_QID.match(key):
+                qids[key] = None
+    return list(qids)
+
+
+def enrich_stores(parser, summaries, stores=STORES):
+    """
+    Add coordinates (if missing), labels and p131 from summaries to the
+    records in the parser's stores; return the number of records changed
+
+    Changed records go through the parser's journal like any learned
+    entry, so they are saved by the next flush().
+    """
+    changed = 0
+    for store in stores:
+        records = getattr(parser, store)
+        for key, record in list(records.items()):
+            try:
+                summary = summaries[key]
+            except KeyError:
+                continue
+            if summary is None:
+                continue
+            enriched = dict(record)
+            if enriched.get('coordinates') is None and summary['coordinates']:
+                enriched['coordinates'] = summary['coordinates']
+            enriched['labels'] = summary['labels']
+            enriched['p131'] = summary['p131']
+            if enriched != record:
+                parser._learn(store, None, enriched)
+                changed += 1
+    return changed
+
+
+class EntityCache(SelfLogger):
+    """
+    On-disk (SQLite) cache of entity summaries, by QID
+
+    Entries older than max_age seconds count as missing. A summary of
+    None records that the entity does not exist (or was deleted).
+    """
+
+    def __init__(self, path, max_age=MAX_AGE):
+        super().__init__()
+        self.path = str(path)
+        self.max_age = max_age
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS entities ('
+            ' qid TEXT PRIMARY KEY, summary TEXT, fetched REAL NOT NULL)')
+        self.connection.commit()
+
+    def __len__(self):
+        cursor = self.connection.execute('SELECT COUNT(*) FROM entities')
+        return cursor.fetchone()[0]
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def commit(self):
+        self.connection.commit()
+
+    def get(self, qid):
+        """Return the fresh summary for qid; raise KeyError if there is none"""
+        cursor = self.connection.execute(
+            'SELECT summary, fetched FROM entities WHERE qid = ?', (qid,))
+        row = cursor.fetchone()
+        if row is None or time.time() - row[1] > self.max_age:
+            raise KeyError(qid)
+        return json.loads(row[0])
+
+    def set(self, qid, summary):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO entities (qid, summary, fetched) '
+            'VALUES (?, ?, ?)',
+            (qid, json.dumps(summary, ensure_ascii=False), time.time()))
+
+
+class EntityFetcher(SelfLogger):
+    """
+    Fetch entity summaries concurrently, through an EntityCache
+
+    Requests are plain urllib calls run in worker threads by asyncio: at
+    most concurrency at a time, and no more than rate per second. Failed
+    requests (network errors, HTTP 429 and 5xx) are retried up to retries
+    times, waiting backoff, 2 * backoff, 4 * backoff seconds and so on
+    (with jitter), or as long as the server's Retry-After asks. url is a
+    template with a {qid} field, so a local stand-in can be used instead
+    of wikidata.org.
+    """
+
+    def __init__(
+            self, cache, url=ENTITY_URL, concurrency=8, rate=10.0,
+            retries=4, backoff=1.0, timeout=30.0):
+        super().__init__()
+        self.cache = cache
+        self.url = url
+        self.concurrency = concurrency
+        self.rate = rate
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.stats = {}
+        self._next_start = 0.0
+
+    def fetch_all(self, qids):
+        """
+        Return {qid: summary} for qids, from the cache where it is fresh;
+        qids that could not be fetched are left out
+        """
+        import asyncio
+        logger = self._get_logger()
+        summaries = {}
+        missing = []
+        for qid in dict.fromkeys(qids):
+            try:
+                summaries[qid] = self.cache.get(qid)
+            except KeyError:
+                missing.append(qid)
+        self.stats = {
+            'cached': len(summaries), 'fetched': 0, 'retried': 0,
+            'failed': 0}
+        if missing:
+            try:
+                summaries.update(asyncio.run(self._fetch_all(missing)))
+            finally:
+                # keep what was fetched, whatever happened to the rest
+                self.cache.commit()
+        logger.info(
+            'entities: %s', ', '.join(
+                ['{} {}'.format(v, k) for k, v in self.stats.items()]))
+        return summaries
+
+    async def _fetch(self, qid, semaphore):
+        import asyncio
+        logger = self._get_logger()
+        url = self.url.format(qid=qid)
+        for attempt in range(self.retries + 1):
+            async with semaphore:
+                await self._throttle()
+                try:
+                    data = await asyncio.to_thread(self._get, url)
+                except FetchError as err:
+                    error = err
+                else:
+                    break
+            if not error.retry or attempt == self.retries:
+                logger.warning('could not fetch %s: %s', qid, error)
+                self.stats['failed'] += 1
+                return qid, False
+            delay = error.delay
+            if delay is None:
+                delay = self.backoff * 2 ** attempt * (
+                    0.5 + random.random())
+            logger.debug('retrying %s in %.1fs: %s', qid, delay, error)
+            self.stats['retried'] += 1
+            await asyncio.sleep(delay)
+        if data is None:
+            summary = None
+        else:
+            try:
+                entities = json.loads(data)['entities']
+                # a redirected QID comes back under its target's id
+                entity = entities.get(qid) or list(entities.values())[0]
+                summary = summarize(entity)
+            except (
+                    ValueError, LookupError, TypeError, AttributeError
+            ) as err:
+                logger.warning(
+                    'could not read entity %s: %s: %s',
+                    qid, type(err).__name__, err)
+                self.stats['failed'] += 1
+                return qid, False
+        self.cache.set(qid, summary)
+        self.stats['fetched'] += 1
+        return qid, summary
+
+    async def _fetch_all(self, qids):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        # the default executor has too few threads (cpus + 4) on small hosts
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=self.concurrency))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self._next_start = 0.0
+        results = await asyncio.gather(
+            *[self._fetch(qid, semaphore) for qid in qids])
+        return {
+            qid: summary for qid, summary in results if summary is not False}
+
+    def _get(self, url):
+        """GET url; return the body, or None if there is no such entity"""
+        from http.client import HTTPException
+        from urllib.error import HTTPError, URLError
+        from urllib.request import Request, urlopen
+        request = Request(url, headers={'User-Agent': USER_AGENT})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return response.read()
+        except HTTPError as err:
+            if err.code == 404:
+                return None
+            delay = None
+            try:
+                delay = float(err.headers.get('Retry-After'))
+            except (TypeError, ValueError):
+                pass
+            raise FetchError(
+                'HTTP {}'.format(err.code),
+                retry=err.code == 429 or err.code >= 500, delay=delay)
+        except (URLError, HTTPException, OSError) as err:
+            raise FetchError(str(err), retry=True)
+
+    async def _throttle(self):
+        """Space request starts at least 1 / rate seconds apart"""
+        import asyncio
+        if not self.rate:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start = max(now, self._next_start)
+        self._next_start = start + 1.0 / self.rate
+        if start > now:
+            await asyncio.sleep(start - now)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stream the gazetteer out as GeoJSON or Linked Places Format
+"""
+
+from campa.geography.journal import default_mode
+from campa.geography.logger import SelfLogger
+import json
+import os
+from pathlib import Path
+import tempfile
+
+FORMATS = ('geojson', 'lpf')
+LPF_CONTEXT = (
+    'https://raw.githubusercontent.com/LinkedPasts/linked-places/master/'
+    'linkedplaces-context-v1.1.jsonld')
+BASE_URI = 'cic-geo:'
+
+
+def geojson_feature(place, gazetteer):
+    """Return a GeoJSON Feature for place"""
+    properties = {
+        'title': _title(place),
+        'names': list(place.names),
+        'types': list(place.types),
+        'parent': _parent(place, gazetteer)
+    }
+    for k in ['description', 'identifiers', 'uris', 'same_as']:
+        v = getattr(place, k)
+        if v is not None:
+            properties[k] = list(v) if isinstance(v, tuple) else v
+    if place.cnumbers is not None:
+        properties['cnumbers'] = list(place.cnumbers)
+        properties['files'] = gazetteer.files_at(place.pid)
+    return {
+        'type': 'Feature',
+        'id': place.pid,
+        'geometry': _geometry(place),
+        'properties': properties
+    }
+
+
+def lpf_feature(place, gazetteer, base_uri=BASE_URI):
+    """Return a Linked Places Format (v1.1) Feature for place"""
+    feature = {
+        '@id': base_uri + place.pid,
+        'type': 'Feature',
+        'properties': {
+            'title': _title(place),
+            'ccodes': _ccodes(place, gazetteer)
+        },
+        'names': [
+            {'toponym': name} for name in place.names if name != place.pid],
+        'types': [{'label': t} for t in place.types],
+        'geometry': _geometry(place)
+    }
+    if place.same_as is not None:
+        feature['links'] = [
+            {'type': 'closeMatch', 'identifier': uri}
+            for uri in place.same_as]
+    parent = _parent(place, gazetteer)
+    if parent is not None:
+        feature['relations'] = [{
+            'relationType': 'gvp:broaderPartitive',
+            'relationTo': base_uri + parent}]
+    if place.description is not None:
+        feature['descriptions'] = [{'value': place.description}]
+    return feature
+
+
+def features(gazetteer, fmt='geojson', base_uri=BASE_URI):
+    """Yield the features of the gazetteer's places one at a time"""
+    if fmt == 'geojson':
+        for place in gazetteer.places.values():
+            yield geojson_feature(place, gazetteer)
+    elif fmt == 'lpf':
+        for place in gazetteer.places.values():
+            yield lpf_feature(place, gazetteer, base_uri)
+    else:
+        raise ValueError(
+            'unknown format "{}": expected one of {}'.format(
+                fmt, ', '.join(FORMATS)))
+
+
+class FeatureWriter(SelfLogger):
+    """
+    Write a FeatureCollection to an open text file one feature at a time
+
+    The collection's opening is written at once, each feature as it comes
+    and the closing by close(), so only one feature is ever held in
+    memory. Used as a context manager, it only closes the collection if
+    the body did not raise, so that a failed export is not valid JSON.
+    The bounding box of the features written so far is kept in bbox as
+    [west, south, east, north] (None until a feature has a geometry).
+    """
+
+    def __init__(self, fp, header=None):
+        super().__init__()
+        self.fp = fp
+        self.count = 0
+        self.bbox = None
+        head = json.dumps(
+            dict(header or {}, type='FeatureCollection'),
+            ensure_ascii=False)
+        fp.write(head[:-1] + ', "features": [')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+
+    def close(self):
+        self.fp.write('\n]}\n')
+
+    def write(self, feature):
+        if self.count:
+            self.fp.write(',')
+        self.fp.write('\n')
+        self.fp.write(json.dumps(
+            feature, ensure_ascii=False, separators=(',', ':')))
+        self.count += 1
+        geometry = feature['geometry']
+        if geometry is not None:
+            lon, lat = geometry['coordinates']
+            if self.bbox is None:
+                self.bbox = [lon, lat, lon, lat]
+            else:
+                bbox = self.bbox
+                bbox[0] = min(bbox[0], lon)
+                bbox[1] = min(bbox[1], lat)
+                bbox[2] = max(bbox[2], lon)
+                bbox[3] = max(bbox[3], lat)
+
+
+class ShardedWriter(SelfLogger):
+    """
+    Write features to a series of FeatureCollection files of up to
+    shard_size features each, e.g. for a web map to fetch as needed
+
+    Shards are named <stem>-0000<suffix>, <stem>-0001<suffix>, and so on,
+    in directory. close() writes a manifest, <stem>.json, listing each
+    shard with its number of features and bounding box. Used as a
+    context manager, it writes neither the end of the last shard nor the
+    manifest if the body raised.
+    """
+
+    def __init__(
+            self, directory, stem, shard_size, suffix='.geojson',
+            header=None):
+        super().__init__()
+        if shard_size < 1:
+            raise ValueError(
+                'shard_size must be positive, not {}'.format(shard_size))
+        self.directory = Path(directory)
+        self.stem = stem
+        self.shard_size = shard_size
+        self.suffix = suffix
+        self.header = header
+        self.shards = []
+        self._fp = None
+        self._writer = None
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+        elif self._fp is not None:
+            self._fp.close()
+            self._fp = self._writer = None
+
+    def close(self):
+        """Finish the last shard and write the manifest; return it"""
+        self._close_shard()
+        manifest = {
+            'features': sum([s['features'] for s in self.shards]),
+            'shards': self.shards}
+        path = self.directory / '{}.json'.format(self.stem)
+        with open(path, 'w', encoding='utf-8') as fp:
+            json.dump(manifest, fp, ensure_ascii=False, indent=4)
+        return manifest
+
+    def write(self, feature):
+        if self._writer is None or self._writer.count >= self.shard_size:
+            self._close_shard()
+            name = '{}-{:04d}{}'.format(
+                self.stem, len(self.shards), self.suffix)
+            self._fp = open(self.directory / name, 'w', encoding='utf-8')
+            self._writer = FeatureWriter(self._fp, self.header)
+            self.shards.append({'path': name})
+        self._writer.write(feature)
+
+    def _close_shard(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._fp.close()
+        self.shards[-1]['features'] = self._writer.count
+        self.shards[-1]['bbox'] = self._writer.bbox
+        self._fp = self._writer = None
+
+
+def export(gazetteer, path, fmt='geojson', shard_size=0, base_uri=BASE_URI):
+    """
+    Write the gazetteer to path as GeoJSON or LPF; return the number of
+    features written
+
+    If shard_size is positive, path names a directory, which is filled
+    with shards of up to shard_size features and a manifest named after
+    it (see ShardedWriter).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(
+            'unknown format "{}": expected one of {}'.format(
+                fmt, ', '.join(FORMATS)))
+    path = Path(path)
+    header = None
+    suffix = '.geojson'
+    if fmt == 'lpf':
+        header = {'@context': LPF_CONTEXT}
+        suffix = '.lpf.json'
+    stream = features(gazetteer, fmt, base_uri)
+    if shard_size > 0:
+        with ShardedWriter(
+                path, path.name, shard_size, suffix, header) as writer:
+            for feature in stream:
+                writer.write(feature)
+        return sum([s['features'] for s in writer.shards])
+    # written next to path and renamed once complete, so that path is
+    # never left holding a partial export
+    fd, tmp = tempfile.mkstemp(
+        dir=str(path.parent), prefix=path.name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as fp:
+            with FeatureWriter(fp, header) as writer:
+                for feature in stream:
+                    writer.write(feature)
+        default_mode(tmp)
+        os.replace(tmp, str(path))
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return writer.count
+
+
+def _ccodes(place, gazetteer):
+    """ISO 3166-1 alpha-2 code(s) of the place's country"""
+    country = place
+    if place.country is not None:
+        try:
+            country = gazetteer.places[place.country['pid']]
+        except KeyError:
+            return []
+    try:
+        return list(country.identifiers['ISO 3166-1']['alpha-2'])
+    except (KeyError, TypeError):
+        return []
+
+
+def _geometry(place):
+    if place.coordinates is None:
+        return None
+    lat, lon = place.coordinates
+    return {'type': 'Point', 'coordinates': [lon, lat]}
+
+
+def _parent(place, gazetteer):
+    """pid of the place immediately containing place, or None"""
+    ancestors = gazetteer.ancestors(place.pid)
+    if ancestors:
+        return ancestors[-1]
+    return None
+
+
+def _title(place):
+    """The first name that is not just the pid (e.g. a wikidata QID)"""
+    for name in place.names:
+        if name != place.pid:
+            return name
+    return place.pid
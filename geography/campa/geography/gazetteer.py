@@ -4,75 +4,324 @@
 Gazetteer class for Campā parser
 """
 
-from campa.geography.indexing import PlaceIndexByName
+from campa.geography.indexing import (
+    ContainmentIndex, FuzzyNameIndex, PlaceIndexByName)
+from campa.geography.inscriptions import InscriptionIndex
 from campa.geography.logger import SelfLogger
+from campa.geography.snapshot import read_snapshot, write_snapshot
+from campa.geography.spatial import SpatialIndex
+from copy import deepcopy
+import logging
 from pprint import pprint
+import time
+
+
+class AmbiguousLookupError(LookupError):
+    """A name matches several places; pids lists them"""
+
+    def __init__(self, term, pids):
+        super().__init__('{} is ambiguous: {}'.format(term, ', '.join(pids)))
+        self.pids = pids
 
 
 class Gazetteer(SelfLogger):
+    """
+    Places by pid, with catalog indexes over them
+
+    If trace is set to a list, lookup() and set_place() append a record
+    of each call to it (see campa.geography.incremental). If profile is
+    set to a RunProfile, they are timed and counted in it.
+    """
 
     def __init__(self):
         super().__init__()
         self.places = {}
+        self.trace = None
+        self.profile = None
         self.catalog = {
-            'names2pids': PlaceIndexByName()
+            'names2pids': PlaceIndexByName(),
+            'fuzzy': FuzzyNameIndex(),
+            'containment': ContainmentIndex(),
+            'spatial': SpatialIndex(),
+            'inscriptions': InscriptionIndex()
         }
 
+    def add_files(self, file_ids):
+        """
+        Record the EpiDoc files (ids or paths) of the inscriptions, so that
+        files_at() and places_for_file() can find them
+        """
+        inscriptions = self.catalog['inscriptions']
+        for file_id in file_ids:
+            inscriptions.add_file(file_id)
+
+    def ancestors(self, pid):
+        """
+        Return the pids of the places containing pid, outermost first;
+        raise KeyError if there is no place pid
+        """
+        return self.catalog['containment'].ancestors(pid)
+
+    def attach_cnumber(self, pid, cnumber):
+        """Record that inscription cnumber was found at place pid"""
+        place = self.places[pid]
+        place.set_cnumber(cnumber)
+        self.catalog['inscriptions'].add(pid, cnumber)
+
+    def cnumbers_under(self, pid):
+        """
+        Return the cnumbers found at pid or anywhere within it; raise
+        KeyError if there is no place pid
+        """
+        cnumbers = {}
+        for p in [pid] + self.descendants(pid):
+            place = self.places[p]
+            if place.cnumbers is not None:
+                cnumbers.update(place.cnumbers)
+        return list(cnumbers)
+
+    def descendants(self, pid):
+        """Return the pids of the places within pid, depth first"""
+        return self.catalog['containment'].descendants(pid)
+
     def dump(self):
         for pid, place in self.places.items():
             msg = [pid]
-            for k, v in place.__dict__.items():
-                if k in ['gazetteer', 'pid']:
+            for k, v in place.to_dict().items():
+                if k == 'pid':
                     continue
                 msg.append('\t{}: {}'.format(k, v))
             print('\n'.join(msg))
 
+    def files_at(self, pid):
+        """Return the ids of the EpiDoc files of the inscriptions at pid"""
+        return self.catalog['inscriptions'].files_at(pid)
+
+    @classmethod
+    def load(cls, path):
+        """Return a gazetteer read from a snapshot written by save()"""
+        return read_snapshot(path, cls())
+
+    def merge(self, other):
+        """
+        Merge the places of another gazetteer (e.g. from a worker process)
+        in order, through set_place
+        """
+        for place in other.places.values():
+            place.gazetteer = self
+            self.set_place(place)
+
+    def nearby(self, pid, km):
+        """
+        Return (pid, km) pairs for the other places with coordinates
+        within km of place pid, nearest first
+        """
+        coordinates = self.places[pid].coordinates
+        if coordinates is None:
+            raise ValueError('{} has no coordinates'.format(pid))
+        return [
+            hit for hit in self.catalog['spatial'].radius(*coordinates, km)
+            if hit[0] != pid]
+
+    def places_for_cnumber(self, cnumber):
+        """Return the pids of the places where cnumber was found"""
+        return self.catalog['inscriptions'].pids(cnumber)
+
+    def places_for_file(self, file_id):
+        """Return the pids of the places of the inscription in file_id"""
+        return self.catalog['inscriptions'].pids_for_file(file_id)
+
+    def reindex(self, names=True):
+        """
+        Rebuild the catalog indexes from the places (except the name
+        index, if names is False); the file ids recorded with add_files()
+        are kept
+        """
+        file_ids = self.catalog['inscriptions'].file_ids()
+        self.catalog['inscriptions'] = InscriptionIndex()
+        self.add_files(file_ids)
+        self.catalog['fuzzy'] = FuzzyNameIndex()
+        self.catalog['containment'] = ContainmentIndex()
+        self.catalog['spatial'] = SpatialIndex()
+        if names:
+            self.catalog['names2pids'] = PlaceIndexByName()
+            self.catalog['names2pids'].add_many(self.places.values())
+        for place in self.places.values():
+            self._index_place(place, names=False)
+
+    def save(self, path):
+        """Write the places and name indexes to an SQLite snapshot"""
+        write_snapshot(path, self)
+
     def set_place(self, place, overwrite=False):
         """Add a place to the gazetteer"""
+        if self.profile is None:
+            return self._set_place(place, overwrite)
+        start = time.perf_counter()
+        try:
+            return self._set_place(place, overwrite)
+        finally:
+            self.profile.time(
+                'gazetteer.set_place', time.perf_counter() - start)
+
+    def lookup(self, term, ptype=None, within=None):
+        """
+        Lookup term using pids and names
+
+        A name only finds places of type ptype, if given. Should it still
+        name several, within (a pid) picks the one inside that place, or
+        the one directly inside it; if that leaves more than one,
+        AmbiguousLookupError (a LookupError) is raised.
+        """
+        if self.profile is None:
+            return self._lookup(term, ptype, within)
+        start = time.perf_counter()
+        try:
+            return self._lookup(term, ptype, within)
+        finally:
+            self.profile.time('gazetteer.lookup', time.perf_counter() - start)
+
+    def lookup_fuzzy(self, term, limit=5):
+        """
+        Return up to limit pids whose names resemble term, best first
+
+        Spelling variants that differ only in diacritics, case, spacing or
+        hyphenation come first, then near misses by edit distance.
+        """
+        matches = self.catalog['fuzzy'].lookup(term, limit=limit)
+        return [pid for pid, score in matches]
+
+    def _set_place(self, place, overwrite=False):
         logger = self._get_logger()
+        if not place.pid:
+            raise ValueError(
+                'refusing a place without a pid: {}'.format(
+                    ', '.join(place.names)))
+        if not overwrite:
+            self._qualify_pid(place)
+        if self.trace is not None:
+            d = place.to_dict()
+            d.pop('cnumbers', None)
+            self.trace.append(
+                ['set', deepcopy(d), self.places.get(place.pid) is place])
         try:
             prior = self.places[place.pid]
         except KeyError:
             self.places[place.pid] = place
-            msg = (
-                'Added new place entry to gazetteer:\n'
-                '\t{}: {} ({})'
-                ''.format(place.pid, ', '.join(place.names), '/'.join(place.types))
-            )
-            logger.info(msg)
+            if self.profile is not None:
+                self.profile.count('gazetteer.added')
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    'Added new place entry to gazetteer:\n\t%s: %s (%s)',
+                    place.pid, ', '.join(place.names), '/'.join(place.types))
         else:
             if overwrite:
                 logger.warning(
                     'Overwriting {}'.format(place.pid)
                 )
                 self.places[place.pid] = place
+            elif place is prior:
+                # the parser may have amended the stored place (e.g. with
+                # the inventory's spelling of a wikidata place's name)
+                self._index_names(prior)
+                return
+            elif place.fingerprint() != prior.fingerprint():
+                if place.cnumbers is not None:
+                    for cnumber in place.cnumbers:
+                        self.catalog['inscriptions'].add(prior.pid, cnumber)
+                prior.merge(place)
+                logger.debug('merged new content into %s', prior.pid)
+                if self.profile is not None:
+                    self.profile.count('gazetteer.merged')
+                self._index_place(prior, cnumbers=False)
+                return
             else:
-                if place != prior:
-                    if dir(prior) != dir(prior):
-                        raise NotImplementedError('field name mismatch')
-                    for k, v in prior.__dict__.items():
-                        new_v = getattr(place, k)
-                        if v != new_v:
-                            raise NotImplementedError(
-                                '{}: {} vs. {}'.format(k, v, new_v))
-            return
-        self.catalog['names2pids'].add(place)
+                if place.cnumbers is not None:
+                    for cnumber in place.cnumbers:
+                        self.attach_cnumber(prior.pid, cnumber)
+                if self.profile is not None:
+                    self.profile.count('gazetteer.unchanged')
+                return
+        self._index_place(place)
 
-    def lookup(self, term):
-        """Lookup term using pids and names"""
+    def _lookup(self, term, ptype=None, within=None):
         hit = None
         try:
             hit = self.places[term]
         except KeyError:
-            pids = self.catalog['names2pids'].lookup(term)
+            try:
+                pids = self.catalog['names2pids'].lookup(term)
+            except KeyError:
+                if self.trace is not None:
+                    self.trace.append(['lookup', [term, ptype, within], None])
+                raise
+            if ptype is not None:
+                pids = [
+                    pid for pid in pids
+                    if pid in self.places and ptype in self.places[pid].types]
+            if len(pids) > 1 and within is not None:
+                paths = self.catalog['containment'].paths
+                pids = [pid for pid in pids if within in paths.get(pid, ())]
+                children = [pid for pid in pids if paths[pid][-1] == within]
+                if len(children) == 1:
+                    pids = children
             if len(pids) > 1:
-                raise NotImplementedError(pids)
+                pids = list(pids)
+                if self.trace is not None:
+                    self.trace.append(['lookup', [term, ptype, within], pids])
+                raise AmbiguousLookupError(term, pids)
             elif len(pids) == 1:
                 try:
-                    hit = self.places[pids[0]]
+                    hit = self.places[next(iter(pids))]
                 except KeyError:
                     pass
+        if self.trace is not None:
+            self.trace.append([
+                'lookup', [term, ptype, within],
+                False if hit is None else hit.pid])
         if hit is None:
             raise LookupError('Could not find {}'.format(term))
         else:
             return hit
+
+    def _qualify_pid(self, place):
+        """
+        Give place a pid qualified by its level (e.g. 'commune/Q123') if
+        its pid is that of a place at other administrative levels
+        """
+        try:
+            prior = self.places[place.pid]
+        except KeyError:
+            return
+        if prior is place:
+            return
+        levels = place.levels()
+        prior_levels = prior.levels()
+        if not levels or not prior_levels or set(levels) & set(prior_levels):
+            return
+        # e.g. a district and one of its communes that share a name:
+        # different places, whatever their pids say
+        pid = '{}/{}'.format(levels[0], place.pid)
+        self._get_logger().warning(
+            '%s is a %s, not a %s: keeping it apart as %s', place.pid,
+            '/'.join(levels), '/'.join(prior_levels), pid)
+        place.set_pid(pid)
+
+    def _index_names(self, place, names=True):
+        if names:
+            self.catalog['names2pids'].add(place)
+        for name in place.names:
+            self.catalog['fuzzy'].add(name, place.pid)
+
+    def _index_place(self, place, names=True, cnumbers=True):
+        if self.profile is not None:
+            start = time.perf_counter()
+        self._index_names(place, names)
+        self.catalog['containment'].add(place)
+        if place.coordinates is not None:
+            self.catalog['spatial'].add(place.pid, *place.coordinates)
+        if cnumbers and place.cnumbers is not None:
+            for cnumber in place.cnumbers:
+                self.catalog['inscriptions'].add(place.pid, cnumber)
+        if self.profile is not None:
+            self.profile.time('gazetteer.index', time.perf_counter() - start)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Incremental gazetteer builds from a changed inventory
+
+A full build parses each distinct hierarchy of the inventory in turn.
+Parsing a hierarchy depends only on its values, on the parser's stores
+and on what Gazetteer.lookup() answers along the way, and its only
+effects on the gazetteer are the places it passes to set_place(). An
+incremental build records those lookups and places (a trace) for each
+hierarchy in the snapshot, and on the next run replays the trace instead
+of parsing whenever every recorded lookup still gets the same answer.
+Hierarchies that are new, or whose lookups now answer differently, are
+parsed. Since the gazetteer is rebuilt from empty in inventory order,
+places and cnumbers that only came from deleted rows simply never come
+back, and the result is the same as that of a full build.
+"""
+
+from campa.geography.gazetteer import AmbiguousLookupError
+from campa.geography.inventory import (
+    FIELDS, HIERARCHY, group_hierarchies, load_columns)
+from campa.geography.logger import SelfLogger
+from campa.geography.place import CampaPlace
+from campa.geography.snapshot import (
+    FORMAT_VERSION, read_meta, read_snapshot, read_table, write_snapshot)
+import hashlib
+import json
+from pathlib import Path
+import sqlite3
+
+TRACE_VERSION = '3'
+ROW_KEY = ('N° C.', 'Extension')
+
+
+def row_hashes(rows, fields=FIELDS, key=ROW_KEY):
+    """
+    Return {row key: content hash} for raw inventory rows, in order
+
+    The key is N° C. and Extension, which are not unique on their own, so
+    repeats are numbered (e.g. '8/#2'); the hash covers the columns the
+    gazetteer is built from.
+    """
+    hashes = {}
+    counts = {}
+    for row in rows:
+        k = '/'.join([row.get(heading, '') for heading in key])
+        try:
+            counts[k] += 1
+        except KeyError:
+            counts[k] = 1
+        else:
+            k = '{}#{}'.format(k, counts[k])
+        hashes[k] = hashlib.sha1(json.dumps(
+            [row[heading] for heading in fields.values()],
+            ensure_ascii=False).encode('utf-8')).hexdigest()
+    return hashes
+
+
+class IncrementalBuilder(SelfLogger):
+    """
+    Build parser.gazetteer from inventory rows, reusing the traces kept
+    in the snapshot at path by the previous build
+    """
+
+    def __init__(self, parser, path):
+        super().__init__()
+        self.parser = parser
+        self.gazetteer = parser.gazetteer
+        self.path = Path(path)
+        self.stats = {}
+
+    def build(self, rows, fields=FIELDS):
+        """
+        Build the gazetteer from raw inventory rows and save the snapshot
+
+        Returns a dict of statistics about what was reused.
+        """
+        logger = self._get_logger()
+        rows = list(rows)
+        hashes = row_hashes(rows, fields)
+        digest = self.parser.digest()
+        previous, traces = self._read_previous(digest)
+        added = [k for k in hashes if k not in previous]
+        changed = [
+            k for k in hashes if k in previous and previous[k] != hashes[k]]
+        deleted = [k for k in previous if k not in hashes]
+        self.stats = {
+            'rows': len(hashes), 'added': len(added),
+            'changed': len(changed), 'deleted': len(deleted),
+            'replayed': 0, 'parsed': 0}
+        logger.info(
+            'rows: %s added, %s changed, %s deleted of %s',
+            len(added), len(changed), len(deleted), len(hashes))
+        groups = group_hierarchies(load_columns(rows, fields))
+        keys = [json.dumps(h, ensure_ascii=False) for h in groups]
+        if (
+            traces is not None and not (added or changed or deleted)
+            and list(previous) == list(hashes)
+            and all([k in traces for k in keys])
+        ):
+            read_snapshot(self.path, self.gazetteer)
+            self.stats['replayed'] = len(keys)
+            logger.info('inventory unchanged; loaded %s', self.path)
+            return self.stats
+        revision = self.parser.revision
+        recorded = {}
+        for key, (hierarchy, cnumbers) in zip(keys, groups.items()):
+            try:
+                events = traces[key]
+            except (KeyError, TypeError):
+                events = None
+            if (
+                events is not None and self.parser.revision == revision
+                and self._replay(events, cnumbers)
+            ):
+                self.stats['replayed'] += 1
+                recorded[key] = (self.parser.revision, events)
+                continue
+            self.stats['parsed'] += 1
+            recorded[key] = (self.parser.revision, self._parse(
+                hierarchy, cnumbers))
+        # traces from before the stores last changed may not be repeatable
+        revision = self.parser.revision
+        self._save(hashes, {
+            k: events for k, (r, events) in recorded.items()
+            if r == revision})
+        logger.info(
+            'replayed %s and parsed %s hierarchies',
+            self.stats['replayed'], self.stats['parsed'])
+        return self.stats
+
+    def _attach(self, pid, cnumbers):
+        for cnumber in cnumbers:
+            if self.parser._present('cnumber', cnumber):
+                self.gazetteer.attach_cnumber(pid, cnumber)
+
+    def _parse(self, hierarchy, cnumbers):
+        """Parse a hierarchy, returning its trace"""
+        g = self.gazetteer
+        g.trace = []
+        try:
+            self.parser.parse(
+                cnumbers=cnumbers, **dict(zip(HIERARCHY, hierarchy)))
+            return g.trace
+        finally:
+            g.trace = None
+
+    def _read_previous(self, digest):
+        """
+        Return the previous (row hashes, traces), with traces None if they
+        cannot be reused
+        """
+        logger = self._get_logger()
+        if not self.path.exists():
+            return {}, None
+        try:
+            meta = read_meta(self.path)
+            rows = read_table(self.path, 'inventory_rows')
+            traces = read_table(self.path, 'traces')
+        except sqlite3.DatabaseError as err:
+            logger.warning(
+                'ignoring unreadable snapshot %s: %s', self.path, err)
+            return {}, None
+        if rows is None or traces is None:
+            return {}, None
+        previous = dict(rows)
+        if (
+            meta.get('format') != FORMAT_VERSION
+            or meta.get('traces') != TRACE_VERSION
+        ):
+            logger.info('snapshot has no usable traces; full rebuild')
+            return previous, None
+        if meta.get('digest') != digest:
+            logger.info('stores or resolutions have changed; full rebuild')
+            return previous, None
+        return previous, {k: json.loads(v) for k, v in traces}
+
+    def _replay(self, events, cnumbers):
+        """
+        Apply a hierarchy's trace; return False, having applied only what
+        parsing it would apply anyway, as soon as a lookup answers
+        differently
+        """
+        g = self.gazetteer
+        pid = None
+        for kind, a, b in events:
+            if kind == 'lookup':
+                try:
+                    hit = g.lookup(*a).pid
+                except AmbiguousLookupError as err:
+                    hit = err.pids
+                except KeyError:
+                    hit = None
+                except LookupError:
+                    hit = False
+                if hit != b:
+                    return False
+                continue
+            place = CampaPlace.from_dict(a, gazetteer=g)
+            if b:
+                # the parser amended the stored place itself
+                prior = g.places[place.pid]
+                prior.merge(place)
+                g.set_place(prior)
+            else:
+                g.set_place(place)
+            pid = place.pid
+        if pid is not None:
+            self._attach(pid, cnumbers)
+        return True
+
+    def _save(self, hashes, traces):
+        write_snapshot(
+            self.path, self.gazetteer,
+            meta={'traces': TRACE_VERSION, 'digest': self.parser.digest()},
+            tables={
+                'inventory_rows': (
+                    ('key TEXT PRIMARY KEY', 'hash TEXT NOT NULL'),
+                    list(hashes.items())),
+                'traces': (
+                    ('hierarchy TEXT PRIMARY KEY', 'events TEXT NOT NULL'),
+                    [
+                        (k, json.dumps(v, ensure_ascii=False))
+                        for k, v in traces.items()])})
@@ -5,10 +5,21 @@ Indexing classes
 """
 
 from campa.geography.logger import SelfLogger
-from campa.geography.norm import norm
+from campa.geography.norm import fold_key, index_key
+import re
+
+RX_NON_ALNUM = re.compile(r'[\W_]+')
 
 
 class CatalogIndex(SelfLogger):
+    """
+    Map normalized terms to targets, and normalized targets back to terms
+
+    Buckets are dicts used as ordered sets, so inserts and membership are
+    O(1) and results come back in insertion order. lookup() returns a
+    bucket's keys view rather than a copy, so it is O(1) however many
+    targets a term has.
+    """
 
     def __init__(self, title):
         super().__init__()
@@ -26,31 +37,57 @@ class CatalogIndex(SelfLogger):
                 'targets is {} expected "list" or "str"'.format(type(targets)))
         nterm = self._norm_term(term)
         try:
-            self.index[nterm]
+            bucket = self.index[nterm]
         except KeyError:
-            self.index[nterm] = target_list
-        else:
-            self.index[nterm].extend(target_list)
-        self.index[nterm] = list(set(self.index[nterm]))
+            bucket = self.index[nterm] = {}
         for t in target_list:
-            nt = self._norm_term(t)
-            try:
-                self.reverse_index[nt]
-            except KeyError:
-                self.reverse_index[nt] = []
-            if term not in self.reverse_index[nt]:
-                self.reverse_index[nt].append(term)
-            self.reverse_index[nt] = list(set(self.reverse_index[nt]))
+            bucket[t] = None
+            self._set_reverse(self._norm_term(t), term)
+
+    def load_pairs(self, pairs, reverse_pairs):
+        """
+        Restore the index from (nterm, target) and (ntarget, term) pairs,
+        as returned by pairs() and reverse_pairs()
+        """
+        for index, source in [
+                (self.index, pairs), (self.reverse_index, reverse_pairs)]:
+            for k, v in source:
+                try:
+                    index[k][v] = None
+                except KeyError:
+                    index[k] = {v: None}
 
     def lookup(self, term):
-        return self.index[self._norm_term(term)]
+        """
+        Return the targets of term as a read-only view, in insertion order;
+        raise KeyError if there are none
+        """
+        return self.index[self._norm_term(term)].keys()
 
     def lookup_reverse(self, target):
-        return self.reverse_index[self._norm_term(target)]
+        """As lookup(), from a target to the terms that name it"""
+        return self.reverse_index[self._norm_term(target)].keys()
+
+    def pairs(self):
+        """Yield (normalized term, target) pairs in insertion order"""
+        for nterm, bucket in self.index.items():
+            for target in bucket:
+                yield nterm, target
+
+    def reverse_pairs(self):
+        """Yield (normalized target, term) pairs in insertion order"""
+        for ntarget, bucket in self.reverse_index.items():
+            for term in bucket:
+                yield ntarget, term
 
     def _norm_term(self, raw):
-        cooked = norm(raw)
-        return '-'.join(cooked.lower().split())
+        return index_key(raw)
+
+    def _set_reverse(self, ntarget, term):
+        try:
+            self.reverse_index[ntarget][term] = None
+        except KeyError:
+            self.reverse_index[ntarget] = {term: None}
 
 
 class PlaceIndexByName(CatalogIndex):
@@ -59,5 +96,223 @@ class PlaceIndexByName(CatalogIndex):
         super().__init__('PlaceIndexByName')
 
     def add(self, place):
-        for name in place.names:
-            self.set_term(name, place.pid)
+        self.add_many([place])
+
+    def add_many(self, places):
+        """Index the names of many places, normalizing each name once"""
+        index = self.index
+        for place in places:
+            pid = place.pid
+            npid = self._norm_term(pid)
+            for name in place.names:
+                nname = self._norm_term(name)
+                try:
+                    index[nname][pid] = None
+                except KeyError:
+                    index[nname] = {pid: None}
+                self._set_reverse(npid, name)
+
+
+class ContainmentIndex(SelfLogger):
+    """
+    Tree of places under their most specific parent reference
+
+    A place hangs under the nearest of its village, commune, district,
+    province and country references that carries a pid. The ancestor path
+    of every place is precomputed, so ancestors() is a single lookup and
+    descendants() walks only the subtree asked for.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.parents = {}
+        self.children = {}
+        self.paths = {}
+
+    def add(self, place):
+        pid = place.pid
+        parent = place.parent_pid()
+        if parent == pid:
+            # e.g. a province record that names its own province
+            parent = None
+        elif parent is not None and pid in self.paths.get(parent, ()):
+            logger = self._get_logger()
+            logger.warning(
+                'ignoring parent %s of %s: it would make a cycle',
+                parent, pid)
+            parent = None
+        try:
+            prior = self.parents[pid]
+        except KeyError:
+            prior = None
+        else:
+            if prior == parent:
+                return
+            del self.children[prior][pid]
+            del self.parents[pid]
+        if parent is not None:
+            self.parents[pid] = parent
+            try:
+                self.children[parent][pid] = None
+            except KeyError:
+                self.children[parent] = {pid: None}
+        elif prior is None and pid in self.paths:
+            return
+        self._set_paths(pid)
+
+    def ancestors(self, pid):
+        """
+        Return the pids of the ancestors of pid, outermost first; raise
+        KeyError if pid was never added
+        """
+        return list(self.paths[pid])
+
+    def descendants(self, pid):
+        """
+        Return the pids of everything under pid, depth first (none if
+        pid is unknown)
+        """
+        result = []
+        stack = list(reversed(self.children.get(pid, ())))
+        while stack:
+            child = stack.pop()
+            result.append(child)
+            try:
+                stack.extend(reversed(self.children[child]))
+            except KeyError:
+                pass
+        return result
+
+    def _set_paths(self, pid):
+        """(Re)compute the paths of pid and of everything under it"""
+        stack = [pid]
+        while stack:
+            pid = stack.pop()
+            try:
+                parent = self.parents[pid]
+            except KeyError:
+                self.paths[pid] = ()
+            else:
+                self.paths[pid] = self.paths.get(parent, ()) + (parent,)
+            try:
+                stack.extend(self.children[pid])
+            except KeyError:
+                pass
+
+
+class FuzzyNameIndex(SelfLogger):
+    """
+    Diacritic-insensitive, typo-tolerant index of names
+
+    Names are reduced to a folded key (no diacritics, case, spaces or
+    punctuation) and indexed by character n-grams. lookup() collects the keys
+    sharing n-grams with the term and ranks them by edit distance.
+    """
+
+    def __init__(self, n=3):
+        super().__init__()
+        self.n = n
+        self.keys = {}
+        self.grams = {}
+        self.sizes = {}
+
+    def add(self, name, target):
+        key = self._key(name)
+        if not key:
+            # e.g. "?": nothing to match on
+            return
+        try:
+            self.keys[key][target] = None
+        except KeyError:
+            self.keys[key] = {target: None}
+            grams = self._grams(key)
+            self.sizes[key] = len(grams)
+            for gram in grams:
+                try:
+                    self.grams[gram][key] = None
+                except KeyError:
+                    self.grams[gram] = {key: None}
+
+    def lookup(self, term, limit=5, threshold=0.5):
+        """
+        Return up to limit (target, score) pairs, best first
+
+        score is 1.0 for names that differ only in diacritics, case,
+        spacing or hyphenation, and falls with edit distance.
+        """
+        key = self._key(term)
+        if not key:
+            return []
+        grams = self._grams(key)
+        empty = {}
+        postings = sorted(
+            [self.grams.get(gram, empty) for gram in grams], key=len)
+        # a key scoring threshold or more is at most max_edits edits away,
+        # and each edit loses at most n of the term's n-grams, so such a
+        # key shares at least min_shared of them and must turn up in the
+        # postings of the term's len(grams) - min_shared + 1 rarest n-grams
+        if threshold > 0:
+            max_edits = int((1 - threshold) * len(key) / threshold + 1e-9)
+            min_shared = len(grams) - self.n * max_edits
+        else:
+            min_shared = 0
+        probe = len(postings)
+        if min_shared > 0:
+            probe = len(postings) - min_shared + 1
+        shared = {}
+        for keys in postings[:probe]:
+            for k in keys:
+                try:
+                    shared[k] += 1
+                except KeyError:
+                    shared[k] = 1
+        for keys in postings[probe:]:
+            for k in shared:
+                if k in keys:
+                    shared[k] += 1
+        scored = []
+        for k, count in shared.items():
+            if count < min_shared:
+                continue
+            # skip keys sharing too few n-grams to be worth an edit distance
+            if 2 * count / (len(grams) + self.sizes[k]) < threshold / 2:
+                continue
+            score = 1 - edit_distance(key, k) / max(len(key), len(k))
+            if score >= threshold:
+                scored.append((score, k))
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        results = []
+        seen = set()
+        for score, k in scored:
+            for target in self.keys[k]:
+                if target in seen:
+                    continue
+                seen.add(target)
+                results.append((target, score))
+                if len(results) == limit:
+                    return results
+        return results
+
+    def _grams(self, key):
+        padded = '^' + key + '$'
+        n = self.n
+        return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+    def _key(self, raw):
+        return RX_NON_ALNUM.sub('', fold_key(raw))
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between strings a and b"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Index of the inscriptions (cnumbers and EpiDoc files) found at places
+"""
+
+from campa.geography.logger import SelfLogger
+from pathlib import Path
+import re
+
+# DHARMA_INSCIC00161 is C161; suffixes name parts or editions of the
+# same inscription, e.g. DHARMA_INSCIC00030B1 and DHARMA_INSCIC00171_DABA
+RX_FILE_ID = re.compile(r'^DHARMA_INSCIC0*(\d+)')
+
+
+def file_cnumber(file_id):
+    """
+    Return the cnumber of an EpiDoc file id or path, or None if it does
+    not name a Campā inscription
+    """
+    m = RX_FILE_ID.match(Path(file_id).stem)
+    if m is None:
+        return None
+    return m.group(1)
+
+
+class InscriptionIndex(SelfLogger):
+    """
+    Place pids <-> cnumbers <-> EpiDoc file ids
+
+    Each direction is a dict of dicts used as ordered sets, so adding and
+    looking up are O(1) and results come back in insertion order. Unknown
+    pids, cnumbers and file ids have no inscriptions or places rather
+    than raising KeyError.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.pid2cnumbers = {}
+        self.cnumber2pids = {}
+        self.cnumber2files = {}
+        self.file2cnumber = {}
+
+    def __len__(self):
+        return len(self.cnumber2pids)
+
+    def add(self, pid, cnumber):
+        """Record that inscription cnumber was found at place pid"""
+        for index, k, v in [
+                (self.pid2cnumbers, pid, cnumber),
+                (self.cnumber2pids, cnumber, pid)]:
+            try:
+                index[k][v] = None
+            except KeyError:
+                index[k] = {v: None}
+
+    def add_file(self, file_id):
+        """
+        Record an EpiDoc file id (or path); return its cnumber, or None
+        if the file id is not that of a Campā inscription
+        """
+        file_id = Path(file_id).stem
+        cnumber = file_cnumber(file_id)
+        if cnumber is None:
+            self._get_logger().debug(
+                'ignoring file %s: no cnumber in its name', file_id)
+            return None
+        self.file2cnumber[file_id] = cnumber
+        try:
+            self.cnumber2files[cnumber][file_id] = None
+        except KeyError:
+            self.cnumber2files[cnumber] = {file_id: None}
+        return cnumber
+
+    def cnumbers(self, pid):
+        """Return the cnumbers found at place pid"""
+        try:
+            return list(self.pid2cnumbers[pid])
+        except KeyError:
+            return []
+
+    def file_ids(self):
+        """Return all the file ids recorded, in order"""
+        return list(self.file2cnumber)
+
+    def files(self, cnumber):
+        """Return the ids of the EpiDoc files of inscription cnumber"""
+        try:
+            return list(self.cnumber2files[cnumber])
+        except KeyError:
+            return []
+
+    def files_at(self, pid):
+        """Return the ids of the EpiDoc files of the inscriptions at pid"""
+        files = []
+        for cnumber in self.cnumbers(pid):
+            files.extend(self.files(cnumber))
+        return files
+
+    def pids(self, cnumber):
+        """Return the pids of the places where cnumber was found"""
+        try:
+            return list(self.cnumber2pids[cnumber])
+        except KeyError:
+            return []
+
+    def pids_for_file(self, file_id):
+        """Return the pids of the places of the inscription in file_id"""
+        try:
+            cnumber = self.file2cnumber[Path(file_id).stem]
+        except KeyError:
+            return []
+        return self.pids(cnumber)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Read the Campā Inventory and group its rows by place hierarchy
+"""
+
+from campa.geography.gazetteer import Gazetteer
+from campa.geography.norm import norm
+from campa.geography.parser import PlaceParser
+from campa.geography.resolution import ResolutionStore
+import csv
+import json
+from pathlib import Path
+
+# inventory field name: CSV column heading
+FIELDS = {
+    'cnumber': 'N° C.',
+    'country': 'Pays',
+    'province': 'Province  (Tỉnh, Thành Phố)',
+    'district': 'District (Huyện ou Thì xã)',
+    'commune': 'Commune  (Xã)',
+    'village': 'Village  (Thôn)',
+    'position': 'Position'
+}
+# country -> province -> district -> commune -> village -> position
+HIERARCHY = ('country', 'province', 'district', 'commune', 'village', 'position')
+
+
+def read_rows(path, encoding='utf-8-sig'):
+    """Yield inventory rows (dicts keyed by CSV heading) one at a time"""
+    with open(path, 'r', encoding=encoding, newline='') as fp:
+        for row in csv.DictReader(fp):
+            yield row
+
+
+def normalize_rows(rows, fields=FIELDS):
+    """
+    Yield normalized inventory rows keyed by field name
+
+    Hierarchy values are normalized once per distinct value.
+    """
+    cooked = {k: {} for k in HIERARCHY}
+    for row in rows:
+        clean = {}
+        for k, heading in fields.items():
+            raw = row[heading]
+            try:
+                memo = cooked[k]
+            except KeyError:
+                # e.g. cnumbers, which hardly ever repeat
+                clean[k] = norm(raw)
+                continue
+            try:
+                clean[k] = memo[raw]
+            except KeyError:
+                clean[k] = memo[raw] = norm(raw)
+        yield clean
+
+
+def parse_rows(parser, rows):
+    """
+    Yield (row, pids, places) for each normalized row as it is parsed,
+    where places are those of the row's places that are new or have
+    changed since they were last yielded
+
+    Each distinct hierarchy is parsed only once; later rows with the same
+    hierarchy just attach their cnumber to the places already found.
+    Parsing only ever adds or amends the places it returns, so a place
+    comes out again whenever a later row adds to it (a name, a type, a
+    parent), and its last appearance is its final state.
+    """
+    gazetteer = parser.gazetteer
+    seen = {}
+    # pid: fingerprint of the place as last yielded
+    yielded = {}
+    for row in rows:
+        hierarchy = tuple([row[k] for k in HIERARCHY])
+        try:
+            pids = seen[hierarchy]
+        except KeyError:
+            places = parser.parse(**row)
+            pids = seen[hierarchy] = [p.pid for p in places]
+            changed = []
+            for pid in dict.fromkeys(pids):
+                place = gazetteer.places[pid]
+                fingerprint = place.fingerprint()
+                if yielded.get(pid) != fingerprint:
+                    yielded[pid] = fingerprint
+                    changed.append(place)
+        else:
+            if pids and parser._present('cnumber', row['cnumber']):
+                gazetteer.attach_cnumber(pids[-1], row['cnumber'])
+            changed = []
+        yield row, pids, changed
+
+
+def write_ndjson(parsed, fp):
+    """
+    Write parsed rows to fp as newline-delimited JSON, one line at a time
+
+    A place is written when it enters the gazetteer and again, in full,
+    whenever a later row changes it, so a later record for a pid
+    supersedes the earlier ones; each row is written as an inscription
+    record listing its place pids.
+    """
+    for row, pids, changed in parsed:
+        for place in changed:
+            record = {'type': 'place'}
+            record.update(place.to_dict())
+            try:
+                # cnumbers are reported by the inscription records instead
+                del record['cnumbers']
+            except KeyError:
+                pass
+            fp.write(json.dumps(record, ensure_ascii=False) + '\n')
+        record = {'type': 'inscription', 'cnumber': row['cnumber']}
+        record['places'] = pids
+        fp.write(json.dumps(record, ensure_ascii=False) + '\n')
+        fp.flush()
+
+
+def load_columns(rows, fields=FIELDS):
+    """
+    Return normalized inventory columns (lists) keyed by field name
+
+    Each distinct cell value is normalized only once per column.
+    """
+    columns = {}
+    for k, heading in fields.items():
+        cooked = {}
+        values = []
+        for row in rows:
+            raw = row[heading]
+            try:
+                value = cooked[raw]
+            except KeyError:
+                value = cooked[raw] = norm(raw)
+            values.append(value)
+        columns[k] = values
+    return columns
+
+
+def group_hierarchies(columns):
+    """
+    Return cnumbers grouped by hierarchy tuple, in order of first appearance
+    """
+    groups = {}
+    cnumbers = columns['cnumber']
+    hierarchies = zip(*[columns[k] for k in HIERARCHY])
+    for i, hierarchy in enumerate(hierarchies):
+        try:
+            groups[hierarchy].append(cnumbers[i])
+        except KeyError:
+            groups[hierarchy] = [cnumbers[i]]
+    return groups
+
+
+def parse_groups(parser, groups):
+    """Resolve each distinct hierarchy once and attach all its cnumbers"""
+    for hierarchy, cnumbers in groups.items():
+        parser.parse(cnumbers=cnumbers, **dict(zip(HIERARCHY, hierarchy)))
+
+
+def parse_groups_parallel(parser, groups, jobs):
+    """
+    Parse hierarchy groups in worker processes, then merge the partial
+    gazetteers into parser.gazetteer in inventory order
+
+    Workers read the local stores and the resolution store but never
+    prompt or write; names they learn or queue are handed back to parser.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    items = list(groups.items())
+    size = max(1, -(-len(items) // jobs))
+    partitions = [
+        dict(items[i:i + size]) for i in range(0, len(items), size)]
+    paths = [
+        parser.districts_path, parser.communes_path, parser.villages_path,
+        parser.resolutions.path]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(_parse_partition, partition, *paths)
+            for partition in partitions]
+        for future in futures:
+            gazetteer, learned, pending = future.result()
+            parser.gazetteer.merge(gazetteer)
+            parser.adopt(learned, pending)
+
+
+def _parse_partition(groups, districts, communes, villages, resolutions):
+    g = Gazetteer()
+    store = ResolutionStore(resolutions, readonly=True)
+    p = PlaceParser(
+        Path(districts), Path(communes), Path(villages), g,
+        resolutions=store, interactive=False, readonly=True)
+    try:
+        parse_groups(p, groups)
+    finally:
+        store.close()
+    return g, p.learned, store.pending
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Write-behind journal for the JSON place stores
+"""
+
+from campa.geography.logger import SelfLogger
+import json
+import os
+from pathlib import Path
+import tempfile
+
+
+def default_mode(path):
+    """
+    Give a file made by tempfile.mkstemp (readable by its owner only) the
+    mode a newly created file gets, i.e. 0666 less the umask
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(path, 0o666 & ~umask)
+
+
+def write_json_atomic(path, data):
+    """Replace the JSON file at path without ever leaving it missing"""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(
+        dir=str(path.parent), prefix=path.name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as fp:
+            json.dump(data, fp, indent=4, ensure_ascii=False)
+            fp.flush()
+            os.fsync(fp.fileno())
+        default_mode(tmp)
+        os.replace(tmp, str(path))
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class StoreJournal(SelfLogger):
+    """
+    Append-only (JSON lines) record of entries learned since the stores
+    were last written
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = Path(path)
+        self._fp = None
+
+    def append(self, store, key, value, parent=None):
+        if self._fp is None:
+            self._fp = self.path.open('a', encoding='utf-8')
+        entry = {'store': store, 'key': key, 'value': value}
+        if parent is not None:
+            entry['parent'] = parent
+        self._fp.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._fp.flush()
+
+    def clear(self):
+        """Forget journaled entries (call once the stores are written)"""
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def replay(self):
+        """Return journaled (store, key, value, parent) tuples in order"""
+        logger = self._get_logger()
+        entries = []
+        try:
+            fp = self.path.open('r', encoding='utf-8')
+        except FileNotFoundError:
+            return entries
+        with fp:
+            for i, line in enumerate(fp):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # a crash can leave a partial last line behind
+                    logger.warning(
+                        'ignoring unreadable journal line %s in %s',
+                        i + 1, self.path)
+                    continue
+                entries.append((
+                    entry['store'], entry['key'], entry['value'],
+                    entry.get('parent')))
+        return entries
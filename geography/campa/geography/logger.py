@@ -5,15 +5,40 @@ Superclass for self-logging
 """
 
 import logging
+from pprint import pformat
 import sys
 
 
+class LazyPformat(object):
+    """
+    Pretty-print obj only if and when a log record is actually formatted
+
+    obj may be a callable, in which case it is called at that point too.
+    """
+
+    __slots__ = ('obj', 'kwargs')
+
+    def __init__(self, obj, **kwargs):
+        self.obj = obj
+        self.kwargs = kwargs
+
+    def __str__(self):
+        obj = self.obj
+        if callable(obj):
+            obj = obj()
+        return pformat(obj, **self.kwargs)
+
+
 class SelfLogger(object):
     """
     Inherit from this class to get a method that returns a logger
     whose name includes the class name and the calling method name
     """
 
+    __slots__ = ()
+    # (class, method name): logger
+    _loggers = {}
+
     def __init__(self):
         pass
 
@@ -21,8 +46,10 @@ class SelfLogger(object):
         """
         Get a logger named for the context class and calling method
         """
-        name = ':'.join((
-            self.__class__.__name__,
-            sys._getframe().f_back.f_code.co_name))
-        return logging.getLogger(name)
-        
\ No newline at end of file
+        key = (self.__class__, sys._getframe(1).f_code.co_name)
+        try:
+            return SelfLogger._loggers[key]
+        except KeyError:
+            logger = logging.getLogger(':'.join((key[0].__name__, key[1])))
+            SelfLogger._loggers[key] = logger
+            return logger
@@ -2,10 +2,80 @@
 # -*- coding: utf-8 -*-
 """
 Normalization utilities
+
+norm() and the key functions built on it are memoized with bounded LRU
+caches, since the same few hundred names are normalized over and over.
 """
 
+from functools import lru_cache
+import re
 from textnorm import normalize_space, normalize_unicode
+import unicodedata
+
+CACHE_SIZE = 65536
+RX_SLUG_SPLIT = re.compile(r'[\W_]+')
+
+
+def _make_fold_table():
+    """
+    Map precomposed Latin letters (including Vietnamese ones) to their
+    base letters and drop combining marks, for str.translate
+    """
+    # Vietnamese Đ, and the look-alike Eth often typed in its place
+    table = {ord('đ'): 'd', ord('Đ'): 'D', ord('ð'): 'd', ord('Ð'): 'D'}
+    for start, end in [(0x00C0, 0x0250), (0x1E00, 0x1F00)]:
+        for i in range(start, end):
+            decomposed = unicodedata.normalize('NFD', chr(i))
+            base = ''.join(
+                [c for c in decomposed if not unicodedata.combining(c)])
+            if len(base) == 1 and base != chr(i):
+                table[i] = base
+    for i in range(0x0300, 0x0370):
+        table[i] = None
+    return table
 
 
+FOLD_TABLE = _make_fold_table()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
 def norm(raw):
     return normalize_unicode(normalize_space(raw))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def lower_norm(raw):
+    """The shared first step of every key: normalized and lower-cased"""
+    return norm(raw).lower()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def index_key(raw):
+    """Key for name indexes, e.g. 'Quảng Nam' -> 'quảng-nam'"""
+    return '-'.join(lower_norm(raw).split())
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def slugify(raw):
+    """Slug for place ids, e.g. 'Monument B1 (?)' -> 'monument-b1'"""
+    return '-'.join(RX_SLUG_SPLIT.sub(' ', lower_norm(raw)).split())
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def fold_key(raw):
+    """Diacritic-insensitive comparison key, e.g. 'Khánh Hoà' -> 'khanh-hoa'"""
+    return index_key(raw).translate(FOLD_TABLE)
+
+
+def cache_stats():
+    """Return hit/miss statistics for the normalization caches"""
+    stats = {}
+    for f in [norm, lower_norm, index_key, slugify, fold_key]:
+        info = f.cache_info()
+        stats[f.__name__] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'maxsize': info.maxsize
+        }
+    return stats
@@ -4,54 +4,157 @@
 Parse Campā Inventory row into places
 """
 
+from campa.geography.countries import CountryIndex
+from campa.geography.indexing import FuzzyNameIndex
+from campa.geography.journal import StoreJournal
 from campa.geography.place import CampaPlace
-from campa.geography.logger import SelfLogger
-from campa.geography.norm import norm
-from colorama import Fore, Style
-from copy import deepcopy
-import inspect
+from campa.geography.logger import LazyPformat, SelfLogger
+from campa.geography.norm import slugify
+from campa.geography.resolution import WikidataResolver
+from campa.geography.stores import EntityStore
+from collections import ChainMap
+import hashlib
 import json
 from pathlib import Path
-from pprint import pformat
-import pycountry
 import re
-import sys
-from wikidata_suggest import suggest
+import time
+from types import MappingProxyType
+
+# a name must have a letter or digit: "?" or "(?)" stands for an unknown place
+RX_WORD = re.compile(r'\w')
 
 
 class PlaceParser(SelfLogger):
 
-    def __init__(self, districts, communes, villages, gazetteer):
-        self.cache = {}
+    def __init__(
+        self, districts, communes, villages, gazetteer, resolver=None,
+        resolutions=None, interactive=True, journal=None, readonly=False,
+        fuzzy_threshold=0.9
+    ):
+        # built on first use; runs that parse nothing never load pycountry
+        self.countries = None
+        self.readonly = readonly
+        self.learned = []
+        # bumped whenever an entry is added to a store
+        self.revision = 0
+        if resolver is None:
+            self.resolver = WikidataResolver()
+        else:
+            self.resolver = resolver
+        self.resolutions = resolutions
+        self.interactive = interactive
+        if not interactive and resolutions is None:
+            raise ValueError(
+                'non-interactive parsing requires a resolution store')
         self.districts_path = str(districts)
         self.communes_path = str(communes)
         self.villages_path = str(villages)
         logger = self._get_logger()
-        with districts.open('r', encoding='utf-8') as f:
-            self.districts = json.load(f)
-        del f
+        self.districts = EntityStore.load(districts)
         logger.debug(
             'read {} districts from {}'
             ''.format(len(self.districts), districts))
-        with communes.open('r', encoding='utf-8') as f:
-            self.communes = json.load(f)
-        del f
+        self.communes = EntityStore.load(communes)
         logger.debug(
             'read {} communes from {}'
             ''.format(len(self.communes), communes))
-        with villages.open('r', encoding='utf-8') as f:
-            self.villages = json.load(f)
-        del f
+        self.villages = EntityStore.load(villages)
         logger.debug(
             'read {} villages from {}'
             ''.format(len(self.villages), villages))
+        if journal is None:
+            journal = Path(self.districts_path).parent / 'journal.jsonl'
+        self.journal = StoreJournal(journal)
+        self._dirty = set()
+        for store, key, value, parent in self.journal.replay():
+            getattr(self, store).set(key, value, parent)
+            self._dirty.add(store)
+        if self._dirty:
+            logger.info(
+                'recovered unsaved %s entries from %s',
+                '/'.join(sorted(self._dirty)), self.journal.path)
+        self.fuzzy_threshold = fuzzy_threshold
+        self.fuzzy = {}
+        for store in ['districts', 'communes', 'villages']:
+            self.fuzzy[store] = FuzzyNameIndex()
+            records = getattr(self, store)
+            for alias, key in records.aliases.items():
+                self.fuzzy[store].add(alias, key)
+            for key, value in records.items():
+                self._index_fuzzy(store, None, key, value)
         self.gazetteer = gazetteer
+        # a RunProfile while profiling (see campa.geography.profiling)
+        self.profile = None
+
+    def adopt(self, learned=(), pending=()):
+        """
+        Take over store entries learned and names queued by a read-only
+        parser (e.g. in a worker process)
+        """
+        for store, key, value, parent in learned:
+            if key is None or key not in getattr(self, store):
+                self._learn(store, key, value, parent)
+        for ptype, term, context in pending:
+            self.resolutions.enqueue(ptype, term, context)
+
+    def digest(self):
+        """
+        Return a hash of the stores and resolutions that parsing draws
+        on; parses are repeatable for as long as it does not change
+        """
+        h = hashlib.sha1()
+        for store in ['districts', 'communes', 'villages']:
+            h.update(json.dumps(
+                getattr(self, store).to_dict(), ensure_ascii=False,
+                sort_keys=True).encode('utf-8'))
+        if self.resolutions is not None:
+            h.update(self.resolutions.digest().encode('ascii'))
+        return h.hexdigest()
+
+    def flush(self):
+        """Write learned entries to the JSON stores and clear the journal"""
+        logger = self._get_logger()
+        if self.readonly:
+            return
+        profile = self.profile
+        for store in sorted(self._dirty):
+            path = getattr(self, '{}_path'.format(store))
+            if profile is not None:
+                start = time.perf_counter()
+            getattr(self, store).write(path)
+            if profile is not None:
+                profile.time('store.write', time.perf_counter() - start)
+                profile.count('saves.{}'.format(store))
+            logger.debug('wrote %s to %s', store, path)
+        self._dirty = set()
+        self.journal.clear()
+        if self.resolutions is not None:
+            if profile is not None:
+                start = time.perf_counter()
+            self.resolutions.commit()
+            if profile is not None:
+                profile.time(
+                    'resolutions.commit', time.perf_counter() - start)
 
     def parse(self, **kwargs):
+        """
+        Parse one inventory hierarchy into places in the gazetteer
+
+        The row's cnumber (or a list of cnumbers sharing the same hierarchy)
+        is attached to the most specific place. Returns the parsed places.
+        """
         logger = self._get_logger()
-        logger.debug('kwargs:\n%s', pformat(kwargs, indent=4))
+        logger.debug('kwargs:\n%s', LazyPformat(kwargs, indent=4))
+        try:
+            cnumbers = kwargs.pop('cnumbers')
+        except KeyError:
+            cnumbers = [kwargs.pop('cnumber')]
         keys = ['country', 'province', 'district', 'commune', 'village', 'position']
+        places = []
+        profile = self.profile
         for k in keys:
+            if profile is not None:
+                start = time.perf_counter()
             v = kwargs[k]
             try:
                 place = getattr(self, '_parse_{}'.format(k))(**kwargs)
@@ -61,12 +164,21 @@ class PlaceParser(SelfLogger):
                     ''.format(v, k))
                 if k != 'country':
                     msg += ' in {}'.format(kwargs['country'])
-                if k != 'cnumber':
-                    msg += ' (C{})'.format(kwargs['cnumber'])
+                msg += ' (C{})'.format(', C'.join(cnumbers))
                 logger.warning(msg)
-                place = self._make_place(name=v, ptype=k)
+                place = self._make_place(ptype=k, **self._overlay(
+                    v, None, kwargs, keys[:keys.index(k)]))
             if place is not None:
                 self.gazetteer.set_place(place)
+                places.append(self.gazetteer.places[place.pid])
+            if profile is not None:
+                profile.time(
+                    'level.{}'.format(k), time.perf_counter() - start)
+        if places:
+            for cnumber in cnumbers:
+                if self._present('cnumber', cnumber):
+                    self.gazetteer.attach_cnumber(places[-1].pid, cnumber)
+        return places
 
     def _make_place(self, pid='slug', **kwargs):
         slug = None
@@ -98,24 +210,110 @@ class PlaceParser(SelfLogger):
                 except LookupError:
                     pass
                 else:
-                    if kwargs['name'] not in lookup.names:
-                        lookup.set_name(kwargs['name'])
-                    return lookup
+                    # unless the entity is already there at another level
+                    # (then set_place keeps the two apart)
+                    if not (
+                        types and lookup.levels()
+                        and types[0] not in lookup.levels()
+                    ):
+                        if kwargs['name'] not in lookup.names:
+                            lookup.set_name(kwargs['name'])
+                        return lookup
                 slug = kwargs['id']
 
         if pid == 'slug':
             if slug is None:
-                try:
-                    name = kwargs['project_name']
-                except KeyError:
-                    name = kwargs['name']
-                slug = '-'.join(
-                    re.sub(r'[()-_]+', '', norm(name).lower()).split())
+                if 'project_name' in kwargs:
+                    # the record's own name (e.g. pycountry's), whatever
+                    # the inventory's spelling, so each place has one pid
+                    slug = slugify(kwargs['name'])
+                else:
+                    slug = self._provisional_pid(**kwargs)
             p = CampaPlace(pid=slug, types=types, gazetteer=self.gazetteer, **kwargs)
         else:
             p = CampaPlace(pid=pid, types=types, gazetteer=self.gazetteer, **kwargs)
         return p
 
+    def _index_fuzzy(self, store, name, key, value):
+        if name is not None:
+            self.fuzzy[store].add(name, key)
+        try:
+            self.fuzzy[store].add(value['label'], key)
+        except KeyError:
+            pass
+
+    def _keep_parent(self, store, name, kwargs):
+        """
+        Record the row's parent (see _parent_key) for the stored entity
+        name found, if it has none yet, e.g. because its store was written
+        before parents were kept; otherwise variants could never match it
+        """
+        records = getattr(self, store)
+        key = records.key(name)
+        if key in records.parents:
+            return
+        parent = self._parent_key(store, kwargs)
+        if parent is not None:
+            self._learn(store, name, records.entities[key], parent)
+
+    def _learn(self, store, name, value, parent=None):
+        """
+        Store value as the record of its entity in store, with name (if not
+        None) as an alias of it, learned under parent (see _parent_key)
+        """
+        key = getattr(self, store).set(name, value, parent)
+        self.revision += 1
+        self._index_fuzzy(store, name, key, value)
+        if self.profile is not None:
+            self.profile.count('learned.{}'.format(store))
+        if self.readonly:
+            self.learned.append((store, name, value, parent))
+            return
+        if self.profile is not None:
+            start = time.perf_counter()
+            self.journal.append(store, name, value, parent)
+            self.profile.time('journal.append', time.perf_counter() - start)
+        else:
+            self.journal.append(store, name, value, parent)
+        self._dirty.add(store)
+
+    def _overlay(self, name, record, kwargs, parents):
+        """
+        Return the fields of the place named name in a row: the parents
+        from kwargs that record lacks, and name (as project_name if record
+        has a name of its own), layered over record
+
+        record (a store or country index entry, or None) is neither copied
+        nor changed: the overlay reads it through a read-only view and
+        takes any writes in its own per-row layer.
+        """
+        if record is None:
+            record = {}
+        row = {
+            k: v for k, v in kwargs.items()
+            if k in parents and k not in record and RX_WORD.search(v)}
+        if 'name' in record:
+            row['project_name'] = name
+        else:
+            row['name'] = name
+        return ChainMap(row, MappingProxyType(record))
+
+    def _parent_key(self, store, kwargs):
+        """
+        Return the nearest district or province of a row (above the
+        store's own level) as e.g. 'province/quảng-nam', or None
+        """
+        for k in ('district', 'province'):
+            if store == '{}s'.format(k):
+                continue
+            try:
+                value = kwargs[k]
+            except KeyError:
+                continue
+            if value and RX_WORD.search(value):
+                return '{}/{}'.format(k, slugify(value))
+        return None
+
     def _parse_cnumber(self, **kwargs):
         pass
 
@@ -128,66 +326,34 @@ class PlaceParser(SelfLogger):
         try:
             commune = self.communes[commune_name]
         except KeyError:
-            commune = self._suggest_wikidata(commune_name, 'commune')
-            if commune is not None:
-                self.communes[commune_name] = commune
-                self._save_communes()
+            commune = self._suggest_local(commune_name, 'communes', kwargs)
+            if commune is None:
+                commune = self._suggest_wikidata(commune_name, 'commune', kwargs)
+                if commune is not None:
+                    self._learn(
+                        'communes', commune_name, commune,
+                        self._parent_key('communes', kwargs))
         else:
             logger.debug('using stored wikidata commune information')
-        if commune is None:
-            commune = kwargs
-        else:
-            commune = deepcopy(commune)
-            for k, v in kwargs.items():
-                if k not in ['country', 'province', 'district']:
-                    continue
-                try:
-                    commune[k]
-                except KeyError:
-                    commune[k] = v
-        try:
-            commune['name']
-        except KeyError:
-            commune['name'] = commune_name
-        else:
-            commune['project_name'] = commune_name
+            self._keep_parent('communes', commune_name, kwargs)
+            if self.profile is not None:
+                self.profile.count('commune.store')
+        commune = self._overlay(
+            commune_name, commune, kwargs, ('country', 'province', 'district'))
         p = self._make_place(pid='slug', ptype='commune', **commune)
-        logger.debug('CampaPlace:\n%s', pformat(p.__dict__, indent=4))
+        logger.debug('CampaPlace:\n%s', LazyPformat(p.to_dict, indent=4))
         return p
 
     def _parse_country(self, **kwargs):
         country_name = kwargs['country']
         logger = self._get_logger()
-        country = None
-        lookup = None
         if not self._present('country', country_name):
             return
-        try:
-            country = self.cache[country_name]
-        except KeyError:
-            if country_name == 'Cambodge':
-                lookup = 'Cambodia'
-            else:
-                lookup = country_name
-            country = self._suggest_pycountry(lookup, 'country')
-            if country is None:
-                raise NotImplementedError(country_name)
-            else:
-                self.cache[country_name] = country
-        else:
-            logger.debug('using stored pycountry country information')
-        if country is None:
-            country = kwargs
-        else:
-            country = country.__dict__['_fields']
-        try:
-            country['name']
-        except KeyError:
-            country['name'] = country_name
-        else:
-            country['project_name'] = country_name
+        country = self._overlay(
+            country_name, self._suggest_pycountry(country_name, 'country'),
+            kwargs, ())
         p = self._make_place(pid='slug', ptype='country', **country)
-        logger.debug('CampaPlace:\n%s', pformat(p.__dict__, indent=4))
+        logger.debug('CampaPlace:\n%s', LazyPformat(p.to_dict, indent=4))
         return p
 
     def _parse_district(self, **kwargs):
@@ -199,74 +365,51 @@ class PlaceParser(SelfLogger):
         try:
             district = self.districts[district_name]
         except KeyError:
-            district = self._suggest_wikidata(district_name, 'district')
-            if district is not None:
-                self.districts[district_name] = district
-                self._save_districts()
+            district = self._suggest_local(district_name, 'districts', kwargs)
+            if district is None:
+                district = self._suggest_wikidata(district_name, 'district', kwargs)
+                if district is not None:
+                    self._learn(
+                        'districts', district_name, district,
+                        self._parent_key('districts', kwargs))
         else:
             logger.debug('using stored wikidata district information')
-        if district is None:
-            district = kwargs
-        else:
-            district = deepcopy(district)
-            for k, v in kwargs.items():
-                if k not in ['country', 'province']:
-                    continue
-                try:
-                    district[k]
-                except KeyError:
-                    district[k] = v
-        try:
-            district['name']
-        except KeyError:
-            district['name'] = district_name
-        else:
-            district['project_name'] = district_name
+            self._keep_parent('districts', district_name, kwargs)
+            if self.profile is not None:
+                self.profile.count('district.store')
+        district = self._overlay(
+            district_name, district, kwargs, ('country', 'province'))
         p = self._make_place(pid='slug', ptype='district', **district)
-        logger.debug('CampaPlace:\n%s', pformat(p.__dict__, indent=4))
+        logger.debug('CampaPlace:\n%s', LazyPformat(p.to_dict, indent=4))
         return p
 
     def _parse_position(self, **kwargs):
         position_name = kwargs['position']
         if not self._present('position', position_name):
             return
-        raise NotImplementedError(inspect.currentframe().f_code.co_name)
+        logger = self._get_logger()
+        position = self._overlay(
+            position_name, None, kwargs, CampaPlace.PARENTS)
+        p = self._make_place(pid=None, ptype='position', **position)
+        # a position ("Tour principale", "Monument B1") only names a place
+        # within the site where it is
+        p.pid = '{}/{}'.format(
+            p.parent_pid() or 'position', slugify(position_name))
+        logger.debug('CampaPlace:\n%s', LazyPformat(p.to_dict, indent=4))
+        return p
 
     def _parse_province(self, **kwargs):
         province_name = kwargs['province']
         logger = self._get_logger()
-        province = None
         if not self._present('province', province_name):
             return
-        try:
-            province = self.cache[province_name]
-        except KeyError:
-            province = self._suggest_pycountry(province_name, 'province')
-            if province is None:
-                raise NotImplementedError(province_name)
-            else:
-                self.cache[province_name] = province
-        else:
-            logger.debug('using stored pycountry province information')
-        if province is None:
-            province = kwargs
-        else:
-            province = deepcopy(province.__dict__['_fields'])
-            for k, v in kwargs.items():
-                if k not in ['country']:
-                    continue
-                try:
-                    province[k]
-                except KeyError:
-                    province[k] = v
-        try:
-            province['name']
-        except KeyError:
-            province['name'] = province_name
-        else:
-            province['project_name'] = province_name
+        province = self._overlay(
+            province_name,
+            self._suggest_pycountry(
+                province_name, 'province', kwargs['country']),
+            kwargs, ('country',))
         p = self._make_place(pid='slug', ptype='province', **province)
-        logger.debug('CampaPlace:\n%s', pformat(p.__dict__, indent=4))
+        logger.debug('CampaPlace:\n%s', LazyPformat(p.to_dict, indent=4))
         return p
 
     def _parse_village(self, **kwargs):
@@ -278,96 +421,178 @@ class PlaceParser(SelfLogger):
         try:
             village = self.villages[village_name]
         except KeyError:
-            village = self._suggest_wikidata(village_name, 'village')
-            if village is not None:
-                self.villages[village_name] = village
-                self._save_villages()
+            village = self._suggest_local(village_name, 'villages', kwargs)
+            if village is None:
+                village = self._suggest_wikidata(village_name, 'village', kwargs)
+                if village is not None:
+                    self._learn(
+                        'villages', village_name, village,
+                        self._parent_key('villages', kwargs))
         else:
             logger.debug('using stored wikidata village information')
-        if village is None:
-            village = deepcopy(kwargs)
-            del village['village']
-        else:
-            village = deepcopy(village)
-            for k, v in kwargs.items():
-                if k not in ['country', 'province', 'district', 'commune']:
-                    continue
-                try:
-                    village[k]
-                except KeyError:
-                    village[k] = v
-        try:
-            village['name']
-        except KeyError:
-            village['name'] = village_name
-        else:
-            village['project_name'] = village_name
+            self._keep_parent('villages', village_name, kwargs)
+            if self.profile is not None:
+                self.profile.count('village.store')
+        village = self._overlay(
+            village_name, village, kwargs,
+            ('country', 'province', 'district', 'commune'))
         p = self._make_place(pid='slug', ptype='village', **village)
-        logger.debug('CampaPlace:\n%s', pformat(p.__dict__, indent=4))
+        logger.debug('CampaPlace:\n%s', LazyPformat(p.to_dict, indent=4))
         return p
 
     def _present(self, field_name, value):
         if value == '':
-            logger = self._get_logger()
-            logger.debug('IGNORED: %s (%s)', field_name, 'empty string')
-            return False
-        return value
+            reason = 'empty string'
+        elif RX_WORD.search(value) is None:
+            reason = 'unknown place'
+        else:
+            return value
+        logger = self._get_logger()
+        logger.debug('IGNORED: %s (%s)', field_name, reason)
+        return False
 
-    def _save_communes(self):
-        communes = Path(self.communes_path)
-        communes.rename(self.communes_path + '.bak')
-        communes = Path(self.communes_path)
-        with communes.open('w', encoding='utf-8') as fp:
-            json.dump(self.communes, fp, indent=4, ensure_ascii=False)
-        del fp
+    def _provisional_pid(self, **kwargs):
+        """
+        Return a pid for a place that nothing resolved: its name may also
+        name places of other types (a district and one of its communes) or
+        in other provinces, so it is qualified with both when known
+        """
+        parts = [slugify(kwargs['name'])]
+        try:
+            ptype = kwargs['ptype']
+        except KeyError:
+            return parts[0]
+        if ptype not in ('country', 'province'):
+            try:
+                province = kwargs['province']
+            except KeyError:
+                pass
+            else:
+                if RX_WORD.search(province):
+                    parts.insert(0, slugify(province))
+        parts.insert(0, ptype)
+        return '/'.join(parts)
 
-    def _save_districts(self):
-        districts = Path(self.districts_path)
-        districts.rename(self.districts_path + '.bak')
-        districts = Path(self.districts_path)
-        with districts.open('w', encoding='utf-8') as fp:
-            json.dump(self.districts, fp, indent=4, ensure_ascii=False)
-        del fp
+    def _suggest_pycountry(self, term, ptype, country=None):
+        """
+        Return the pycountry record for term; a province is only looked
+        for in country (a name), if pycountry knows it
+        """
+        logger = self._get_logger()
+        if ptype not in ['country', 'province']:
+            raise NotImplementedError(ptype, term)
+        profile = self.profile
+        if self.countries is None:
+            if profile is not None:
+                start = time.perf_counter()
+            self.countries = CountryIndex()
+            if profile is not None:
+                profile.time('countries.build', time.perf_counter() - start)
+        alpha_2 = None
+        if country:
+            try:
+                alpha_2 = self.countries.lookup(country, 'country')['alpha_2']
+            except LookupError:
+                pass
+        try:
+            suggestion = self.countries.lookup(term, ptype, alpha_2)
+        except LookupError:
+            if profile is not None:
+                profile.count('{}.missing'.format(ptype))
+            raise
+        if profile is not None:
+            profile.count('{}.store'.format(ptype))
+        logger.debug('%s:\n%s', ptype, LazyPformat(suggestion, indent=4))
+        return suggestion
 
-    def _save_villages(self):
-        villages = Path(self.villages_path)
-        villages.rename(self.villages_path + '.bak')
-        villages = Path(self.villages_path)
-        with villages.open('w', encoding='utf-8') as fp:
-            json.dump(self.villages, fp, indent=4, ensure_ascii=False)
-        del fp
+    def _suggest_local(self, term, store, kwargs):
+        """
+        Return the stored record for a close variant spelling of term, if
+        there is exactly one such entity under the same parent (see
+        _parent_key), and queue term for review as a variant of it
 
-    def _suggest_pycountry(self, term, ptype):
+        Variants are not learned: names that differ in a tone mark or a
+        letter may well be different places, so the match only holds for
+        this run until someone confirms it in the resolution store.
+        """
+        if self.fuzzy_threshold is None:
+            return None
         logger = self._get_logger()
-        if ptype == 'country':
-            suggestion = pycountry.countries.lookup(term)
-        elif ptype == 'province':
-            suggestion = pycountry.subdivisions.lookup(term)
+        ptype = store[:-1]
+        if self.resolutions is not None:
+            try:
+                self.resolutions.get(ptype, term)
+            except KeyError:
+                pass
+            else:
+                # a reviewed resolution beats a guess
+                return None
+        parent = self._parent_key(store, kwargs)
+        if parent is None:
+            return None
+        records = getattr(self, store)
+        profile = self.profile
+        if profile is not None:
+            start = time.perf_counter()
+            matches = self.fuzzy[store].lookup(
+                term, limit=5, threshold=self.fuzzy_threshold)
+            profile.time('variant.search', time.perf_counter() - start)
         else:
-            raise NotImplementedError(ptype, term)
-        msg = (
-            '{}:\n{}'
-            ''.format(
-                ptype,
-                pformat(suggestion.__dict__['_fields'], indent=4)))
-        logger.debug(msg)
-        return suggestion
+            matches = self.fuzzy[store].lookup(
+                term, limit=5, threshold=self.fuzzy_threshold)
+        matches = [
+            (key, score) for key, score in matches
+            if records.parents.get(key) == parent]
+        if not matches:
+            return None
+        key, score = matches[0]
+        for other, other_score in matches[1:]:
+            if other_score < score:
+                break
+            if other != key:
+                logger.info(
+                    'ambiguous variant spelling "%s": %s or %s',
+                    term, key, other)
+                return None
+        record = records.entities[key]
+        logger.info(
+            'using stored %s %s for "%s" (similarity %.2f)',
+            ptype, key, term, score)
+        if profile is not None:
+            profile.count('{}.variant'.format(ptype))
+        if self.resolutions is not None:
+            context = dict(kwargs)
+            context['variant_of'] = key
+            self.resolutions.enqueue(ptype, term, context)
+            logger.info('QUEUED for review: "%s" (%s)', term, ptype)
+        return record
 
-    def _suggest_wikidata(self, term, ptype):
+    def _suggest_wikidata(self, term, ptype, context=None):
         logger = self._get_logger()
-        print(
-            Fore.CYAN + Style.BRIGHT + 'WIKIDATA LOOKUP: "{}" ({})'
-            ''.format(term, ptype) + Style.RESET_ALL)
-        suggestion = suggest(term)
-        if suggestion is not None:
-            msg = (
-                '{}:\n{}'
-                ''.format(
-                    ptype,
-                    pformat(suggestion, indent=4)))
-            logger.debug(msg)
+        if self.resolutions is not None:
+            try:
+                suggestion = self.resolutions.get(ptype, term)
+            except KeyError:
+                pass
+            else:
+                logger.debug(
+                    'using stored resolution for "%s" (%s)', term, ptype)
+                if self.profile is not None:
+                    self.profile.count('{}.resolution'.format(ptype))
+                return suggestion
+        if not self.interactive:
+            self.resolutions.enqueue(ptype, term, context)
+            logger.info('QUEUED for review: "%s" (%s)', term, ptype)
+            if self.profile is not None:
+                self.profile.count('{}.queued'.format(ptype))
+            return None
+        if self.profile is not None:
+            self.profile.count('{}.resolver'.format(ptype))
+            start = time.perf_counter()
+            suggestion = self.resolver.resolve(term, ptype, context)
+            self.profile.time('resolver', time.perf_counter() - start)
         else:
-            logger.debug('No wikidata suggestion was accepted by the user')
+            suggestion = self.resolver.resolve(term, ptype, context)
+        if self.resolutions is not None:
+            self.resolutions.set(ptype, term, suggestion)
         return suggestion
-
-
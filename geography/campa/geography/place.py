@@ -5,30 +5,188 @@ Campa Place type
 """
 
 from campa.geography.logger import SelfLogger
-from pprint import pformat, pprint
+import hashlib
+import json
+from pprint import pformat
 import re
 import sys
 
+RX_WKT_POINT = re.compile(
+    r'^\s*Point\(\s*([-+.\d]+)\s+([-+.\d]+)\s*\)\s*$', re.IGNORECASE)
+
 
 class CampaPlace(SelfLogger):
+    """
+    A place record
+
+    Fields have fixed slots; optional fields are None until set. names,
+    types, uris and same_as are short de-duplicated tuples; cnumbers,
+    which can grow long, is a dict used as an ordered set. Keyword
+    arguments to the constructor are dispatched to the matching set_*
+    method through the class-level _setters table.
+
+    fingerprint() is a hash of the place's content (everything but the
+    gazetteer and cnumbers, with names and other sequences in canonical
+    order); it is cached until a setter changes the place.
+
+    coordinates, when known, is a (latitude, longitude) tuple of floats in
+    decimal degrees (WGS84, as in wikidata P625).
+    """
+
+    __slots__ = (
+        'pid', 'gazetteer', 'names', 'types', 'identifiers', 'uris',
+        'same_as', 'cnumbers', 'description', 'country', 'province',
+        'district', 'commune', 'village', 'position', 'coordinates',
+        '_fingerprint')
+    PARENTS = ('country', 'province', 'district', 'commune', 'village')
+    # administrative levels, outermost first, as they appear in types
+    LEVELS = PARENTS + ('position',)
+    # field name or raw keyword: unbound set_* method (filled in below)
+    _setters = {}
 
     def __init__(self, pid, gazetteer=None, **kwargs):
-        logger = self._get_logger()
         self.pid = pid
-        if gazetteer is not None:
-            self.gazetteer = gazetteer
+        self.gazetteer = gazetteer
+        self.names = ()
+        self.types = ()
+        self.identifiers = self.uris = self.same_as = self.cnumbers = None
+        self.description = self.country = self.province = None
+        self.district = self.commune = self.village = self.position = None
+        self.coordinates = None
+        self._fingerprint = None
+        setters = self._setters
         for k, v in kwargs.items():
-            kfn = '_'.join(k.lower().split())
             try:
-                getattr(self, 'set_{}'.format(kfn))(v)
-            except AttributeError:
-                logger.error(pformat(kwargs, indent=4))
-                raise
+                setter = setters[k]
+            except KeyError:
+                setter = self._get_setter(k, kwargs)
+            setter(self, v)
+
+    @classmethod
+    def from_dict(cls, d, gazetteer=None):
+        """
+        Rebuild a place from the output of to_dict(), assigning fields
+        directly instead of going through the setters
+        """
+        place = cls(d['pid'], gazetteer=gazetteer)
+        for k, v in d.items():
+            if k == 'pid':
+                continue
+            elif k == 'cnumbers':
+                v = dict.fromkeys(v)
+            elif k == 'types':
+                v = tuple([sys.intern(t) for t in v])
+            elif k in _SEQUENCES or k == 'coordinates':
+                v = tuple(v)
+            setattr(place, k, v)
+        return place
+
+    def _get_setter(self, k, kwargs):
+        kfn = '_'.join(k.lower().split())
+        try:
+            setter = self._setters[kfn]
+        except KeyError:
+            logger = self._get_logger()
+            logger.error(pformat(kwargs, indent=4))
+            raise AttributeError(
+                "'{}' object has no attribute 'set_{}'"
+                "".format(self.__class__.__name__, kfn))
+        # remember the raw keyword too, so it is normalized only once
+        self._setters[k] = setter
+        return setter
+
+    def to_dict(self):
+        """Return the place's content as a JSON-serializable dict"""
+        d = {}
+        for k in self.__slots__:
+            if k == 'gazetteer' or k[0] == '_':
+                continue
+            v = getattr(self, k)
+            if v is None:
+                continue
+            if k in _SEQUENCES:
+                v = list(v)
+            d[k] = v
+        return d
+
+    def levels(self):
+        """Return the administrative levels among the place's types"""
+        return [t for t in self.LEVELS if t in self.types]
+
+    def parent_pid(self):
+        """Return the pid of the nearest parent that has one, or None"""
+        for k in reversed(self.PARENTS):
+            ref = getattr(self, k)
+            if ref is not None and ref.get('pid'):
+                return ref['pid']
+        return None
+
+    def fingerprint(self):
+        """Return a canonical hash of the place's content"""
+        if self._fingerprint is None:
+            d = self.to_dict()
+            try:
+                del d['cnumbers']
+            except KeyError:
+                pass
+            for k in _SEQUENCES:
+                try:
+                    d[k] = sorted(d[k])
+                except KeyError:
+                    pass
+            self._fingerprint = hashlib.sha1(json.dumps(
+                d, ensure_ascii=False, sort_keys=True).encode('utf-8')
+            ).hexdigest()
+        return self._fingerprint
+
+    def merge(self, other):
+        """
+        Fold the content of another record of the same place into this one
+
+        names, types, uris, same_as, identifiers and cnumbers are combined.
+        A parent reference or description is taken from other only if this
+        place lacks it (or lacks the parent's pid); real conflicts are
+        logged and this place's value is kept.
+        """
+        logger = self._get_logger()
+        self.set_types(other.types)
+        for name in other.names:
+            self.set_name(name)
+        if other.uris is not None:
+            self.set_uris(other.uris)
+        if other.same_as is not None:
+            self.set_same_as(other.same_as)
+        if other.identifiers is not None:
+            self._merge_identifiers(other.identifiers)
+        if other.cnumbers is not None:
+            for cnumber in other.cnumbers:
+                self.set_cnumber(cnumber)
+        for k in self.PARENTS + ('position', 'description', 'coordinates'):
+            mine = getattr(self, k)
+            theirs = getattr(other, k)
+            if theirs is None or mine == theirs:
+                continue
+            if (
+                k in self.LEVELS and mine is not None
+                and mine.get('pid') and mine.get('pid') == theirs.get('pid')
+            ):
+                # the same place, spelled differently
+                continue
+            if mine is None or (
+                k not in ('description', 'coordinates') and 'pid' not in mine
+                and mine['name'] == theirs['name']
+            ):
+                setattr(self, k, theirs)
+                self._fingerprint = None
+            else:
+                logger.warning(
+                    '%s: keeping %s %s instead of %s',
+                    self.pid, k, mine, theirs)
 
     def set_aliases(self, value):
         # wikidata alternate lookups
         pass
-    
+
     def set_alpha_2(self, value):
         self._set_identifier('ISO 3166-1', 'alpha-2', value)
 
@@ -39,11 +197,9 @@ class CampaPlace(SelfLogger):
         self.set_name(value)
 
     def set_cnumber(self, value):
-        try:
-            self.cnumbers
-        except AttributeError:
-            self.cnumbers = []
-        self.cnumbers.append(value)
+        if self.cnumbers is None:
+            self.cnumbers = {}
+        self.cnumbers[value] = None
 
     def set_code(self, value):
         self._set_identifier('ISO 3166-2', value)
@@ -53,31 +209,58 @@ class CampaPlace(SelfLogger):
 
     def set_commune(self, value):
         if value:
-            self.commune = self._set_with_gazetteer(value)
+            self.commune = self._set_with_gazetteer(value, 'commune')
+            self._fingerprint = None
 
     def set_concepturi(self, value):
         self.set_same_as([value])
 
+    def set_coordinates(self, value):
+        """
+        Set coordinates from a (lat, lon) pair, a "lat, lon" or WKT
+        "Point(lon lat)" string, or a wikidata globe-coordinate dict
+        """
+        if not value:
+            return
+        if isinstance(value, dict):
+            lat, lon = value['latitude'], value['longitude']
+        elif isinstance(value, str):
+            m = RX_WKT_POINT.match(value)
+            if m is not None:
+                lon, lat = m.groups()
+            else:
+                lat, lon = value.split(',')
+        else:
+            lat, lon = value
+        lat, lon = float(lat), float(lon)
+        if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+            raise ValueError('coordinates out of range: {}'.format(value))
+        self.coordinates = (lat, lon)
+        self._fingerprint = None
+
     def set_country(self, value):
         if value:
-            self.country = self._set_with_gazetteer(value)
+            self.country = self._set_with_gazetteer(value, 'country')
+            self._fingerprint = None
 
     def set_country_code(self, value):
         pass
-    
+
     def set_description(self, value):
         if value in ['city']:
             self.set_type(value)
         elif value.startswith('capital of '):
             self.set_type('city')
             self.description = value
+            self._fingerprint = None
         else:
             raise NotImplementedError(
                 'description: {}'.format(value))
 
     def set_district(self, value):
         if value:
-            self.district = self._set_with_gazetteer(value)
+            self.district = self._set_with_gazetteer(value, 'district')
+            self._fingerprint = None
 
     def set_id(self, value):
         m = re.match(r'^Q\d+$', value)
@@ -87,23 +270,34 @@ class CampaPlace(SelfLogger):
     def set_label(self, value):
         self.set_name(value)
 
+    def set_labels(self, value):
+        # wikidata labels by language (see campa.geography.enrichment)
+        pass
+
     def set_match(self, value):
         pass
 
     def set_name(self, value):
-        try:
-            self.names
-        except AttributeError:
-            self.names = []
         if value not in self.names:
-            self.names.append(value)
+            self.names += (value,)
+            self._fingerprint = None
 
     def set_numeric(self, value):
-        self._set_identifier('ISO 3166-1', 'numeric', value)        
+        self._set_identifier('ISO 3166-1', 'numeric', value)
 
     def set_official_name(self, value):
         self.set_name(value)
 
+    def set_p131(self, value):
+        # wikidata "located in" QIDs (see campa.geography.enrichment)
+        pass
+
+    def set_p625(self, value):
+        # wikidata "coordinate location"; a list of claims keeps the first
+        if isinstance(value, list):
+            value = value[0] if value else None
+        self.set_coordinates(value)
+
     def set_pageid(self, value):
         pass
 
@@ -112,16 +306,22 @@ class CampaPlace(SelfLogger):
             return
         raise NotImplementedError('parent_code')
 
+    def set_pid(self, value):
+        self.pid = value
+        self._fingerprint = None
+
     def set_position(self, value):
         if value:
-            self.position = self._set_with_gazetteer(value)
+            self.position = self._set_with_gazetteer(value, 'position')
+            self._fingerprint = None
 
     def set_project_name(self, value):
         self.set_name(value)
 
     def set_province(self, value):
         if value:
-            self.province = self._set_with_gazetteer(value)
+            self.province = self._set_with_gazetteer(value, 'province')
+            self._fingerprint = None
 
     def set_ptype(self, value):
         self.set_type(value)
@@ -130,59 +330,49 @@ class CampaPlace(SelfLogger):
         pass
 
     def set_same_as(self, values):
-        try:
-            self.same_as
-        except AttributeError:
-            self.same_as = []
+        if self.same_as is None:
+            self.same_as = ()
         for value in values:
             if value not in self.same_as:
-                self.same_as.append(value)
+                self.same_as += (value,)
+                self._fingerprint = None
 
     def set_title(self, value):
         self.set_name(value)
 
     def set_type(self, value):
-        try:
-            self.types
-        except AttributeError:
-            self.types = []
         if value not in self.types and value.lower() not in self.types:
-            self.types.append(value)
+            self.types += (sys.intern(value),)
+            self._fingerprint = None
 
     def set_types(self, values):
         if isinstance(values, str):
             self.set_type(values)
         else:
-            try:
-                self.types
-            except AttributeError:
-                self.types = []
             for value in values:
-                if value not in self.types and value.lower() not in self.types:
-                    self.types.append(value)
+                self.set_type(value)
 
     def set_uris(self, values):
-        try:
-            self.uris
-        except AttributeError:
-            self.uris = []
+        if self.uris is None:
+            self.uris = ()
         for value in values:
             if value.startswith('//'):
                 value = 'https:' + value
             if value not in self.uris:
-                self.uris.append(value)
+                self.uris += (value,)
+                self._fingerprint = None
 
     def set_url(self, value):
         self.set_uris([value])
 
     def set_village(self, value):
-        self.village = self._set_with_gazetteer(value)
+        self.village = self._set_with_gazetteer(value, 'village')
+        self._fingerprint = None
 
     def _set_identifier(self, *values):
-        try:
-            self.identifiers
-        except AttributeError:
+        if self.identifiers is None:
             self.identifiers = {}
+        self._fingerprint = None
         d = self.identifiers
         prev = d
         for i, value in enumerate(values):
@@ -203,14 +393,46 @@ class CampaPlace(SelfLogger):
                     prev[value] = {}
                 prev = prev[value]
 
-    def _set_with_gazetteer(self, value):
+    def _merge_identifiers(self, theirs, path=()):
+        """Add the identifiers in nested dict theirs that this place lacks"""
+        for k, v in theirs.items():
+            if isinstance(v, dict):
+                self._merge_identifiers(v, path + (k,))
+                continue
+            existing = self.identifiers
+            for step in path + (k,):
+                try:
+                    existing = existing[step]
+                except (KeyError, TypeError):
+                    existing = []
+                    break
+            for value in v:
+                if value not in existing:
+                    self._set_identifier(*(path + (k, value)))
+
+    def _set_with_gazetteer(self, value, ptype):
+        """
+        Return a reference to the ptype named value: its name, and its pid
+        if the gazetteer knows it (within the nearest outer parent already
+        set, should the name be ambiguous)
+        """
         result = {'name': value}
+        within = None
+        for k in self.LEVELS[:self.LEVELS.index(ptype)]:
+            ref = getattr(self, k)
+            if ref is not None and ref.get('pid'):
+                within = ref['pid']
         try:
-            place = self.gazetteer.lookup(value)
-        except (AttributeError, KeyError):
+            place = self.gazetteer.lookup(value, ptype, within)
+        except (AttributeError, LookupError):
             pass
         else:
             result['pid'] = place.pid
         return result
 
-        
\ No newline at end of file
+
+_SEQUENCES = {'names', 'types', 'uris', 'same_as', 'cnumbers'}
+for _name, _method in list(vars(CampaPlace).items()):
+    if _name.startswith('set_'):
+        CampaPlace._setters[_name[4:]] = _method
+del _name, _method
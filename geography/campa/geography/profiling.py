@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Counters and timers for profiling a run
+"""
+
+from campa.geography.logger import SelfLogger
+import json
+import time
+
+LEVELS = ('country', 'province', 'district', 'commune', 'village', 'position')
+# how a level's name was found: the first three are hits, the others misses
+# (countries and provinces are either in the country index or missing)
+SOURCES = ('store', 'variant', 'resolution', 'resolver', 'queued', 'missing')
+
+
+class RunProfile(SelfLogger):
+    """
+    Named counters and timers, filled in by the objects a run uses
+
+    PlaceParser and Gazetteer have a profile attribute that is None
+    unless a RunProfile is assigned to it, so when profiling is off each
+    instrumented spot costs one attribute test. Timers are inclusive:
+    e.g. the time of a level includes the time of the gazetteer calls
+    made for it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.counters = {}
+        # name: [calls, seconds]
+        self.timers = {}
+        self.started = time.time()
+
+    def count(self, name, n=1):
+        try:
+            self.counters[name] += n
+        except KeyError:
+            self.counters[name] = n
+
+    def report(self):
+        """Return the counters, timers and per-level summary as a dict"""
+        levels = {}
+        for level in LEVELS:
+            try:
+                calls, seconds = self.timers['level.{}'.format(level)]
+            except KeyError:
+                continue
+            summary = {'calls': calls, 'seconds': seconds}
+            for source in SOURCES:
+                summary[source] = self.counters.get(
+                    '{}.{}'.format(level, source), 0)
+            hits = sum([summary[s] for s in SOURCES[:3]])
+            misses = sum([summary[s] for s in SOURCES[3:]])
+            if hits + misses:
+                summary['hit_ratio'] = hits / (hits + misses)
+            levels[level] = summary
+        return {
+            'started': self.started,
+            'seconds': time.time() - self.started,
+            'levels': levels,
+            'timers': {
+                name: {
+                    'calls': calls, 'seconds': seconds,
+                    'mean_ms': seconds / calls * 1000 if calls else 0.0}
+                for name, (calls, seconds) in sorted(self.timers.items())},
+            'counters': dict(sorted(self.counters.items()))
+        }
+
+    def time(self, name, seconds):
+        """Add one call of the given duration to timer name"""
+        try:
+            timer = self.timers[name]
+        except KeyError:
+            self.timers[name] = [1, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+
+    def write(self, path):
+        """Write report() to path as JSON"""
+        with open(path, 'w', encoding='utf-8') as fp:
+            json.dump(self.report(), fp, ensure_ascii=False, indent=4)
+        del fp
+        self._get_logger().info('wrote profile report to %s', path)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Resolve unknown place names and remember the answers
+"""
+
+from campa.geography.logger import LazyPformat, SelfLogger
+import hashlib
+import json
+import sqlite3
+import time
+
+
+class Resolver(SelfLogger):
+    """
+    Base class for objects that resolve a place name to a store record
+    """
+
+    def resolve(self, term, ptype, context=None):
+        """Return a record (dict) for term, or None if there is no match"""
+        raise NotImplementedError(self.__class__.__name__)
+
+
+class WikidataResolver(Resolver):
+    """
+    Interactive resolution against Wikidata using wikidata_suggest
+    """
+
+    def resolve(self, term, ptype, context=None):
+        from colorama import Fore, Style
+        from wikidata_suggest import suggest
+        logger = self._get_logger()
+        print(
+            Fore.CYAN + Style.BRIGHT + 'WIKIDATA LOOKUP: "{}" ({})'
+            ''.format(term, ptype) + Style.RESET_ALL)
+        if context:
+            print('\t' + ', '.join(
+                ['{}: {}'.format(k, v) for k, v in context.items() if v]))
+        suggestion = suggest(term)
+        if suggestion is not None:
+            logger.debug(
+                '%s:\n%s', ptype, LazyPformat(suggestion, indent=4))
+        else:
+            logger.debug('No wikidata suggestion was accepted by the user')
+        return suggestion
+
+
+class StubResolver(Resolver):
+    """
+    Non-interactive resolution from a local dictionary
+
+    records may be keyed by term or by (ptype, term); anything else
+    resolves to None.
+    """
+
+    def __init__(self, records=None):
+        super().__init__()
+        if records is None:
+            self.records = {}
+        else:
+            self.records = records
+
+    def resolve(self, term, ptype, context=None):
+        try:
+            return self.records[(ptype, term)]
+        except KeyError:
+            pass
+        try:
+            return self.records[term]
+        except KeyError:
+            return None
+
+
+class ResolutionStore(SelfLogger):
+    """
+    Persistent (SQLite) store of name resolutions and a review queue
+
+    A resolution whose record is None means that the name was reviewed
+    and deliberately left without an external match.
+    """
+
+    def __init__(self, path, readonly=False):
+        super().__init__()
+        self.path = str(path)
+        self.readonly = readonly
+        self.pending = []
+        if readonly:
+            # names queued by a read-only store are kept in self.pending
+            self.connection = sqlite3.connect(
+                'file:{}?mode=ro'.format(self.path), uri=True)
+        else:
+            self.connection = sqlite3.connect(self.path)
+            self.connection.executescript(
+                'CREATE TABLE IF NOT EXISTS resolutions ('
+                ' ptype TEXT NOT NULL, term TEXT NOT NULL, record TEXT,'
+                ' resolved REAL NOT NULL, PRIMARY KEY (ptype, term));'
+                'CREATE TABLE IF NOT EXISTS queue ('
+                ' ptype TEXT NOT NULL, term TEXT NOT NULL, context TEXT,'
+                ' queued REAL NOT NULL, PRIMARY KEY (ptype, term));')
+            self.connection.commit()
+        logger = self._get_logger()
+        logger.debug(
+            'opened resolution store %s (%s queued)', self.path, len(self))
+
+    def __len__(self):
+        """Number of names waiting for review"""
+        cursor = self.connection.execute('SELECT COUNT(*) FROM queue')
+        return cursor.fetchone()[0]
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def commit(self):
+        self.connection.commit()
+
+    def dequeue(self, ptype, term):
+        self.connection.execute(
+            'DELETE FROM queue WHERE ptype = ? AND term = ?', (ptype, term))
+
+    def digest(self):
+        """Return a hash of all stored resolutions (not of the queue)"""
+        h = hashlib.sha1()
+        cursor = self.connection.execute(
+            'SELECT ptype, term, record FROM resolutions ORDER BY ptype, term')
+        for row in cursor:
+            h.update(json.dumps(row, ensure_ascii=False).encode('utf-8'))
+        return h.hexdigest()
+
+    def enqueue(self, ptype, term, context=None):
+        """Queue a name for review unless it is already queued"""
+        if self.readonly:
+            self.pending.append((ptype, term, context))
+            return
+        if context is not None:
+            context = json.dumps(context, ensure_ascii=False, sort_keys=True)
+        self.connection.execute(
+            'INSERT OR IGNORE INTO queue (ptype, term, context, queued) '
+            'VALUES (?, ?, ?, ?)', (ptype, term, context, time.time()))
+
+    def get(self, ptype, term):
+        """Return the stored resolution; raise KeyError if there is none"""
+        cursor = self.connection.execute(
+            'SELECT record FROM resolutions WHERE ptype = ? AND term = ?',
+            (ptype, term))
+        row = cursor.fetchone()
+        if row is None:
+            raise KeyError((ptype, term))
+        if row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def queue(self):
+        """Return queued names as (ptype, term, context) in queue order"""
+        cursor = self.connection.execute(
+            'SELECT ptype, term, context FROM queue ORDER BY queued, rowid')
+        result = []
+        for ptype, term, context in cursor.fetchall():
+            if context is not None:
+                context = json.loads(context)
+            result.append((ptype, term, context))
+        return result
+
+    def set(self, ptype, term, record):
+        if record is not None:
+            record = json.dumps(record, ensure_ascii=False, sort_keys=True)
+        self.connection.execute(
+            'INSERT OR REPLACE INTO resolutions (ptype, term, record, resolved)'
+            ' VALUES (?, ?, ?, ?)', (ptype, term, record, time.time()))
+        self.dequeue(ptype, term)
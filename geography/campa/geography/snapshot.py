@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite snapshots of a built gazetteer
+"""
+
+from campa.geography.journal import default_mode
+from campa.geography.place import CampaPlace
+import json
+import os
+from pathlib import Path
+import sqlite3
+import tempfile
+
+FORMAT_VERSION = '2'
+SCHEMA = (
+    'CREATE TABLE meta ('
+    ' key TEXT PRIMARY KEY, value TEXT);'
+    'CREATE TABLE places ('
+    ' seq INTEGER PRIMARY KEY, pid TEXT NOT NULL UNIQUE, data TEXT NOT NULL);'
+    'CREATE TABLE names ('
+    ' seq INTEGER PRIMARY KEY, term TEXT NOT NULL, pid TEXT NOT NULL);'
+    'CREATE TABLE reverse_names ('
+    ' seq INTEGER PRIMARY KEY, target TEXT NOT NULL, term TEXT NOT NULL);'
+    'CREATE TABLE files ('
+    ' seq INTEGER PRIMARY KEY, file_id TEXT NOT NULL UNIQUE);'
+    'CREATE INDEX names_term ON names (term);'
+    'CREATE INDEX reverse_names_target ON reverse_names (target);')
+
+
+def open_snapshot(path):
+    """Open a snapshot read-only; any number of processes may do so"""
+    return sqlite3.connect(
+        '{}?mode=ro'.format(Path(path).resolve().as_uri()), uri=True)
+
+
+def read_meta(path):
+    """Return the snapshot's meta table as a dict"""
+    connection = open_snapshot(path)
+    try:
+        return dict(connection.execute('SELECT key, value FROM meta'))
+    finally:
+        connection.close()
+
+
+def read_snapshot(path, gazetteer):
+    """
+    Fill an empty gazetteer from the snapshot at path
+
+    The places and the name indexes come straight from their tables;
+    the other catalog indexes are rebuilt from the places. The EpiDoc
+    file ids stored with the snapshot are recorded unless some were
+    already added to the gazetteer, which are then taken to be current.
+    """
+    connection = open_snapshot(path)
+    try:
+        cursor = connection.execute(
+            "SELECT value FROM meta WHERE key = 'format'")
+        row = cursor.fetchone()
+        if row is None or row[0] != FORMAT_VERSION:
+            raise ValueError(
+                '{} is not a version {} gazetteer snapshot'.format(
+                    path, FORMAT_VERSION))
+        places = gazetteer.places
+        for pid, data in connection.execute(
+                'SELECT pid, data FROM places ORDER BY seq'):
+            places[pid] = CampaPlace.from_dict(
+                json.loads(data), gazetteer=gazetteer)
+        gazetteer.catalog['names2pids'].load_pairs(
+            connection.execute('SELECT term, pid FROM names ORDER BY seq'),
+            connection.execute(
+                'SELECT target, term FROM reverse_names ORDER BY seq'))
+        if not gazetteer.catalog['inscriptions'].file_ids():
+            gazetteer.add_files([
+                file_id for (file_id,) in connection.execute(
+                    'SELECT file_id FROM files ORDER BY seq')])
+    finally:
+        connection.close()
+    gazetteer.reindex(names=False)
+    return gazetteer
+
+
+def read_table(path, table):
+    """
+    Return the rows of an extra table stored with write_snapshot(), in
+    order, or None if the snapshot has no such table
+    """
+    connection = open_snapshot(path)
+    try:
+        cursor = connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table,))
+        if cursor.fetchone() is None:
+            return None
+        return connection.execute(
+            'SELECT * FROM "{}" ORDER BY rowid'.format(table)).fetchall()
+    finally:
+        connection.close()
+
+
+def write_snapshot(path, gazetteer, meta=None, tables=None):
+    """
+    Write gazetteer to a snapshot at path, replacing it atomically
+
+    meta is a dict of further (string) values for the meta table; tables
+    maps the names of extra tables to (columns, rows), for data that
+    should travel with the gazetteer (see read_table()).
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(
+        dir=str(path.parent), prefix=path.name + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        connection = sqlite3.connect(tmp)
+        try:
+            connection.executescript(SCHEMA)
+            connection.executemany(
+                'INSERT INTO meta (key, value) VALUES (?, ?)',
+                [('format', FORMAT_VERSION)] + list((meta or {}).items()))
+            connection.executemany(
+                'INSERT INTO places (pid, data) VALUES (?, ?)',
+                [
+                    (pid, json.dumps(
+                        place.to_dict(), ensure_ascii=False,
+                        separators=(',', ':')))
+                    for pid, place in gazetteer.places.items()])
+            index = gazetteer.catalog['names2pids']
+            connection.executemany(
+                'INSERT INTO names (term, pid) VALUES (?, ?)', index.pairs())
+            connection.executemany(
+                'INSERT INTO reverse_names (target, term) VALUES (?, ?)',
+                index.reverse_pairs())
+            connection.executemany(
+                'INSERT INTO files (file_id) VALUES (?)', [
+                    (file_id,) for file_id
+                    in gazetteer.catalog['inscriptions'].file_ids()])
+            for table, (columns, rows) in (tables or {}).items():
+                connection.execute('CREATE TABLE "{}" ({})'.format(
+                    table, ', '.join(columns)))
+                connection.executemany(
+                    'INSERT INTO "{}" VALUES ({})'.format(
+                        table, ', '.join(['?'] * len(columns))),
+                    rows)
+            connection.commit()
+        finally:
+            connection.close()
+        # readable by other users' processes, like any file written anew
+        default_mode(tmp)
+        os.replace(tmp, str(path))
+    except BaseException:
+        os.unlink(tmp)
+        raise
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Spatial index of place coordinates
+
+numpy is imported when distances are first computed, not with the module,
+and is only needed then: it is installed with the "spatial" extra.
+"""
+
+from campa.geography.logger import SelfLogger
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km; any argument may be a numpy array, so
+    one call computes the distances from a point to many others
+    """
+    import numpy as np
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SpatialIndex(SelfLogger):
+    """
+    Grid index of (latitude, longitude) points keyed by pid
+
+    Points are bucketed into cells of cell_size degrees, so bbox() and
+    radius() only look at the cells they overlap. Distances are computed
+    with the vectorized haversine() over numpy arrays, which are rebuilt
+    lazily after points change. Longitudes are in [-180, 180]; queries
+    wrap around the antimeridian, and radius() over the poles.
+    """
+
+    def __init__(self, cell_size=0.1):
+        super().__init__()
+        self.cell_size = cell_size
+        self.points = {}
+        self.cells = {}
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def add(self, pid, lat, lon):
+        try:
+            prior = self.points[pid]
+        except KeyError:
+            pass
+        else:
+            if prior == (lat, lon):
+                return
+            del self.cells[self._cell(*prior)][pid]
+        self.points[pid] = (lat, lon)
+        cell = self._cell(lat, lon)
+        try:
+            self.cells[cell][pid] = None
+        except KeyError:
+            self.cells[cell] = {pid: None}
+        self._arrays = None
+
+    def bbox(self, south, west, north, east):
+        """
+        Return the pids of the points inside the bounding box, which
+        crosses the antimeridian if west is greater than east
+        """
+        hits = []
+        for w, e in _spans(west, east):
+            hits.extend([
+                pid for pid in self._candidates(south, w, north, e)
+                if south <= self.points[pid][0] <= north
+                and w <= self.points[pid][1] <= e])
+        return hits
+
+    def distances(self, lat, lon):
+        """
+        Return (pids, km): every indexed pid and its distance from lat, lon
+        """
+        pids, lats, lons = self._get_arrays()
+        return pids, haversine(lat, lon, lats, lons)
+
+    def nearest(self, lat, lon, k=5):
+        """Return the k nearest (pid, km) pairs, nearest first"""
+        import numpy as np
+        pids, km = self.distances(lat, lon)
+        if k < len(pids):
+            nearest = np.argpartition(km, k)[:k]
+        else:
+            nearest = np.arange(len(pids))
+        nearest = nearest[np.argsort(km[nearest], kind='stable')]
+        return [(pids[i], float(km[i])) for i in nearest]
+
+    def radius(self, lat, lon, km):
+        """Return the (pid, km) pairs within km of lat, lon, nearest first"""
+        import numpy as np
+        dlat = math.degrees(km / EARTH_RADIUS_KM)
+        coslat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+        dlon = 180.0 if coslat < 1e-12 else min(dlat / coslat, 180.0)
+        if dlon >= 180.0:
+            spans = [(-180.0, 180.0)]
+        else:
+            spans = _spans(_wrap(lon - dlon), _wrap(lon + dlon))
+        candidates = []
+        for w, e in spans:
+            candidates.extend(
+                self._candidates(lat - dlat, w, lat + dlat, e))
+        if not candidates:
+            return []
+        points = np.array([self.points[pid] for pid in candidates])
+        dist = haversine(lat, lon, points[:, 0], points[:, 1])
+        hits = [
+            (candidates[i], float(dist[i]))
+            for i in np.flatnonzero(dist <= km)]
+        hits.sort(key=lambda x: x[1])
+        return hits
+
+    def _candidates(self, south, west, north, east):
+        """pids in the grid cells overlapping the bounding box"""
+        s, w = self._cell(south, west)
+        n, e = self._cell(north, east)
+        if (n - s + 1) * (e - w + 1) > len(self.cells):
+            cells = [
+                c for c in self.cells
+                if s <= c[0] <= n and w <= c[1] <= e]
+        else:
+            cells = [
+                (i, j) for i in range(s, n + 1) for j in range(w, e + 1)]
+        candidates = []
+        for cell in cells:
+            try:
+                candidates.extend(self.cells[cell])
+            except KeyError:
+                pass
+        return candidates
+
+    def _cell(self, lat, lon):
+        return (
+            math.floor(lat / self.cell_size),
+            math.floor(lon / self.cell_size))
+
+    def _get_arrays(self):
+        import numpy as np
+        if self._arrays is None:
+            pids = list(self.points)
+            coords = np.array(
+                [self.points[pid] for pid in pids], dtype=float
+            ).reshape(-1, 2)
+            self._arrays = (pids, coords[:, 0], coords[:, 1])
+        return self._arrays
+
+
+def _spans(west, east):
+    """The one or two [west, east] spans of longitude of a bounding box"""
+    if west > east:
+        return [(west, 180.0), (-180.0, east)]
+    return [(west, east)]
+
+
+def _wrap(lon):
+    """lon brought into [-180, 180)"""
+    return (lon + 180.0) % 360.0 - 180.0
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Place stores: records keyed by wikidata QID, with an alias table
+"""
+
+from campa.geography.journal import write_json_atomic
+from campa.geography.logger import SelfLogger
+from campa.geography.norm import index_key
+import json
+import re
+
+RX_QID = re.compile(r'^Q\d+$')
+
+
+class EntityStore(SelfLogger):
+    """
+    Place records keyed by wikidata QID, and the spellings that name them
+
+    Each entity is stored once, however many inventory spellings resolve
+    to it: aliases maps each spelling (normalized with index_key, so case
+    and spacing do not matter) to a QID. store[name] and name in store go
+    through the alias table, so any known spelling is found with two dict
+    probes. A record without a QID is keyed by its first normalized
+    spelling instead.
+
+    parents maps a key to the inventory's district or province the
+    entity was first learned under (e.g. 'province/quảng-nam'), so that
+    variant spellings can be matched within the same parent only.
+
+    On disk a store is {"entities": {qid: record}, "aliases": {name: qid},
+    "parents": {qid: parent}}. Stores in the older layout, one full
+    record per spelling, are read as well and written back in the new one.
+    """
+
+    def __init__(self, entities=None, aliases=None, parents=None):
+        super().__init__()
+        self.entities = {} if entities is None else entities
+        self.aliases = {} if aliases is None else aliases
+        self.parents = {} if parents is None else parents
+
+    @classmethod
+    def load(cls, path):
+        """Read a store from a JSON file, in either layout"""
+        with open(path, 'r', encoding='utf-8') as fp:
+            data = json.load(fp)
+        del fp
+        if (
+            {'entities', 'aliases'} <= set(data)
+            <= {'entities', 'aliases', 'parents'}
+            and 'id' not in data['entities']
+        ):
+            return cls(
+                data['entities'], data['aliases'], data.get('parents'))
+        store = cls()
+        for name, record in data.items():
+            store.set(name, record)
+        return store
+
+    def __contains__(self, name):
+        try:
+            return self.aliases[index_key(name)] in self.entities
+        except KeyError:
+            return False
+
+    def __getitem__(self, name):
+        return self.entities[self.key(name)]
+
+    def __len__(self):
+        return len(self.entities)
+
+    def key(self, name):
+        """Return the key of the entity name is an alias of"""
+        return self.aliases[index_key(name)]
+
+    def items(self):
+        """Return (key, record) pairs, where key is usually a QID"""
+        return self.entities.items()
+
+    def set(self, name, record, parent=None):
+        """
+        Store record, merged into any earlier record of the same entity
+        (so that fields it lacks, e.g. those added by enrichment, are
+        kept), and make name (if not None) an alias of it; return its key
+
+        parent, if given and the entity has none yet, is recorded as the
+        entity's parent.
+        """
+        try:
+            key = record['id']
+        except KeyError:
+            key = None
+        if key is None or not RX_QID.match(key):
+            if name is None:
+                raise ValueError(
+                    'a record without a QID needs a name: {}'.format(record))
+            key = index_key(name)
+        try:
+            existing = self.entities[key]
+        except KeyError:
+            self.entities[key] = record
+        else:
+            self.entities[key] = dict(existing, **record)
+        if name is not None:
+            self.aliases[index_key(name)] = key
+        if parent is not None:
+            self.parents.setdefault(key, parent)
+        return key
+
+    def to_dict(self):
+        """Return the store as a JSON-serializable dict"""
+        return {
+            'entities': self.entities, 'aliases': self.aliases,
+            'parents': self.parents}
+
+    def write(self, path):
+        """Write the store to a JSON file, atomically"""
+        write_json_atomic(path, self.to_dict())
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Export a gazetteer snapshot as GeoJSON or Linked Places Format
+"""
+
+from airtight.cli import configure_commandline
+from campa.geography.export import BASE_URI, FORMATS, export
+from campa.geography.gazetteer import Gazetteer
+import logging
+from pathlib import Path
+import sys
+
+DEFAULT_LOG_LEVEL = logging.WARNING
+OPTIONAL_ARGUMENTS = [
+    ['-l', '--loglevel', 'NOTSET',
+        'desired logging level (' +
+        'case-insensitive string: DEBUG, INFO, WARNING, or ERROR',
+        False],
+    ['-v', '--verbose', False, 'verbose output (logging level == INFO)',
+        False],
+    ['-w', '--veryverbose', False,
+        'very verbose output (logging level == DEBUG)', False],
+    ['-f', '--format', 'geojson',
+        'output format ({})'.format(' or '.join(FORMATS)), False],
+    ['-s', '--shard_size', 0,
+        'write shards of this many features, and a manifest, to the '
+        'outfile directory (0: one file)', False],
+    ['-b', '--base_uri', BASE_URI,
+        'prefix of the pids in LPF @id and relation URIs', False]
+]
+POSITIONAL_ARGUMENTS = [
+    # each row is a list with 3 elements: name, type, help
+    ['snapshot', str, 'gazetteer snapshot (see inv2geo.py --snapshot)'],
+    ['outfile', str, 'output file (or directory, with --shard_size)']
+]
+
+
+def main(**kwargs):
+    """
+    main function
+    """
+    logging.basicConfig(format='%(levelname)s:%(message)s')
+    logger = logging.getLogger(__package__)
+    fmt = kwargs['format']
+    if fmt not in FORMATS:
+        logger.error(
+            'Unknown format "%s": expected one of %s', fmt,
+            ', '.join(FORMATS))
+        sys.exit(1)
+    g = Gazetteer.load(Path(kwargs['snapshot']).expanduser().resolve())
+    path = Path(kwargs['outfile']).expanduser().resolve()
+    count = export(
+        g, path, fmt=fmt, shard_size=kwargs['shard_size'],
+        base_uri=kwargs['base_uri'])
+    logger.info('Wrote %s features to %s', count, str(path))
+
+
+if __name__ == "__main__":
+    main(**configure_commandline(
+        OPTIONAL_ARGUMENTS, POSITIONAL_ARGUMENTS, DEFAULT_LOG_LEVEL))
@@ -5,9 +5,16 @@ Convert Campā inventory to geodata
 """
 
 from airtight.cli import configure_commandline
+from campa.geography.enrichment import (
+    ENTITY_URL, EntityCache, EntityFetcher, enrich_stores, store_qids)
 from campa.geography.gazetteer import Gazetteer
-from campa.geography.norm import norm
+from campa.geography.incremental import IncrementalBuilder
+from campa.geography.inventory import (
+    group_hierarchies, load_columns, normalize_rows, parse_groups,
+    parse_groups_parallel, parse_rows, read_rows, write_ndjson)
 from campa.geography.parser import PlaceParser
+from campa.geography.profiling import RunProfile
+from campa.geography.resolution import ResolutionStore, StubResolver
 from encoded_csv import get_csv
 import logging
 from logging import debug, info, warning, error, fatal
@@ -15,8 +22,8 @@ from pathlib import Path
 from pprint import pformat, pprint
 import re
 import sys
+import time
 from textnorm import normalize_space, normalize_unicode
-from wikidata.client import Client as wdClient
 
 DEFAULT_LOG_LEVEL = logging.WARNING
 OPTIONAL_ARGUMENTS = [
@@ -30,7 +37,37 @@ OPTIONAL_ARGUMENTS = [
         'very verbose output (logging level == DEBUG)', False],
     ['-d', '--districts', 'districts.json', 'districts info', False],
     ['-c', '--communes', 'communes.json', 'communes info', False],
-    ['-t', '--villages', 'villages.json', 'villages info', False]
+    ['-t', '--villages', 'villages.json', 'villages info', False],
+    ['-r', '--resolutions', 'resolutions.db',
+        'resolution store and review queue (SQLite)', False],
+    ['-n', '--noninteractive', False,
+        'queue unknown names for later review instead of prompting', False],
+    ['-O', '--offline', False,
+        'use the local stores only and never load the remote resolvers '
+        '(implies --noninteractive)', False],
+    ['-j', '--jobs', 1,
+        'number of worker processes (implies --noninteractive)', False],
+    ['-o', '--ndjson', '',
+        'stream gazetteer records to this file as NDJSON ("-" for stdout)',
+        False],
+    ['-s', '--snapshot', '',
+        'also save the gazetteer to this SQLite snapshot file', False],
+    ['-i', '--incremental', False,
+        'reparse only the rows changed since the --snapshot was saved',
+        False],
+    ['-x', '--xml', 'xml',
+        'directory of EpiDoc files, to index the inscriptions\' files by '
+        'place', False],
+    ['-P', '--profile-report', '',
+        'write per-level timers and counters, with store hit ratios, to '
+        'this JSON file', False],
+    ['-e', '--enrich', False,
+        'first fetch the stores\' wikidata entities (concurrently) and add '
+        'their coordinates, labels and P131 parents to the stores', False],
+    ['-E', '--entity-url', ENTITY_URL,
+        'URL template for --enrich, with a {qid} field', False],
+    ['-C', '--entity-cache', 'entities.db',
+        'cache of entities fetched by --enrich (SQLite)', False]
 ]
 POSITIONAL_ARGUMENTS = [
     # each row is a list with 3 elements: name, type, help
@@ -44,9 +81,6 @@ def main(**kwargs):
     """
     logging.basicConfig(format='%(levelname)s:%(message)s')
     logger = logging.getLogger(__package__)
-    data = get_csv(kwargs['infile'])
-    logger.debug('CSV fieldnames: %s', data['fieldnames'])
-    logger.info('Rows in CSV file: %s', len(data['content']))
     g = Gazetteer()
     districts = kwargs['districts']
     if districts == 'districts.json':
@@ -66,22 +100,135 @@ def main(**kwargs):
     else:
         vpath = Path(villages).expanduser().resolve()
     logger.info('Path to villages file: %s', str(vpath))
-    p = PlaceParser(dpath, cpath, vpath, g)
-    for i, row in enumerate(data['content']):
-        # country -> province -> district -> commune -> village -> position
-        clean_data = {
-            'cnumber': norm(row['N° C.']),
-            'country': norm(row['Pays']),
-            'province': norm(row['Province  (Tỉnh, Thành Phố)']),
-            'district': norm(row['District (Huyện ou Thì xã)']),
-            'commune': norm(row['Commune  (Xã)']),
-            'village': norm(row['Village  (Thôn)']),
-            'position': norm(row['Position'])
-        }
-        p.parse(**clean_data)
-        if i == 20:
-            g.dump()
-            sys.exit()
+    xml = kwargs['xml']
+    if xml == 'xml':
+        xpath = Path(__file__).resolve().parent.parent.parent / xml
+    else:
+        xpath = Path(xml).expanduser().resolve()
+    if xpath.is_dir():
+        g.add_files(sorted(xpath.glob('*.xml')))
+        logger.info(
+            'EpiDoc files in %s: %s', str(xpath),
+            len(g.catalog['inscriptions'].file_ids()))
+    else:
+        logger.warning('No EpiDoc directory at %s', str(xpath))
+    resolutions = kwargs['resolutions']
+    if resolutions == 'resolutions.db':
+        rpath = Path(__file__).parent.parent / 'data' / resolutions
+    else:
+        rpath = Path(resolutions).expanduser().resolve()
+    logger.info('Path to resolution store: %s', str(rpath))
+    store = ResolutionStore(rpath)
+    jobs = kwargs['jobs']
+    interactive = not kwargs['noninteractive']
+    if jobs > 1 and interactive:
+        logger.warning('--jobs %s implies --noninteractive', jobs)
+        interactive = False
+    resolver = None
+    if kwargs['offline']:
+        # unknown names are queued for review.py, as with --noninteractive
+        interactive = False
+        resolver = StubResolver()
+    p = PlaceParser(
+        dpath, cpath, vpath, g, resolver=resolver, resolutions=store,
+        interactive=interactive)
+    if kwargs['enrich'] and kwargs['offline']:
+        logger.warning('--offline: ignoring --enrich')
+    elif kwargs['enrich']:
+        entity_cache = kwargs['entity_cache']
+        if entity_cache == 'entities.db':
+            epath = Path(__file__).parent.parent / 'data' / entity_cache
+        else:
+            epath = Path(entity_cache).expanduser().resolve()
+        logger.info('Path to entity cache: %s', str(epath))
+        cache = EntityCache(epath)
+        try:
+            fetcher = EntityFetcher(cache, kwargs['entity_url'])
+            summaries = fetcher.fetch_all(store_qids(p))
+        finally:
+            cache.close()
+        logger.info(
+            'Enriched %s store records', enrich_stores(p, summaries))
+    profile = None
+    if kwargs['profile_report']:
+        profile = p.profile = g.profile = RunProfile()
+        if jobs > 1:
+            logger.warning(
+                '--profile-report: parsing in worker processes is timed '
+                'as a whole, not per level')
+    incremental = kwargs['incremental']
+    if incremental and not kwargs['snapshot']:
+        logger.warning('--incremental requires --snapshot; ignoring it')
+        incremental = False
+    elif incremental and (kwargs['ndjson'] or jobs > 1):
+        logger.warning('--incremental builds serially, without --ndjson')
+        kwargs['ndjson'] = ''
+        jobs = 1
+    if profile is not None:
+        start = time.perf_counter()
+    try:
+        if incremental:
+            spath = Path(kwargs['snapshot']).expanduser().resolve()
+            data = get_csv(kwargs['infile'])
+            stats = IncrementalBuilder(p, spath).build(data['content'])
+            logger.info(
+                'Incremental build: %s', ', '.join(
+                    ['{} {}'.format(v, k) for k, v in stats.items()]))
+            if profile is not None:
+                for k, v in stats.items():
+                    profile.count('incremental.{}'.format(k), v)
+        elif kwargs['ndjson']:
+            if jobs > 1:
+                logger.warning('--ndjson parses rows serially; ignoring --jobs')
+            rows = normalize_rows(read_rows(kwargs['infile']))
+            if kwargs['ndjson'] == '-':
+                write_ndjson(parse_rows(p, rows), sys.stdout)
+            else:
+                with open(kwargs['ndjson'], 'w', encoding='utf-8') as fp:
+                    write_ndjson(parse_rows(p, rows), fp)
+                del fp
+        else:
+            data = get_csv(kwargs['infile'])
+            logger.debug('CSV fieldnames: %s', data['fieldnames'])
+            logger.info('Rows in CSV file: %s', len(data['content']))
+            columns = load_columns(data['content'])
+            groups = group_hierarchies(columns)
+            logger.info('Distinct place hierarchies: %s', len(groups))
+            if jobs > 1:
+                store.commit()
+                parse_groups_parallel(p, groups, jobs)
+            else:
+                parse_groups(p, groups)
+    finally:
+        if profile is not None:
+            profile.time('stage.parse', time.perf_counter() - start)
+            start = time.perf_counter()
+        p.flush()
+        if profile is not None:
+            profile.time('stage.flush', time.perf_counter() - start)
+        queued = len(store)
+        store.close()
+        if queued:
+            logger.warning(
+                '%s names are waiting for review in %s', queued, rpath)
+    if kwargs['snapshot'] and not incremental:
+        spath = Path(kwargs['snapshot']).expanduser().resolve()
+        if profile is not None:
+            start = time.perf_counter()
+        g.save(spath)
+        if profile is not None:
+            profile.time('stage.snapshot', time.perf_counter() - start)
+        logger.info('Saved gazetteer snapshot to %s', str(spath))
+    if not kwargs['ndjson']:
+        if profile is not None:
+            start = time.perf_counter()
+        g.dump()
+        if profile is not None:
+            profile.time('stage.dump', time.perf_counter() - start)
+    if profile is not None:
+        profile.count('places', len(g.places))
+        profile.write(Path(kwargs['profile_report']).expanduser().resolve())
+
 
 if __name__ == "__main__":
     main(**configure_commandline(
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Resolve place names queued for review by a non-interactive inv2geo run
+"""
+
+from airtight.cli import configure_commandline
+from campa.geography.resolution import ResolutionStore, WikidataResolver
+import logging
+from pathlib import Path
+
+DEFAULT_LOG_LEVEL = logging.WARNING
+OPTIONAL_ARGUMENTS = [
+    ['-l', '--loglevel', 'NOTSET',
+        'desired logging level (' +
+        'case-insensitive string: DEBUG, INFO, WARNING, or ERROR',
+        False],
+    ['-v', '--verbose', False, 'verbose output (logging level == INFO)',
+        False],
+    ['-w', '--veryverbose', False,
+        'very verbose output (logging level == DEBUG)', False],
+    ['-r', '--resolutions', 'resolutions.db',
+        'resolution store and review queue (SQLite)', False],
+    ['-p', '--ptype', 'all',
+        'review only this place type (district, commune, or village)', False]
+]
+POSITIONAL_ARGUMENTS = [
+    # each row is a list with 3 elements: name, type, help
+]
+
+
+def main(**kwargs):
+    """
+    main function
+    """
+    logging.basicConfig(format='%(levelname)s:%(message)s')
+    logger = logging.getLogger(__package__)
+    resolutions = kwargs['resolutions']
+    if resolutions == 'resolutions.db':
+        rpath = Path(__file__).parent.parent / 'data' / resolutions
+    else:
+        rpath = Path(resolutions).expanduser().resolve()
+    logger.info('Path to resolution store: %s', str(rpath))
+    store = ResolutionStore(rpath)
+    resolver = WikidataResolver()
+    queue = store.queue()
+    if kwargs['ptype'] != 'all':
+        queue = [q for q in queue if q[0] == kwargs['ptype']]
+    logger.info('Names to review: %s', len(queue))
+    try:
+        for i, (ptype, term, context) in enumerate(queue):
+            print('[{}/{}]'.format(i + 1, len(queue)))
+            suggestion = resolver.resolve(term, ptype, context)
+            store.set(ptype, term, suggestion)
+            store.commit()
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main(**configure_commandline(
+        OPTIONAL_ARGUMENTS, POSITIONAL_ARGUMENTS, DEFAULT_LOG_LEVEL))
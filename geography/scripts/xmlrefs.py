@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Check the cic-geo: place refs in the EpiDoc corpus against a gazetteer
+"""
+
+from airtight.cli import configure_commandline
+from campa.geography.crosslink import crosslink
+from campa.geography.gazetteer import Gazetteer
+import json
+import logging
+import os
+from pathlib import Path
+import sys
+
+DEFAULT_LOG_LEVEL = logging.WARNING
+OPTIONAL_ARGUMENTS = [
+    ['-l', '--loglevel', 'NOTSET',
+        'desired logging level (' +
+        'case-insensitive string: DEBUG, INFO, WARNING, or ERROR',
+        False],
+    ['-v', '--verbose', False, 'verbose output (logging level == INFO)',
+        False],
+    ['-w', '--veryverbose', False,
+        'very verbose output (logging level == DEBUG)', False],
+    ['-x', '--xml', 'xml', 'directory of EpiDoc files', False],
+    ['-j', '--jobs', 0,
+        'number of worker processes (0: one per CPU)', False],
+    ['-a', '--all', False, 'also list refs that resolve', False],
+    ['-f', '--json', False, 'write the full report as JSON', False]
+]
+POSITIONAL_ARGUMENTS = [
+    # each row is a list with 3 elements: name, type, help
+    ['snapshot', str, 'gazetteer snapshot (see inv2geo.py --snapshot)']
+]
+
+
+def main(**kwargs):
+    """
+    main function
+    """
+    logging.basicConfig(format='%(levelname)s:%(message)s')
+    logger = logging.getLogger(__package__)
+    xml = kwargs['xml']
+    if xml == 'xml':
+        xpath = Path(__file__).resolve().parent.parent.parent / xml
+    else:
+        xpath = Path(xml).expanduser().resolve()
+    paths = sorted(xpath.glob('*.xml'))
+    logger.info('EpiDoc files in %s: %s', str(xpath), len(paths))
+    jobs = kwargs['jobs'] or os.cpu_count() or 1
+    g = Gazetteer.load(Path(kwargs['snapshot']).expanduser().resolve())
+    links, errors = crosslink(g, paths, jobs=jobs)
+    if kwargs['json']:
+        print(json.dumps(
+            {'refs': links, 'errors': errors}, ensure_ascii=False, indent=4))
+    else:
+        for ref, link in sorted(links.items()):
+            if link['status'] == 'resolved' and not kwargs['all']:
+                continue
+            print('{}: {} {} (in {})'.format(
+                ref, link['status'], ', '.join(link['pids']) or '-',
+                ', '.join(sorted(link['files']))))
+        for file_id, error in sorted(errors.items()):
+            print('{}: XML error: {}'.format(file_id, error))
+        counts = {}
+        for link in links.values():
+            try:
+                counts[link['status']] += 1
+            except KeyError:
+                counts[link['status']] = 1
+        print('{} files, {} distinct refs: {}'.format(
+            len(paths), len(links), ', '.join([
+                '{} {}'.format(v, k) for k, v in sorted(counts.items())])))
+    problems = [
+        ref for ref, link in links.items()
+        if link['status'] in ['ambiguous', 'unresolved']]
+    if problems or errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(**configure_commandline(
+        OPTIONAL_ARGUMENTS, POSITIONAL_ARGUMENTS, DEFAULT_LOG_LEVEL))
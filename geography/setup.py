@@ -19,5 +19,6 @@ setuptools.setup(
         "Operating System :: OS Independent",
     ],
     install_requires=['airtight'],
+    extras_require={'spatial': ['numpy']},
     python_requires='>=3.9.1'
 )
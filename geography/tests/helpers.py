@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared setup for the campa.geography tests
+"""
+
+from campa.geography.gazetteer import Gazetteer
+from campa.geography.parser import PlaceParser
+from campa.geography.resolution import ResolutionStore
+from pathlib import Path
+import shutil
+import tempfile
+
+DATA = Path(__file__).resolve().parent.parent / 'data'
+INVENTORY = DATA / 'InventaireCampa.csv'
+STORES = ('districts', 'communes', 'villages')
+
+
+def temporary_path(test):
+    """Return a temporary directory, removed once test is done"""
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    return Path(tmp.name)
+
+
+def parser_files(test, path, data=False):
+    """
+    Create the files a PlaceParser works on in path: the three stores
+    (empty, or copies of those in data/ if data is True) and a resolution
+    store; return the store paths and the ResolutionStore
+
+    The resolution store is closed once test is done, before a
+    temporary_path() made earlier is removed (cleanups run last in,
+    first out).
+    """
+    stores = []
+    for store in STORES:
+        stores.append(path / '{}.json'.format(store))
+        if data:
+            shutil.copy(str(DATA / stores[-1].name), str(stores[-1]))
+        else:
+            stores[-1].write_text('{}')
+    resolutions = ResolutionStore(path / 'resolutions.db')
+    test.addCleanup(resolutions.close)
+    return stores, resolutions
+
+
+def make_parser(stores, resolutions, **kwargs):
+    """Return a PlaceParser on stores, with a new Gazetteer"""
+    return PlaceParser(
+        *stores, Gazetteer(), resolutions=resolutions, **kwargs)
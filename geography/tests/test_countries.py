@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the campa.geography.countries module
+"""
+
+from campa.geography.countries import EXONYMS, CountryIndex
+from campa.geography.resolution import StubResolver
+from helpers import make_parser, parser_files, temporary_path
+from unittest import TestCase
+
+
+def row(country, province, cnumber='1'):
+    return {
+        'country': country, 'province': province, 'district': '',
+        'commune': '', 'village': '', 'position': '', 'cnumber': cnumber}
+
+
+class Test_CountryIndex(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # an exonym that makes "Kon Tum" a province of Laos (Attapu) too
+        exonyms = dict(EXONYMS)
+        exonyms[('province', 'Kon Tum')] = 'LA-AT'
+        cls.index = CountryIndex(exonyms=exonyms)
+
+    def test_country(self):
+        for term in ['Vietnam', 'Viêt Nam', 'VN', 'vnm']:
+            self.assertEqual(
+                'VN', self.index.lookup(term, 'country')['alpha_2'])
+
+    def test_province_in_country(self):
+        lookup = self.index.lookup
+        self.assertEqual('VN-28', lookup('Kon Tum', 'province', 'VN')['code'])
+        self.assertEqual('LA-AT', lookup('Kon Tum', 'province', 'LA')['code'])
+        self.assertEqual(
+            'LA-AT', lookup('Attapu', 'province', 'LA')['code'])
+        with self.assertRaises(LookupError):
+            lookup('Attapu', 'province', 'VN')
+        with self.assertRaises(LookupError):
+            lookup('Kon Tum', 'province', 'KH')
+        # without a country, the first country listed wins
+        self.assertEqual('VN-28', lookup('Kon Tum', 'province')['code'])
+
+
+class Test_Provinces(TestCase):
+
+    def test_own_country(self):
+        p = make_parser(
+            *parser_files(self, temporary_path(self)),
+            resolver=StubResolver(), interactive=True)
+        places = p.parse(**row('Vietnam', 'Kon Tum'))
+        self.assertEqual(['viet-nam', 'kon-tum'], [x.pid for x in places])
+        self.assertEqual(
+            {'ISO 3166-2': ['VN-28']}, places[-1].identifiers)
+        places = p.parse(**row('Laos', 'Kon Tum', '2'))
+        self.assertEqual('province/kon-tum', places[-1].pid)
+        self.assertIsNone(places[-1].identifiers)
+        self.assertEqual(
+            'lao-people-s-democratic-republic', places[-1].country['pid'])
+        self.assertEqual(['1'], list(p.gazetteer.places['kon-tum'].cnumbers))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the campa.geography.crosslink module
+"""
+
+from campa.geography.crosslink import RefResolver, crosslink
+from campa.geography.gazetteer import Gazetteer
+from campa.geography.inventory import (
+    group_hierarchies, load_columns, parse_groups, read_rows)
+from campa.geography.place import CampaPlace
+from helpers import (
+    DATA, INVENTORY, make_parser, parser_files, temporary_path)
+from unittest import TestCase
+
+XML = DATA.parent.parent / 'xml'
+
+
+class Test_RefResolver(TestCase):
+
+    def setUp(self):
+        g = Gazetteer()
+        for pid, name, ptype in [
+                ('quảng-nam', 'Quảng Nam', 'province'),
+                ('village/quảng-nam/trà-kiệu', 'Trà Kiệu', 'village'),
+                ('village/quảng-nam/an-ninh', 'An Ninh', 'village'),
+                ('village/bình-định/an-ninh', 'An Ninh', 'village'),
+                ('village/bình-định/an-nính', 'An Nính', 'village')]:
+            g.set_place(CampaPlace(pid, gazetteer=g, name=name, types=[ptype]))
+        self.resolver = RefResolver(g)
+
+    def test_pid(self):
+        self.assertEqual(
+            ('resolved', ['quảng-nam']), self.resolver.resolve('quảng-nam'))
+        self.assertEqual(
+            ('variant', ['quảng-nam']), self.resolver.resolve('quang-nam'))
+
+    def test_slug(self):
+        self.assertEqual(
+            ('resolved', ['village/quảng-nam/trà-kiệu']),
+            self.resolver.resolve('trà-kiệu'))
+        self.assertEqual(
+            ('variant', ['village/quảng-nam/trà-kiệu']),
+            self.resolver.resolve('tra-kieu'))
+
+    def test_ambiguous(self):
+        self.assertEqual(
+            ('ambiguous', [
+                'village/quảng-nam/an-ninh', 'village/bình-định/an-ninh']),
+            self.resolver.resolve('an-ninh'))
+        # folded, 'an-ninh' also matches 'an-nính'
+        self.assertEqual(
+            ('ambiguous', [
+                'village/quảng-nam/an-ninh', 'village/bình-định/an-ninh',
+                'village/bình-định/an-nính']),
+            self.resolver.resolve('An-Ninh'))
+
+    def test_unresolved(self):
+        status, pids = self.resolver.resolve('tra-kieu-tay')
+        self.assertEqual('unresolved', status)
+        self.assertEqual('village/quảng-nam/trà-kiệu', pids[0])
+
+
+class Test_Corpus(TestCase):
+
+    def test_corpus(self):
+        p = make_parser(
+            *parser_files(self, temporary_path(self), data=True),
+            interactive=False)
+        parse_groups(
+            p, group_hierarchies(load_columns(list(read_rows(INVENTORY)))))
+        paths = sorted(XML.glob('*.xml'))
+        links, errors = crosslink(p.gazetteer, paths, jobs=2)
+        self.assertEqual(
+            {
+                'drang-lai': ('resolved', ['village/gia-lai/drang-lai']),
+                'tra-kieu': ('variant', ['village/quảng-nam/trà-kiệu']),
+                'chiem-son': ('variant', ['village/quảng-nam/chiêm-sơn'])},
+            {
+                ref: (link['status'], link['pids'])
+                for ref, link in links.items()
+                if link['status'] != 'unresolved'})
+        # places the inventory only mentions in its notes
+        self.assertEqual(
+            ['chiem-son-tay', 'chua-vua', 'go-loi'], sorted(
+                ref for ref, link in links.items()
+                if link['status'] == 'unresolved'))
+        self.assertEqual(
+            {'DHARMA_INSCIC00139', 'DHARMA_INSCIC00148'}, set(errors))
+        self.assertEqual(4, sum(links['drang-lai']['files'].values()))
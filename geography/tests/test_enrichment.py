@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the campa.geography.enrichment module against a local HTTP stand-in
+"""
+
+from campa.geography.enrichment import (
+    EntityCache, EntityFetcher, enrich_stores, store_qids, summarize)
+from helpers import make_parser, parser_files, temporary_path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import re
+import threading
+from unittest import TestCase
+
+RX_PATH = re.compile(r'/(Q\d+)\.json$')
+
+
+def entity(qid):
+    return {'entities': {qid: {
+        'id': qid,
+        'labels': {
+            lang: {'language': lang, 'value': '{} ({})'.format(qid, lang)}
+            for lang in ('en', 'vi', 'de')},
+        'claims': {
+            'P131': [{'mainsnak': {'datavalue': {'value': {'id': 'Q1'}}}}],
+            'P625': [{'mainsnak': {'datavalue': {'value': {
+                'latitude': 15.76, 'longitude': 108.12}}}}]}}}}
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Answer Special:EntityData requests from server.script: qid: list of
+    HTTP statuses (or raw bodies) to answer with, in turn, before
+    falling back to a synthetic entity
+    """
+
+    def do_GET(self):
+        qid = RX_PATH.search(self.path).group(1)
+        self.server.requests.append(qid)
+        script = self.server.script.get(qid)
+        answer = script.pop(0) if script else None
+        if isinstance(answer, int):
+            self.send_response(answer)
+            if answer == 429:
+                self.send_header('Retry-After', '0.01')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if answer is None:
+            answer = json.dumps(entity(qid)).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(answer)))
+        self.end_headers()
+        self.wfile.write(answer)
+
+    def log_message(self, *args):
+        pass
+
+
+class Test_EntityFetcher(TestCase):
+
+    def setUp(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        server.daemon_threads = True
+        server.requests = []
+        server.script = {}
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.server = server
+        self.url = 'http://127.0.0.1:{}/wiki/Special:EntityData/{{qid}}.json'
+        self.url = self.url.format(server.server_address[1])
+        self.path = temporary_path(self) / 'entities.db'
+
+    def cache(self, max_age=3600):
+        cache = EntityCache(self.path, max_age)
+        self.addCleanup(cache.close)
+        return cache
+
+    def fetch(self, qids, max_age=3600):
+        cache = self.cache(max_age)
+        fetcher = EntityFetcher(
+            cache, self.url, concurrency=4, rate=0, retries=2, backoff=0.01,
+            timeout=5)
+        return fetcher.fetch_all(qids), fetcher.stats
+
+    def test_fetch(self):
+        summaries, stats = self.fetch(['Q10', 'Q11', 'Q10'])
+        self.assertEqual(['Q10', 'Q11'], sorted(summaries))
+        self.assertEqual(
+            {'en': 'Q10 (en)', 'vi': 'Q10 (vi)'},
+            summaries['Q10']['labels'])
+        self.assertEqual(['Q1'], summaries['Q10']['p131'])
+        self.assertEqual([15.76, 108.12], summaries['Q10']['coordinates'])
+        self.assertEqual(2, stats['fetched'])
+        self.assertEqual(2, len(self.server.requests))
+
+    def test_retry(self):
+        self.server.script = {'Q10': [503, 429]}
+        summaries, stats = self.fetch(['Q10'])
+        self.assertEqual(['Q1'], summaries['Q10']['p131'])
+        self.assertEqual(2, stats['retried'])
+        self.assertEqual(['Q10'] * 3, self.server.requests)
+
+    def test_give_up(self):
+        self.server.script = {'Q10': [503, 503, 503]}
+        summaries, stats = self.fetch(['Q10', 'Q11'])
+        self.assertEqual(['Q11'], list(summaries))
+        self.assertEqual(1, stats['failed'])
+        self.assertEqual(1, len(self.cache()))
+
+    def test_not_retried(self):
+        self.server.script = {'Q10': [403]}
+        summaries, stats = self.fetch(['Q10'])
+        self.assertEqual({}, summaries)
+        self.assertEqual(0, stats['retried'])
+        self.assertEqual(1, stats['failed'])
+
+    def test_missing(self):
+        self.server.script = {'Q10': [404]}
+        summaries, stats = self.fetch(['Q10'])
+        self.assertEqual({'Q10': None}, summaries)
+        self.assertIsNone(self.cache().get('Q10'))
+
+    def test_unreadable(self):
+        self.server.script = {'Q10': [b'{"entities": '], 'Q11': [b'[]']}
+        summaries, stats = self.fetch(['Q10', 'Q11', 'Q12'])
+        self.assertEqual(['Q12'], list(summaries))
+        self.assertEqual(2, stats['failed'])
+        # what was fetched is committed all the same
+        self.assertEqual(1, len(self.cache()))
+
+    def test_redirect(self):
+        # wikidata answers for a redirected QID under its target's id
+        self.server.script = {
+            'Q10': [json.dumps(entity('Q99')).encode('utf-8')]}
+        summaries, stats = self.fetch(['Q10'])
+        self.assertEqual({'en': 'Q99 (en)', 'vi': 'Q99 (vi)'},
+                         summaries['Q10']['labels'])
+
+    def test_cache(self):
+        self.fetch(['Q10', 'Q11'])
+        summaries, stats = self.fetch(['Q10', 'Q11'])
+        self.assertEqual(2, stats['cached'])
+        self.assertEqual(0, stats['fetched'])
+        self.assertEqual(2, len(self.server.requests))
+        self.assertEqual(['Q1'], summaries['Q11']['p131'])
+
+    def test_cache_expiry(self):
+        self.fetch(['Q10'])
+        summaries, stats = self.fetch(['Q10'], max_age=-1)
+        self.assertEqual(0, stats['cached'])
+        self.assertEqual(1, stats['fetched'])
+        self.assertEqual(['Q10', 'Q10'], self.server.requests)
+
+
+class Test_Enrichment(TestCase):
+
+    def test_summarize(self):
+        summary = summarize(entity('Q20')['entities']['Q20'])
+        self.assertEqual(
+            {'en': 'Q20 (en)', 'vi': 'Q20 (vi)'}, summary['labels'])
+        self.assertEqual(['Q1'], summary['p131'])
+        self.assertEqual([15.76, 108.12], summary['coordinates'])
+        self.assertEqual(
+            {'labels': {}, 'p131': [], 'coordinates': None},
+            summarize({'id': 'Q20'}))
+
+    def test_enrich_stores(self):
+        p = make_parser(*parser_files(self, temporary_path(self)))
+        p._learn('villages', 'Mỹ Sơn', {
+            'id': 'Q746148', 'label': 'Mỹ Sơn', 'repository': 'wikidata'})
+        self.assertEqual(['Q746148'], store_qids(p))
+        summary = summarize(entity('Q746148')['entities']['Q746148'])
+        self.assertEqual(1, enrich_stores(p, {'Q746148': summary}))
+        record = p.villages['Mỹ Sơn']
+        self.assertEqual([15.76, 108.12], record['coordinates'])
+        self.assertEqual(['Q1'], record['p131'])
+        self.assertEqual('Mỹ Sơn', record['label'])
+        self.assertEqual(0, enrich_stores(p, {'Q746148': summary}))
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the campa.geography.export module
+"""
+
+from campa.geography.export import (
+    BASE_URI, LPF_CONTEXT, FeatureWriter, export)
+from campa.geography.gazetteer import Gazetteer
+from campa.geography.place import CampaPlace
+from helpers import temporary_path
+import io
+import json
+import os
+import stat
+from unittest import TestCase
+
+
+class Test_Export(TestCase):
+
+    def setUp(self):
+        self.path = temporary_path(self)
+        g = self.g = Gazetteer()
+        g.set_place(CampaPlace(
+            'quảng-nam', gazetteer=g, name='Quảng Nam', types=['province']))
+        for pid, name, coordinates, cnumber in [
+                ('Q746148', 'Mỹ Sơn', (15.764, 108.124), '1'),
+                ('village/quảng-nam/trà-kiệu', 'Trà Kiệu', (15.83, 108.23),
+                 '3'),
+                ('village/quảng-nam/chiêm-sơn', 'Chiêm Sơn', None, '4')]:
+            place = CampaPlace(
+                pid, gazetteer=g, name=name, types=['village'],
+                province='Quảng Nam', coordinates=coordinates)
+            place.set_cnumber(cnumber)
+            g.set_place(place)
+
+    def read(self, path):
+        with open(path, 'r', encoding='utf-8') as fp:
+            return json.load(fp)
+
+    def test_geojson(self):
+        path = self.path / 'places.geojson'
+        self.assertEqual(4, export(self.g, path))
+        collection = self.read(path)
+        self.assertEqual('FeatureCollection', collection['type'])
+        features = collection['features']
+        self.assertEqual(list(self.g.places), [f['id'] for f in features])
+        feature = features[1]
+        self.assertEqual(
+            {'type': 'Point', 'coordinates': [108.124, 15.764]},
+            feature['geometry'])
+        self.assertEqual('Mỹ Sơn', feature['properties']['title'])
+        self.assertEqual('quảng-nam', feature['properties']['parent'])
+        self.assertEqual(['1'], feature['properties']['cnumbers'])
+        self.assertIsNone(features[0]['geometry'])
+        self.assertEqual(
+            [], [p.name for p in self.path.iterdir() if p != path])
+
+    def test_lpf(self):
+        path = self.path / 'places.lpf.json'
+        export(self.g, path, 'lpf')
+        collection = self.read(path)
+        self.assertEqual(LPF_CONTEXT, collection['@context'])
+        feature = collection['features'][1]
+        self.assertEqual(BASE_URI + 'Q746148', feature['@id'])
+        self.assertEqual([{'toponym': 'Mỹ Sơn'}], feature['names'])
+        self.assertEqual([{
+            'relationType': 'gvp:broaderPartitive',
+            'relationTo': BASE_URI + 'quảng-nam'}], feature['relations'])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            export(self.g, self.path / 'places.kml', 'kml')
+        self.assertEqual([], list(self.path.iterdir()))
+
+    def test_mode(self):
+        path = self.path / 'places.geojson'
+        umask = os.umask(0o022)
+        try:
+            export(self.g, path)
+        finally:
+            os.umask(umask)
+        self.assertEqual(0o644, stat.S_IMODE(os.stat(path).st_mode))
+
+    def test_sharded_lpf(self):
+        path = self.path / 'places'
+        self.assertEqual(4, export(self.g, path, 'lpf', shard_size=3))
+        manifest = self.read(path / 'places.json')
+        self.assertEqual(4, manifest['features'])
+        self.assertEqual(
+            [('places-0000.lpf.json', 3), ('places-0001.lpf.json', 1)],
+            [(s['path'], s['features']) for s in manifest['shards']])
+        self.assertEqual(
+            [108.124, 15.764, 108.23, 15.83], manifest['shards'][0]['bbox'])
+        self.assertIsNone(manifest['shards'][1]['bbox'])
+        ids = []
+        for shard in manifest['shards']:
+            collection = self.read(path / shard['path'])
+            self.assertEqual(LPF_CONTEXT, collection['@context'])
+            self.assertEqual(shard['features'], len(collection['features']))
+            ids.extend([f['@id'] for f in collection['features']])
+        self.assertEqual([BASE_URI + pid for pid in self.g.places], ids)
+
+
+class Test_FeatureWriter(TestCase):
+
+    def feature(self, pid, lon=None, lat=None):
+        geometry = None
+        if lon is not None:
+            geometry = {'type': 'Point', 'coordinates': [lon, lat]}
+        return {'type': 'Feature', 'id': pid, 'geometry': geometry,
+                'properties': {}}
+
+    def test_write(self):
+        fp = io.StringIO()
+        with FeatureWriter(fp, {'name': 'test'}) as writer:
+            self.assertIsNone(writer.bbox)
+            writer.write(self.feature('a'))
+            self.assertIsNone(writer.bbox)
+            for pid, lon, lat in [
+                    ('b', 108.1, 15.7), ('c', 107.5, 16.2),
+                    ('d', 109.0, 11.6)]:
+                writer.write(self.feature(pid, lon, lat))
+        collection = json.loads(fp.getvalue())
+        self.assertEqual('test', collection['name'])
+        self.assertEqual(
+            ['a', 'b', 'c', 'd'], [f['id'] for f in collection['features']])
+        self.assertEqual(4, writer.count)
+        self.assertEqual([107.5, 11.6, 109.0, 16.2], writer.bbox)
+
+    def test_empty(self):
+        fp = io.StringIO()
+        with FeatureWriter(fp):
+            pass
+        self.assertEqual(
+            {'type': 'FeatureCollection', 'features': []},
+            json.loads(fp.getvalue()))
+
+    def test_failed(self):
+        fp = io.StringIO()
+        with self.assertRaises(RuntimeError):
+            with FeatureWriter(fp) as writer:
+                writer.write(self.feature('a', 108.1, 15.7))
+                raise RuntimeError()
+        with self.assertRaises(ValueError):
+            json.loads(fp.getvalue())
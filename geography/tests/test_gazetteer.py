@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the campa.geography.gazetteer module
+"""
+
+from campa.geography.gazetteer import AmbiguousLookupError, Gazetteer
+from campa.geography.place import CampaPlace
+from unittest import TestCase
+
+
+class Test_Merge(TestCase):
+
+    def setUp(self):
+        self.g = Gazetteer()
+
+    def place(self, pid, **kwargs):
+        return CampaPlace(pid, gazetteer=self.g, **kwargs)
+
+    def test_merge(self):
+        g = self.g
+        g.set_place(self.place(
+            'quảng-nam', name='Quảng Nam', types=['province', 'ADM2']))
+        first = self.place('Q746148', name='Mỹ Sơn', types=['village'])
+        first.set_cnumber('1')
+        g.set_place(first)
+        second = self.place(
+            'Q746148', name='My Son', types=['village', 'PPA'],
+            province='Quảng Nam')
+        second.set_cnumber('2')
+        g.set_place(second)
+        place = g.places['Q746148']
+        self.assertIs(first, place)
+        self.assertEqual(('Mỹ Sơn', 'My Son'), place.names)
+        self.assertEqual(('village', 'PPA'), place.types)
+        self.assertEqual('quảng-nam', place.province['pid'])
+        self.assertEqual(['1', '2'], list(place.cnumbers))
+        self.assertEqual(['Q746148'], g.places_for_cnumber('2'))
+        self.assertIs(place, g.lookup('My Son'))
+        self.assertEqual(['quảng-nam'], g.ancestors('Q746148'))
+
+    def test_merge_unchanged(self):
+        g = self.g
+        g.set_place(self.place('Q746148', name='Mỹ Sơn', types=['village']))
+        again = self.place('Q746148', name='Mỹ Sơn', types=['village'])
+        again.set_cnumber('3')
+        g.set_place(again)
+        self.assertEqual(['3'], list(g.places['Q746148'].cnumbers))
+        self.assertEqual(['Q746148'], g.places_for_cnumber('3'))
+
+    def test_merge_conflict(self):
+        g = self.g
+        for pid, name in [
+                ('quảng-nam', 'Quảng Nam'), ('bình-định', 'Bình Định')]:
+            g.set_place(self.place(pid, name=name, types=['province']))
+        g.set_place(self.place(
+            'Q746148', name='Mỹ Sơn', types=['village'],
+            province='Quảng Nam'))
+        with self.assertLogs('CampaPlace:merge', 'WARNING'):
+            g.set_place(self.place(
+                'Q746148', name='Mỹ Sơn', types=['village'],
+                province='Bình Định'))
+        self.assertEqual('quảng-nam', g.places['Q746148'].province['pid'])
+
+    def test_keep_levels_apart(self):
+        g = self.g
+        g.set_place(self.place(
+            'đức-phổ', name='Đức Phổ', types=['district', 'ADM3']))
+        commune = self.place(
+            'đức-phổ', name='Đức Phổ', types=['commune', 'ADM4'])
+        commune.set_cnumber('1')
+        with self.assertLogs('Gazetteer:_qualify_pid', 'WARNING'):
+            g.set_place(commune)
+        self.assertEqual(['đức-phổ', 'commune/đức-phổ'], list(g.places))
+        self.assertEqual(('district', 'ADM3'), g.places['đức-phổ'].types)
+        self.assertIs(commune, g.places['commune/đức-phổ'])
+        # again: merged into the commune, without a second warning
+        again = self.place(
+            'đức-phổ', name='Duc Pho', types=['commune', 'ADM4'])
+        again.set_cnumber('2')
+        g.set_place(again)
+        self.assertEqual(('Đức Phổ', 'Duc Pho'), commune.names)
+        self.assertEqual(
+            ['commune/đức-phổ'], g.places_for_cnumber('2'))
+        self.assertEqual(
+            'commune/đức-phổ', g.lookup('Đức Phổ', 'commune').pid)
+
+    def test_refuse_empty_pid(self):
+        with self.assertRaises(ValueError):
+            self.g.set_place(self.place('', name='?', types=['village']))
+        self.assertEqual({}, self.g.places)
+
+    def test_overwrite(self):
+        g = self.g
+        g.set_place(self.place('x', name='X', types=['district']))
+        with self.assertLogs('Gazetteer:_set_place', 'WARNING'):
+            g.set_place(
+                self.place('x', name='Y', types=['commune']),
+                overwrite=True)
+        self.assertEqual(('Y',), g.places['x'].names)
+
+
+class Test_Lookup(TestCase):
+
+    def setUp(self):
+        g = self.g = Gazetteer()
+        for pid, name in [
+                ('quảng-nam', 'Quảng Nam'), ('bình-định', 'Bình Định')]:
+            g.set_place(CampaPlace(
+                pid, gazetteer=g, name=name, types=['province']))
+        for pid, province in [
+                ('district/quảng-nam/an-ninh', 'Quảng Nam'),
+                ('district/bình-định/an-ninh', 'Bình Định')]:
+            g.set_place(CampaPlace(
+                pid, gazetteer=g, name='An Ninh', types=['district'],
+                province=province))
+        g.set_place(CampaPlace(
+            'village/quảng-nam/an-ninh', gazetteer=g, name='An Ninh',
+            types=['village'], province='Quảng Nam', district='An Ninh'))
+
+    def test_ambiguous(self):
+        with self.assertRaises(LookupError):
+            self.g.lookup('An Ninh')
+        self.g.trace = []
+        with self.assertRaises(AmbiguousLookupError) as cm:
+            self.g.lookup('An Ninh', 'district')
+        pids = ['district/quảng-nam/an-ninh', 'district/bình-định/an-ninh']
+        self.assertEqual(pids, cm.exception.pids)
+        self.assertEqual(
+            [['lookup', ['An Ninh', 'district', None], pids]], self.g.trace)
+        # a reference to an ambiguous place is kept, without a pid
+        place = CampaPlace(
+            'village/x', gazetteer=self.g, name='X', types=['village'],
+            district='An Ninh')
+        self.assertEqual({'name': 'An Ninh'}, place.district)
+
+    def test_ptype(self):
+        self.assertEqual(
+            'village/quảng-nam/an-ninh',
+            self.g.lookup('an-ninh', 'village').pid)
+        with self.assertRaises(LookupError):
+            self.g.lookup('An Ninh', 'commune')
+
+    def test_within(self):
+        self.assertEqual(
+            'district/bình-định/an-ninh',
+            self.g.lookup('An Ninh', 'district', 'bình-định').pid)
+        # the district directly inside the province, not the village
+        self.assertEqual(
+            'district/quảng-nam/an-ninh',
+            self.g.lookup('An Ninh', within='quảng-nam').pid)
+        # a place's parents are looked up within its outer parents
+        self.assertEqual(
+            ['quảng-nam', 'district/quảng-nam/an-ninh'],
+            self.g.ancestors('village/quảng-nam/an-ninh'))
+
+    def test_trace(self):
+        self.g.trace = []
+        self.g.lookup('An Ninh', 'district', 'bình-định')
+        self.assertEqual([[
+            'lookup', ['An Ninh', 'district', 'bình-định'],
+            'district/bình-định/an-ninh']], self.g.trace)
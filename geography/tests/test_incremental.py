@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the campa.geography.incremental module
+"""
+
+from campa.geography.incremental import IncrementalBuilder, row_hashes
+from campa.geography.inventory import (
+    FIELDS, group_hierarchies, load_columns, parse_groups, read_rows)
+from helpers import INVENTORY, make_parser, parser_files, temporary_path
+from unittest import TestCase
+
+
+def state(gazetteer):
+    """What a build produces: places in order, and the name index"""
+    names = gazetteer.catalog['names2pids']
+    return (
+        [p.to_dict() for p in gazetteer.places.values()],
+        list(names.pairs()), list(names.reverse_pairs()))
+
+
+class Test_IncrementalBuilder(TestCase):
+
+    def setUp(self):
+        self.path = temporary_path(self)
+        self.stores, self.resolutions = parser_files(
+            self, self.path, data=True)
+        self.snapshot = self.path / 'snapshot.db'
+        self.rows = list(read_rows(INVENTORY))
+
+    def parser(self):
+        return make_parser(
+            self.stores, self.resolutions, interactive=False)
+
+    def full(self, rows):
+        p = self.parser()
+        parse_groups(p, group_hierarchies(load_columns(rows)))
+        return state(p.gazetteer)
+
+    def incremental(self, rows):
+        p = self.parser()
+        stats = IncrementalBuilder(p, self.snapshot).build(rows)
+        return state(p.gazetteer), stats
+
+    def test_first_build(self):
+        result, stats = self.incremental(self.rows)
+        self.assertEqual(self.full(self.rows), result)
+        self.assertEqual(len(self.rows), stats['added'])
+        self.assertEqual(0, stats['replayed'])
+
+    def test_unchanged(self):
+        self.incremental(self.rows)
+        result, stats = self.incremental(self.rows)
+        self.assertEqual(self.full(self.rows), result)
+        self.assertEqual(0, stats['parsed'])
+
+    def test_changes(self):
+        self.incremental(self.rows)
+        rows = [dict(row) for row in self.rows]
+        village = FIELDS['village']
+        rows[10][village] = rows[200][village]
+        del rows[50]
+        rows.insert(100, dict(rows[300]))
+        rows[5], rows[400] = rows[400], rows[5]
+        result, stats = self.incremental(rows)
+        self.assertEqual(self.full(rows), result)
+        self.assertEqual(1, stats['deleted'])
+        self.assertGreater(stats['replayed'], stats['parsed'])
+        self.assertGreater(stats['parsed'], 0)
+
+    def test_stores_changed(self):
+        self.incremental(self.rows)
+        p = self.parser()
+        p._learn('villages', 'Mỹ Sơn', {
+            'id': 'Q746148', 'label': 'Mỹ Sơn', 'repository': 'wikidata'})
+        p.flush()
+        result, stats = self.incremental(self.rows)
+        self.assertEqual(self.full(self.rows), result)
+        self.assertEqual(0, stats['replayed'])
+
+    def test_row_hashes(self):
+        hashes = row_hashes(self.rows)
+        self.assertEqual(len(self.rows), len(hashes))
+        rows = [dict(row) for row in self.rows]
+        rows[0][FIELDS['village']] += ' (?)'
+        changed = row_hashes(rows)
+        self.assertEqual(list(hashes), list(changed))
+        self.assertEqual(
+            [k for k in hashes if hashes[k] != changed[k]],
+            [list(hashes)[0]])
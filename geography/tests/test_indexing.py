@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the campa.geography.indexing module
+"""
+
+from campa.geography.resolution import StubResolver
+from helpers import make_parser, parser_files, temporary_path
+from unittest import TestCase
+
+ROWS = [
+    ('Quảng Nam', 'Duy Xuyên', 'Duy Phú', 'Mỹ Sơn', '1'),
+    ('Quảng Nam', 'Duy Xuyên', 'Duy Phú', 'Mỹ Sơn', '2'),
+    ('Quảng Nam', 'Duy Xuyên', 'Duy Sơn', 'Trà Kiệu', '3'),
+    ('Quảng Nam', 'Duy Xuyên', '', '', '5'),
+    ('Bình Định', '', '', 'Đại Hữu', '4')]
+DUY_XUYEN = 'district/quảng-nam/duy-xuyên'
+MY_SON = 'village/quảng-nam/mỹ-sơn'
+
+
+class Test_ContainmentIndex(TestCase):
+
+    def setUp(self):
+        p = make_parser(
+            *parser_files(self, temporary_path(self)),
+            resolver=StubResolver(), interactive=True)
+        for province, district, commune, village, cnumber in ROWS:
+            p.parse(
+                country='Vietnam', province=province, district=district,
+                commune=commune, village=village, position='',
+                cnumber=cnumber)
+        self.g = p.gazetteer
+        self.index = self.g.catalog['containment']
+
+    def test_ancestors(self):
+        self.assertEqual([], self.g.ancestors('viet-nam'))
+        self.assertEqual(
+            ['viet-nam', 'quảng-nam', DUY_XUYEN, 'commune/quảng-nam/duy-phú'],
+            self.g.ancestors(MY_SON))
+        self.assertEqual(
+            ['viet-nam', 'bình-định'],
+            self.g.ancestors('village/bình-định/đại-hữu'))
+
+    def test_descendants(self):
+        self.assertEqual([
+            'commune/quảng-nam/duy-phú', MY_SON, 'commune/quảng-nam/duy-sơn',
+            'village/quảng-nam/trà-kiệu'], self.g.descendants(DUY_XUYEN))
+        self.assertEqual(
+            sorted(set(self.g.places) - {'viet-nam'}),
+            sorted(self.g.descendants('viet-nam')))
+        self.assertEqual([], self.g.descendants(MY_SON))
+
+    def test_closure(self):
+        # descendants() and ancestors() are each other's transitive closure
+        places = self.g.places
+        for pid in places:
+            for other in places:
+                self.assertEqual(
+                    pid in self.g.ancestors(other),
+                    other in self.g.descendants(pid), (pid, other))
+            for ancestor in self.g.ancestors(pid):
+                self.assertTrue(
+                    set(self.g.ancestors(ancestor))
+                    < set(self.g.ancestors(pid)), (pid, ancestor))
+
+    def test_cnumbers_under(self):
+        self.assertEqual(
+            ['1', '2', '3', '4', '5'],
+            sorted(self.g.cnumbers_under('viet-nam')))
+        self.assertEqual(
+            ['1', '2', '3', '5'], sorted(self.g.cnumbers_under(DUY_XUYEN)))
+        self.assertEqual(['1', '2'], sorted(self.g.cnumbers_under(MY_SON)))
+
+    def test_unknown(self):
+        with self.assertRaises(KeyError):
+            self.g.ancestors('village/quảng-nam/nowhere')
+        with self.assertRaises(KeyError):
+            self.index.ancestors('village/quảng-nam/nowhere')
+        with self.assertRaises(KeyError):
+            self.g.cnumbers_under('village/quảng-nam/nowhere')
+        self.assertEqual([], self.g.descendants('village/quảng-nam/nowhere'))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the campa.geography.inscriptions module
+"""
+
+from campa.geography.inscriptions import InscriptionIndex, file_cnumber
+from campa.geography.resolution import StubResolver
+from helpers import DATA, make_parser, parser_files, temporary_path
+from unittest import TestCase
+
+XML = DATA.parent.parent / 'xml'
+
+
+class Test_InscriptionIndex(TestCase):
+
+    def setUp(self):
+        index = self.index = InscriptionIndex()
+        for pid, cnumber in [('a', '30'), ('a', '1'), ('b', '30')]:
+            index.add(pid, cnumber)
+        for file_id in [
+                'DHARMA_INSCIC00030B1', XML / 'DHARMA_INSCIC00030B2.xml',
+                'DHARMA_INSCIC00001', 'DHARMA_INSCIC00999', 'README']:
+            index.add_file(file_id)
+
+    def test_file_cnumber(self):
+        self.assertEqual('30', file_cnumber('DHARMA_INSCIC00030B1'))
+        self.assertEqual(
+            '171', file_cnumber('xml/DHARMA_INSCIC00171_DABA.xml'))
+        self.assertIsNone(file_cnumber('DHARMA_INSCIK00001'))
+
+    def test_place_to_inscriptions(self):
+        self.assertEqual(['30', '1'], self.index.cnumbers('a'))
+        self.assertEqual(
+            ['DHARMA_INSCIC00030B1', 'DHARMA_INSCIC00030B2',
+             'DHARMA_INSCIC00001'], self.index.files_at('a'))
+        self.assertEqual([], self.index.cnumbers('c'))
+        self.assertEqual([], self.index.files_at('c'))
+
+    def test_inscription_to_places(self):
+        self.assertEqual(['a', 'b'], self.index.pids('30'))
+        self.assertEqual(
+            ['a', 'b'], self.index.pids_for_file('DHARMA_INSCIC00030B2.xml'))
+        self.assertEqual(['a'], self.index.pids_for_file('DHARMA_INSCIC00001'))
+        # a file of an inscription no place was recorded for
+        self.assertEqual([], self.index.pids_for_file('DHARMA_INSCIC00999'))
+        self.assertEqual([], self.index.pids_for_file('README'))
+        self.assertEqual([], self.index.pids('2'))
+
+    def test_file_ids(self):
+        self.assertEqual(
+            ['DHARMA_INSCIC00030B1', 'DHARMA_INSCIC00030B2',
+             'DHARMA_INSCIC00001', 'DHARMA_INSCIC00999'],
+            self.index.file_ids())
+        self.assertEqual(2, len(self.index))
+
+
+class Test_Gazetteer(TestCase):
+
+    def test_parse(self):
+        p = make_parser(
+            *parser_files(self, temporary_path(self)),
+            resolver=StubResolver(), interactive=True)
+        g = p.gazetteer
+        g.add_files(sorted(XML.glob('*.xml')))
+        for village, cnumber in [('Mỹ Sơn', '30'), ('Trà Kiệu', '1')]:
+            p.parse(
+                country='Vietnam', province='Quảng Nam', district='',
+                commune='', village=village, position='', cnumber=cnumber)
+        my_son = 'village/quảng-nam/mỹ-sơn'
+        self.assertEqual(['30'], list(g.places[my_son].cnumbers))
+        self.assertEqual([my_son], g.places_for_cnumber('30'))
+        self.assertEqual(
+            ['DHARMA_INSCIC00030B1', 'DHARMA_INSCIC00030B2',
+             'DHARMA_INSCIC00030B4'], g.files_at(my_son))
+        for file_id in g.files_at(my_son):
+            self.assertEqual([my_son], g.places_for_file(file_id))
+        self.assertEqual(
+            ['village/quảng-nam/trà-kiệu'],
+            g.places_for_file(XML / 'DHARMA_INSCIC00001.xml'))
+        # the province holds no inscription of its own
+        self.assertEqual([], g.files_at('quảng-nam'))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the scripts/inv2geo.py command line, run in a subprocess
+"""
+
+from campa.geography.inventory import (
+    group_hierarchies, load_columns, read_rows)
+from campa.geography.enrichment import EntityCache
+from helpers import INVENTORY, STORES, parser_files, temporary_path
+from http.server import ThreadingHTTPServer
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+from test_enrichment import Handler
+import threading
+from unittest import TestCase
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPT = ROOT / 'scripts' / 'inv2geo.py'
+# modules only the remote resolvers need
+REMOTE = ('wikidata', 'wikidata_suggest', 'colorama')
+
+
+def imported(stderr):
+    """Top-level names of the modules listed by python -X importtime"""
+    names = set()
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            name = line.rsplit('|', 1)[1].strip()
+            names.add(name.split('.')[0])
+    return names
+
+
+class Test_Inv2geo(TestCase):
+
+    def setUp(self):
+        self.path = temporary_path(self)
+        parser_files(self, self.path, data=True)
+        # the header and the first 30 rows of the inventory
+        with open(INVENTORY, 'r', encoding='utf-8-sig') as fp:
+            lines = [next(fp) for i in range(31)]
+        self.infile = self.path / 'inventory.csv'
+        self.infile.write_text(''.join(lines), encoding='utf-8')
+
+    def run_script(self, *args, python=()):
+        """Run inv2geo on the copies of the stores; return the process"""
+        stores = []
+        for flag, store in zip(['-d', '-c', '-t'], STORES):
+            stores.extend([flag, str(self.path / '{}.json'.format(store))])
+        process = subprocess.run(
+            [sys.executable, *python, str(SCRIPT), *stores,
+             '-r', str(self.path / 'resolutions.db'), *args,
+             str(self.infile)],
+            capture_output=True, text=True,
+            env=dict(os.environ, PYTHONPATH=str(ROOT)))
+        self.assertEqual(0, process.returncode, process.stderr)
+        return process
+
+    def test_lazy_imports(self):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c',
+             'import campa.geography.parser'],
+            capture_output=True, text=True,
+            env=dict(os.environ, PYTHONPATH=str(ROOT)))
+        self.assertEqual(0, process.returncode, process.stderr)
+        names = imported(process.stderr)
+        self.assertIn('campa', names)
+        self.assertEqual(
+            set(), names & set(REMOTE + ('pycountry', 'numpy')))
+
+    def test_offline(self):
+        process = self.run_script('-O', python=('-X', 'importtime'))
+        names = imported(process.stderr)
+        self.assertIn('pycountry', names)
+        self.assertEqual(set(), names & set(REMOTE))
+        self.assertIn('viet-nam', process.stdout.splitlines())
+        # names the stores do not know are queued, not prompted for
+        self.assertIn('names are waiting for review', process.stderr)
+
+    def test_profile_report(self):
+        path = self.path / 'profile.json'
+        self.run_script('-O', '-P', str(path))
+        with open(path, 'r', encoding='utf-8') as fp:
+            report = json.load(fp)
+        self.assertEqual(
+            ['country', 'province', 'district', 'commune', 'village',
+             'position'], list(report['levels']))
+        # each distinct hierarchy is parsed once, not each row
+        rows = list(read_rows(self.infile))
+        groups = group_hierarchies(load_columns(rows))
+        self.assertEqual(
+            len(groups), report['levels']['country']['calls'])
+        for stage in ['stage.parse', 'stage.flush', 'stage.dump']:
+            self.assertEqual(1, report['timers'][stage]['calls'])
+        self.assertGreater(report['counters']['places'], 0)
+
+    def test_enrich(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        server.daemon_threads = True
+        server.requests = []
+        server.script = {}
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = 'http://127.0.0.1:{}/wiki/Special:EntityData/{{qid}}.json'
+        url = url.format(server.server_address[1])
+        cache = self.path / 'entities.db'
+        args = ['-n', '-e', '-E', url, '-C', str(cache)]
+        self.run_script(*args)
+        qids = []
+        for store in STORES:
+            path = self.path / '{}.json'.format(store)
+            with open(path, 'r', encoding='utf-8') as fp:
+                entities = json.load(fp)['entities']
+            for qid, record in entities.items():
+                qids.append(qid)
+                self.assertEqual(['Q1'], record['p131'], qid)
+                self.assertEqual(
+                    '{} (vi)'.format(qid), record['labels']['vi'])
+                self.assertIsNotNone(record['coordinates'])
+        self.assertEqual(sorted(qids), sorted(server.requests))
+        entities = EntityCache(cache)
+        self.addCleanup(entities.close)
+        self.assertEqual(len(qids), len(entities))
+        # a second run is answered from the cache
+        self.run_script(*args)
+        self.assertEqual(len(qids), len(server.requests))
+
+    def test_enrich_offline(self):
+        cache = self.path / 'entities.db'
+        process = self.run_script(
+            '-O', '-e', '-E', 'http://127.0.0.1:9/{qid}', '-C', str(cache))
+        self.assertIn('--offline: ignoring --enrich', process.stderr)
+        self.assertFalse(cache.exists())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the campa.geography.inventory module
+"""
+
+from campa.geography.inventory import (
+    group_hierarchies, load_columns, normalize_rows, parse_groups,
+    parse_groups_parallel, parse_rows, read_rows, write_ndjson)
+from helpers import INVENTORY, make_parser, parser_files, temporary_path
+import io
+import json
+from unittest import TestCase
+
+
+class Test_Inventory(TestCase):
+
+    def setUp(self):
+        self.path = temporary_path(self)
+        self.rows = list(read_rows(INVENTORY))
+
+    def parser(self, name):
+        """A non-interactive parser on fresh copies of the stores"""
+        path = self.path / name
+        path.mkdir()
+        return make_parser(
+            *parser_files(self, path, data=True), interactive=False)
+
+    def test_group_hierarchies(self):
+        columns = load_columns(self.rows)
+        groups = group_hierarchies(columns)
+        self.assertLess(len(groups), len(self.rows))
+        self.assertEqual(
+            sorted(columns['cnumber']),
+            sorted([c for cnumbers in groups.values() for c in cnumbers]))
+        self.assertEqual(
+            columns['cnumber'][0], next(iter(groups.values()))[0])
+
+    def test_serial_parallel(self):
+        groups = group_hierarchies(load_columns(self.rows))
+        serial = self.parser('serial')
+        parse_groups(serial, groups)
+        serial.flush()
+        parallel = self.parser('parallel')
+        parse_groups_parallel(parallel, groups, 2)
+        parallel.flush()
+        self.assertEqual(
+            [p.to_dict() for p in serial.gazetteer.places.values()],
+            [p.to_dict() for p in parallel.gazetteer.places.values()])
+        self.assertEqual(
+            [q[:2] for q in serial.resolutions.queue()],
+            [q[:2] for q in parallel.resolutions.queue()])
+        for pid in serial.gazetteer.places:
+            self.assertEqual(
+                serial.gazetteer.ancestors(pid),
+                parallel.gazetteer.ancestors(pid))
+
+    def test_ndjson_stream(self):
+        p = self.parser('stream')
+        out = io.StringIO()
+        write_ndjson(parse_rows(p, normalize_rows(self.rows)), out)
+        places = {}
+        inscriptions = []
+        for line in out.getvalue().splitlines():
+            record = json.loads(line)
+            if record.pop('type') == 'place':
+                # a later record for a pid supersedes the earlier ones
+                places[record['pid']] = record
+            else:
+                inscriptions.append(record)
+        final = {}
+        for pid, place in p.gazetteer.places.items():
+            final[pid] = place.to_dict()
+            final[pid].pop('cnumbers', None)
+        self.assertEqual(final, places)
+        self.assertEqual(list(final), list(places))
+        self.assertEqual(len(self.rows), len(inscriptions))
+        for record in inscriptions:
+            if record['places'] and record['cnumber']:
+                place = p.gazetteer.places[record['places'][-1]]
+                self.assertIn(record['cnumber'], place.cnumbers)
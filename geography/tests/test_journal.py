@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the campa.geography.journal module
+"""
+
+from campa.geography.journal import StoreJournal, write_json_atomic
+from campa.geography.resolution import StubResolver
+from helpers import make_parser, parser_files, temporary_path
+import json
+import os
+import stat
+from unittest import TestCase
+
+RECORD = {'id': 'Q746148', 'label': 'Mỹ Sơn', 'repository': 'wikidata'}
+
+
+class Test_StoreJournal(TestCase):
+
+    def setUp(self):
+        self.path = temporary_path(self)
+
+    def test_replay(self):
+        journal = StoreJournal(self.path / 'journal.jsonl')
+        journal.append('villages', 'Mỹ Sơn', RECORD, 'province/quảng-nam')
+        journal.append('villages', None, RECORD)
+        journal.close()
+        self.assertEqual(
+            [
+                ('villages', 'Mỹ Sơn', RECORD, 'province/quảng-nam'),
+                ('villages', None, RECORD, None)],
+            StoreJournal(self.path / 'journal.jsonl').replay())
+
+    def test_replay_missing(self):
+        self.assertEqual(
+            [], StoreJournal(self.path / 'journal.jsonl').replay())
+
+    def test_replay_partial_line(self):
+        journal = StoreJournal(self.path / 'journal.jsonl')
+        journal.append('villages', 'Mỹ Sơn', RECORD)
+        journal.close()
+        with open(self.path / 'journal.jsonl', 'a', encoding='utf-8') as fp:
+            fp.write('{"store": "villages", "ke')
+        self.assertEqual(1, len(journal.replay()))
+
+    def test_clear(self):
+        journal = StoreJournal(self.path / 'journal.jsonl')
+        journal.append('villages', 'Mỹ Sơn', RECORD)
+        journal.clear()
+        self.assertFalse((self.path / 'journal.jsonl').exists())
+        self.assertEqual([], journal.replay())
+
+    def test_write_json_atomic(self):
+        path = self.path / 'villages.json'
+        path.write_text('{"old": true}')
+        write_json_atomic(path, {'new': True})
+        with open(path, 'r', encoding='utf-8') as fp:
+            self.assertEqual({'new': True}, json.load(fp))
+        self.assertEqual(['villages.json'], os.listdir(self.path))
+
+    def test_write_json_atomic_mode(self):
+        umask = os.umask(0o022)
+        self.addCleanup(os.umask, umask)
+        path = self.path / 'villages.json'
+        write_json_atomic(path, {})
+        self.assertEqual(0o644, stat.S_IMODE(os.stat(str(path)).st_mode))
+
+
+class Test_Recovery(TestCase):
+
+    def setUp(self):
+        self.path = temporary_path(self)
+        self.stores, self.resolutions = parser_files(self, self.path)
+
+    def parser(self):
+        return make_parser(
+            self.stores, self.resolutions,
+            resolver=StubResolver({('village', 'Mỹ Sơn'): RECORD}))
+
+    def test_recover_unsaved(self):
+        p = self.parser()
+        p.parse(
+            country='Vietnam', province='Quảng Nam', district='',
+            commune='', village='Mỹ Sơn', position='', cnumber='1')
+        p.journal.close()
+        # as if the run had died before flush()
+        self.assertEqual('{}', self.stores[2].read_text())
+        p = self.parser()
+        self.assertEqual('Q746148', p.villages['Mỹ Sơn']['id'])
+        p.flush()
+        self.assertFalse((self.path / 'journal.jsonl').exists())
+        with open(self.stores[2], 'r', encoding='utf-8') as fp:
+            data = json.load(fp)
+        self.assertEqual({'mỹ-sơn': 'Q746148'}, data['aliases'])
+        self.assertEqual(
+            {'Q746148': 'province/quảng-nam'}, data['parents'])
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the campa.geography.profiling module
+"""
+
+from campa.geography.profiling import LEVELS, RunProfile
+from helpers import make_parser, parser_files, temporary_path
+import json
+from unittest import TestCase
+
+
+def row(village, province, cnumber='1'):
+    return {
+        'country': 'Vietnam', 'province': province, 'district': '',
+        'commune': '', 'village': village, 'position': '',
+        'cnumber': cnumber}
+
+
+class Test_RunProfile(TestCase):
+
+    def test_report(self):
+        profile = RunProfile()
+        profile.count('village.store')
+        profile.count('village.store', 2)
+        profile.count('village.queued')
+        profile.time('level.village', 0.25)
+        profile.time('level.village', 0.75)
+        report = profile.report()
+        self.assertEqual(
+            {'calls': 2, 'seconds': 1.0, 'store': 3, 'variant': 0,
+             'resolution': 0, 'resolver': 0, 'queued': 1, 'missing': 0,
+             'hit_ratio': 0.75}, report['levels']['village'])
+        # levels that were never timed are left out
+        self.assertEqual(['village'], list(report['levels']))
+        self.assertEqual(
+            {'calls': 2, 'seconds': 1.0, 'mean_ms': 500.0},
+            report['timers']['level.village'])
+        self.assertEqual(
+            {'village.queued': 1, 'village.store': 3}, report['counters'])
+
+    def test_write(self):
+        profile = RunProfile()
+        profile.count('places', 3)
+        path = temporary_path(self) / 'profile.json'
+        profile.write(path)
+        with open(path, 'r', encoding='utf-8') as fp:
+            report = json.load(fp)
+        self.assertEqual({'places': 3}, report['counters'])
+        self.assertEqual(
+            ['started', 'seconds', 'levels', 'timers', 'counters'],
+            list(report))
+
+
+class Test_Instrumentation(TestCase):
+
+    def setUp(self):
+        self.p = make_parser(
+            *parser_files(self, temporary_path(self), data=True),
+            interactive=False)
+
+    def test_disabled(self):
+        self.assertIsNone(self.p.profile)
+        self.assertIsNone(self.p.gazetteer.profile)
+        self.p.parse(**row('Phan Rang', 'Ninh Thuận'))
+
+    def test_levels(self):
+        p = self.p
+        profile = p.profile = p.gazetteer.profile = RunProfile()
+        # a store hit, then a name no store knows, which is queued
+        p.parse(**row('Phan Rang', 'Ninh Thuận'))
+        p.parse(**row('Mỹ Sơn', 'Quảng Nam', '2'))
+        p.flush()
+        report = profile.report()
+        self.assertEqual(list(LEVELS), list(report['levels']))
+        village = report['levels']['village']
+        self.assertEqual(2, village['calls'])
+        self.assertEqual((1, 1), (village['store'], village['queued']))
+        self.assertEqual(0.5, village['hit_ratio'])
+        self.assertEqual(2, report['levels']['province']['store'])
+        self.assertEqual(1.0, report['levels']['country']['hit_ratio'])
+        # levels left empty in every row are timed but never looked up
+        self.assertNotIn('hit_ratio', report['levels']['district'])
+        # each row sets its country, province and village
+        counters = report['counters']
+        self.assertEqual(6, report['timers']['gazetteer.set_place']['calls'])
+        self.assertEqual(6, sum([
+            counters.get('gazetteer.{}'.format(k), 0)
+            for k in ['added', 'merged', 'unchanged']]))
+        self.assertEqual(1, report['timers']['resolutions.commit']['calls'])
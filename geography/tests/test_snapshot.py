@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the campa.geography.snapshot module
+"""
+
+from campa.geography.gazetteer import Gazetteer
+from campa.geography.place import CampaPlace
+from campa.geography.snapshot import (
+    open_snapshot, read_meta, read_table, write_snapshot)
+from helpers import temporary_path
+import os
+import sqlite3
+import stat
+from unittest import TestCase
+
+
+def state(gazetteer):
+    names = gazetteer.catalog['names2pids']
+    return (
+        [p.to_dict() for p in gazetteer.places.values()],
+        list(names.pairs()), list(names.reverse_pairs()))
+
+
+class Test_Snapshot(TestCase):
+
+    def setUp(self):
+        self.path = temporary_path(self)
+        g = self.g = Gazetteer()
+        g.add_files(['DHARMA_INSCIC00001', 'DHARMA_INSCIC00003'])
+        g.set_place(CampaPlace(
+            'quảng-nam', gazetteer=g, name='Quảng Nam', types=['province']))
+        for pid, name, coordinates, cnumber in [
+                ('Q746148', 'Mỹ Sơn', (15.764, 108.124), '1'),
+                ('village/quảng-nam/trà-kiệu', 'Trà Kiệu', (15.83, 108.23),
+                 '3')]:
+            place = CampaPlace(
+                pid, gazetteer=g, name=name, types=['village'],
+                province='Quảng Nam', coordinates=coordinates)
+            place.set_cnumber(cnumber)
+            g.set_place(place)
+
+    def test_round_trip(self):
+        path = self.path / 'snapshot.db'
+        self.g.save(path)
+        loaded = Gazetteer.load(path)
+        self.assertEqual(state(self.g), state(loaded))
+        self.assertEqual(['quảng-nam'], loaded.ancestors('Q746148'))
+        self.assertEqual(['Q746148'], loaded.places_for_cnumber('1'))
+        self.assertEqual(
+            ['village/quảng-nam/trà-kiệu'],
+            [pid for pid, km in loaded.nearby('Q746148', 20)])
+        self.assertEqual(
+            ['DHARMA_INSCIC00001', 'DHARMA_INSCIC00003'],
+            loaded.catalog['inscriptions'].file_ids())
+
+    def test_meta_and_tables(self):
+        path = self.path / 'snapshot.db'
+        write_snapshot(
+            path, self.g, meta={'inventory': 'abc'},
+            tables={'rows': (['key', 'hash'], [('1', 'x'), ('2', 'y')])})
+        self.assertEqual('abc', read_meta(path)['inventory'])
+        self.assertEqual([('1', 'x'), ('2', 'y')], read_table(path, 'rows'))
+        self.assertIsNone(read_table(path, 'traces'))
+
+    def test_read_only(self):
+        path = self.path / 'snapshot.db'
+        self.g.save(path)
+        connection = open_snapshot(path)
+        self.addCleanup(connection.close)
+        with self.assertRaises(sqlite3.OperationalError):
+            connection.execute("DELETE FROM places")
+        self.assertEqual(
+            3, connection.execute('SELECT COUNT(*) FROM places').fetchone()[0])
+
+    def test_awkward_path(self):
+        directory = self.path / 'a?b#c%20d é'
+        directory.mkdir()
+        path = directory / 'snapshot.db'
+        self.g.save(path)
+        self.assertEqual(state(self.g), state(Gazetteer.load(path)))
+        self.assertEqual(['snapshot.db'], os.listdir(str(directory)))
+
+    def test_mode(self):
+        umask = os.umask(0o022)
+        self.addCleanup(os.umask, umask)
+        path = self.path / 'snapshot.db'
+        self.g.save(path)
+        self.assertEqual(0o644, stat.S_IMODE(os.stat(str(path)).st_mode))
+
+    def test_version(self):
+        path = self.path / 'other.db'
+        connection = sqlite3.connect(str(path))
+        connection.execute('CREATE TABLE meta (key TEXT, value TEXT)')
+        connection.commit()
+        connection.close()
+        with self.assertRaises(ValueError):
+            Gazetteer.load(path)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the campa.geography.spatial module
+"""
+
+from campa.geography.spatial import EARTH_RADIUS_KM, SpatialIndex, haversine
+import math
+from unittest import TestCase
+
+# the length of a degree of a great circle
+DEGREE_KM = 2 * math.pi * EARTH_RADIUS_KM / 360
+
+
+class Test_Haversine(TestCase):
+
+    def test_known(self):
+        self.assertAlmostEqual(111.19508, DEGREE_KM, places=5)
+        for args, km in [
+                ((0, 0, 0, 1), DEGREE_KM),
+                ((10, 20, 11, 20), DEGREE_KM),
+                ((0, 179.5, 0, -179.5), DEGREE_KM),
+                ((89.5, 0, 89.5, 180), DEGREE_KM),
+                ((90, 0, -90, 0), 180 * DEGREE_KM),
+                ((0, 0, 0, 90), 90 * DEGREE_KM)]:
+            self.assertAlmostEqual(km, float(haversine(*args)), places=2)
+
+
+class Test_SpatialIndex(TestCase):
+
+    def setUp(self):
+        index = self.index = SpatialIndex(cell_size=1.0)
+        for pid, lat, lon in [
+                ('origin', 0.0, 0.0),
+                ('east', 0.0, 1.0),
+                ('north', 2.0, 0.0),
+                ('far', 0.0, 5.0),
+                ('date-west', 0.0, 179.5),
+                ('date-east', 0.0, -179.5),
+                ('date-far', 0.0, -175.0),
+                ('pole', 90.0, 0.0),
+                ('near-pole', 89.5, 0.0),
+                ('over-pole', 89.5, 180.0),
+                ('south', -89.5, 45.0)]:
+            index.add(pid, lat, lon)
+
+    def assertHits(self, expected, hits):
+        self.assertEqual([pid for pid, km in expected], [h[0] for h in hits])
+        for (pid, km), (_, got) in zip(expected, hits):
+            self.assertAlmostEqual(km, got, places=6)
+
+    def test_bbox(self):
+        self.assertEqual(
+            ['east', 'origin'], sorted(self.index.bbox(-0.5, -0.5, 0.5, 1.5)))
+        self.assertEqual([], self.index.bbox(10, 10, 20, 20))
+
+    def test_bbox_antimeridian(self):
+        self.assertEqual(
+            ['date-west', 'date-east'],
+            self.index.bbox(-1, 179, 1, -179))
+        self.assertEqual(
+            ['date-west', 'date-east', 'date-far'],
+            self.index.bbox(-1, 170, 1, -170))
+
+    def test_radius(self):
+        self.assertHits(
+            [('origin', 0.0), ('east', DEGREE_KM), ('north', 2 * DEGREE_KM)],
+            self.index.radius(0, 0, 2.5 * DEGREE_KM))
+        self.assertHits(
+            [('origin', 0.0)], self.index.radius(0, 0, 0.5 * DEGREE_KM))
+
+    def test_radius_antimeridian(self):
+        self.assertHits(
+            [('date-west', 0.0), ('date-east', DEGREE_KM)],
+            self.index.radius(0, 179.5, 1.5 * DEGREE_KM))
+        self.assertHits(
+            [('date-east', 0.0), ('date-west', DEGREE_KM),
+             ('date-far', 4.5 * DEGREE_KM)],
+            self.index.radius(0, -179.5, 5 * DEGREE_KM))
+
+    def test_radius_pole(self):
+        hits = self.index.radius(89.5, 0, 1.5 * DEGREE_KM)
+        self.assertHits(
+            [('near-pole', 0.0), ('pole', 0.5 * DEGREE_KM),
+             ('over-pole', DEGREE_KM)], hits)
+        self.assertHits(
+            [('pole', 0.0), ('near-pole', 0.5 * DEGREE_KM),
+             ('over-pole', 0.5 * DEGREE_KM)],
+            self.index.radius(90, 0, DEGREE_KM))
+
+    def test_nearest(self):
+        self.assertHits(
+            [('origin', 0.0), ('east', DEGREE_KM), ('north', 2 * DEGREE_KM)],
+            self.index.nearest(0, 0, 3))
+        self.assertHits(
+            [('date-east', 0.0), ('date-west', DEGREE_KM)],
+            self.index.nearest(0, -179.5, 2))
+        self.assertEqual(len(self.index), len(self.index.nearest(0, 0, 50)))
+
+    def test_move(self):
+        self.index.add('east', 0.0, 3.0)
+        self.assertEqual(['origin'], self.index.bbox(-0.5, -0.5, 0.5, 1.5))
+        self.assertHits(
+            [('east', 0.0)], self.index.radius(0, 3, 0.5 * DEGREE_KM))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the campa.geography.stores module
+"""
+
+from campa.geography.norm import index_key
+from campa.geography.stores import EntityStore
+from helpers import temporary_path
+import json
+from unittest import TestCase
+
+MY_SON = {
+    'id': 'Q746148', 'label': 'Mỹ Sơn', 'repository': 'wikidata',
+    'concepturi': 'http://www.wikidata.org/entity/Q746148'}
+
+
+class Test_EntityStore(TestCase):
+
+    def setUp(self):
+        self.path = temporary_path(self) / 'villages.json'
+
+    def test_aliases(self):
+        store = EntityStore()
+        self.assertEqual('Q746148', store.set('Mỹ Sơn', dict(MY_SON)))
+        self.assertEqual('Q746148', store.set('My-son', dict(MY_SON)))
+        self.assertEqual(1, len(store))
+        self.assertIn('mỹ sơn', store)
+        self.assertIn('MY SON', store)
+        self.assertNotIn('Mỹ Khê', store)
+        self.assertEqual('Mỹ Sơn', store['my son']['label'])
+
+    def test_merge(self):
+        store = EntityStore()
+        store.set('Mỹ Sơn', dict(MY_SON))
+        store.set(None, dict(MY_SON, coordinates=[15.76, 108.12]))
+        store.set('Mỹ Sơn', dict(MY_SON, label='Mỹ Sơn (Quảng Nam)'))
+        record = store['Mỹ Sơn']
+        self.assertEqual([15.76, 108.12], record['coordinates'])
+        self.assertEqual('Mỹ Sơn (Quảng Nam)', record['label'])
+
+    def test_without_qid(self):
+        store = EntityStore()
+        key = store.set('Bằng An', {'label': 'Bằng An', 'repository': None})
+        self.assertNotEqual('Bằng An', key)
+        self.assertEqual('Bằng An', store['bằng an']['label'])
+        with self.assertRaises(ValueError):
+            store.set(None, {'label': 'Bằng An'})
+
+    def test_parents(self):
+        store = EntityStore()
+        store.set('Mỹ Sơn', dict(MY_SON), parent='province/quảng-nam')
+        store.set('My Son', dict(MY_SON), parent='province/bình-định')
+        store.set('Mỹ Sơn', dict(MY_SON))
+        self.assertEqual(
+            {'Q746148': 'province/quảng-nam'}, store.parents)
+
+    def test_write_load(self):
+        store = EntityStore()
+        store.set('Mỹ Sơn', dict(MY_SON), parent='province/quảng-nam')
+        store.write(self.path)
+        data = json.loads(self.path.read_text(encoding='utf-8'))
+        self.assertEqual({'entities', 'aliases', 'parents'}, set(data))
+        loaded = EntityStore.load(self.path)
+        self.assertEqual(store.to_dict(), loaded.to_dict())
+
+    def test_load_without_parents(self):
+        self.path.write_text(json.dumps({
+            'entities': {'Q746148': MY_SON},
+            'aliases': {index_key('Mỹ Sơn'): 'Q746148'}}), encoding='utf-8')
+        store = EntityStore.load(self.path)
+        self.assertEqual('Mỹ Sơn', store['Mỹ Sơn']['label'])
+        self.assertEqual({}, store.parents)
+
+    def test_load_old_layout(self):
+        # one full record per spelling, as the stores used to be written
+        self.path.write_text(json.dumps({
+            'Mỹ Sơn': MY_SON, 'My Son': MY_SON,
+            'Bằng An': {'label': 'Bằng An'}}), encoding='utf-8')
+        store = EntityStore.load(self.path)
+        self.assertEqual(2, len(store))
+        self.assertEqual(
+            store.aliases[index_key('My Son')],
+            store.aliases[index_key('Mỹ Sơn')])
+        self.assertIn('Bằng An', store)
+        store.write(self.path)
+        data = json.loads(self.path.read_text(encoding='utf-8'))
+        self.assertEqual(['Q746148'], [
+            k for k in data['entities'] if k.startswith('Q')])